@@ -0,0 +1,61 @@
+"""Body parser benchmark.
+
+Parses B8 work status bodies with the parsers called one by one, as
+``parse_all`` did before the compiled plans, with the compiled
+``ParserPlan`` and through ``MessageB8WorkStatusBody`` and reports the
+parses per second of each. Also replays captured E8 bodies through the E8
+``MessageSchema`` with ``decode_many``.
+"""
+
+import time
+from collections.abc import Callable
+from functools import partial
+
+from midealocal.devices.b8.message import (
+    MessageB8WorkStatusBody,
+    _generic_parsers,
+    _generic_plan,
+)
+from midealocal.devices.e8.message import E8MessageBody
+from midealocal.message import BodyParser, ParserPlan
+
+MIN_SECONDS = 0.5
+BODY = bytearray.fromhex(
+    "32 01 01 02 01 00 01 02 14 01 50 01 55 1e c5 00 00 01 00 03 02",
+)
+
+
+def _one_by_one(parsers: tuple[BodyParser, ...], body: bytearray) -> dict:
+    return {parser.name: parser.get_value(body) for parser in parsers}
+
+
+def _rate(parse: Callable[[], object]) -> float:
+    count = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < MIN_SECONDS:
+        parse()
+        count += 1
+    return count / elapsed
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parsers = _generic_parsers(1)
+    plan = _generic_plan(1)
+    assert _one_by_one(parsers, BODY) == plan.parse(BODY)
+    start = time.perf_counter()
+    ParserPlan(parsers)
+    print(f"{len(parsers)} fields, compiled in {time.perf_counter() - start:.4f} s")
+    for name, parse in (
+        ("parsers one by one", partial(_one_by_one, parsers, BODY)),
+        ("compiled plan", partial(plan.parse, BODY)),
+        ("work status body", partial(MessageB8WorkStatusBody, BODY)),
+    ):
+        print(f"{name:>18}: {_rate(parse):10.0f} parses/s")
+    replay = [bytearray(range(index, index + 48)) for index in range(200)] * 5
+    rate = _rate(partial(E8MessageBody.schema.decode_many, replay)) * len(replay)
+    print(f"{'E8 replay':>18}: {rate:10.0f} parses/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""8370 decoder throughput benchmark.
+
+Decodes bursts of encrypted 8370 frames with the former recursive
+``decode_8370`` and with the streaming ``Decoder8370`` and reports the
+throughput of both.
+"""
+
+import sys
+import time
+from collections.abc import Callable
+from functools import partial
+from hashlib import sha256
+
+from midealocal.cloud import DEFAULT_KEYS
+from midealocal.exceptions import DataSignDoesntMatch
+from midealocal.packet_builder import PacketBuilder
+from midealocal.security import (
+    MIN_DECODE_8370_DATA_LENGTH,
+    MSGTYPE_ENCRYPTED_RESPONSE,
+    Decoder8370,
+    LocalSecurity,
+)
+
+BURSTS = (10, 100, 900, 5000)
+MIN_SECONDS = 0.5
+RESPONSE = bytes([0xAA, 0x0E, 0xAC] + [0x00] * 5 + [0x03, 0x03, 0xC0, 0x01, 0, 0])
+
+
+def _legacy_decode_8370(security: LocalSecurity, data: bytes) -> tuple[list, bytes]:
+    """Recursive 8370 decoding, one level and one copy per frame."""
+    if len(data) < MIN_DECODE_8370_DATA_LENGTH:
+        return [], data
+    header = data[:6]
+    size = int.from_bytes(header[2:4], "big") + 8
+    leftover = None
+    if len(data) > size:
+        leftover = data[size:]
+        data = data[:size]
+    elif len(data) < size:
+        return [], data
+    padding = header[5] >> 4
+    data = data[6:]
+    sign = data[-32:]
+    data = security.aes_cbc_decrypt(raw=data[:-32], key=security._tcp_key)  # noqa: SLF001
+    if sha256(header + data).digest() != sign:
+        raise DataSignDoesntMatch
+    if padding:
+        data = data[:-padding]
+    data = data[2:]
+    if leftover:
+        packets, incomplete = _legacy_decode_8370(security, leftover)
+        return [data, *packets], incomplete
+    return [data], b""
+
+
+def _security() -> LocalSecurity:
+    """Local security with an established V3 session."""
+    key = bytes.fromhex(DEFAULT_KEYS[99]["key"])
+    security = LocalSecurity()
+    plain = bytes(range(32))
+    security.tcp_key(
+        security.aes_cbc_encrypt(plain, key) + sha256(plain).digest(),
+        key,
+    )
+    return security
+
+
+def _legacy(security: LocalSecurity, burst: bytes) -> int:
+    return len(_legacy_decode_8370(security, burst)[0])
+
+
+def _streaming(decoder: Decoder8370, burst: bytes) -> int:
+    return sum(1 for _ in decoder.feed(burst))
+
+
+def _throughput(run: Callable[[], int], size: int) -> str:
+    rounds = 0
+    start = time.perf_counter()
+    try:
+        while (elapsed := time.perf_counter() - start) < MIN_SECONDS:
+            run()
+            rounds += 1
+    except RecursionError:
+        return f"{'RecursionError':>22}"
+    return f"{size * rounds / elapsed / 1e6:8.2f} MB/s"
+
+
+def main() -> None:
+    """Run the benchmark."""
+    security = _security()
+    frame = security.encode_8370(
+        bytes(PacketBuilder(1, RESPONSE).finalize()),
+        MSGTYPE_ENCRYPTED_RESPONSE,
+    )
+    decoder = Decoder8370(security)
+    print(f"recursion limit {sys.getrecursionlimit()}, frame {len(frame)} bytes")
+    for frames in BURSTS:
+        burst = frame * frames
+        legacy = _throughput(partial(_legacy, security, burst), len(burst))
+        streaming = _throughput(partial(_streaming, decoder, burst), len(burst))
+        print(f"{frames:5} frames: recursive {legacy}, streaming {streaming}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Unicast sweep discovery benchmark.
+
+Sweeps a loopback CIDR range with ``async_discover_sweep`` while a simulator
+answers the discovery message on 127.0.0.1, and reports the sweep time, the
+probe rate and the peak of the memory allocated, for a few batch sizes.
+Linux routes the whole 127.0.0.0/8 range to the loopback interface, the
+other hosts of the range answer with ICMP port unreachable.
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+import tracemalloc
+from ipaddress import IPv4Network
+
+from midealocal.const import DeviceType, ProtocolVersion
+from midealocal.discover import async_discover_sweep
+from midealocal.simulator import Simulator, VirtualAppliance
+
+NETWORK = "127.0.0.0/16"
+CONCURRENCY = (64, 256, 1024)
+INTERVAL = 0.0
+APPLIANCES = 10
+
+
+async def _sweep(
+    network: str,
+    port: int,
+    concurrency: int,
+    interval: float,
+) -> int:
+    found = 0
+    async for _ in async_discover_sweep(
+        [network],
+        duration=0.2,
+        ports=[port],
+        concurrency=concurrency,
+        interval=interval,
+    ):
+        found += 1
+    return found
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--network", default=NETWORK)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=CONCURRENCY)
+    parser.add_argument("--interval", type=float, default=INTERVAL)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    hosts = IPv4Network(args.network, strict=False).num_addresses
+    simulator = Simulator()
+    simulator.add_appliances(
+        VirtualAppliance(device_id, DeviceType.AC, ProtocolVersion.V3)
+        for device_id in range(APPLIANCES)
+    )
+    port = simulator.open_discovery()
+    try:
+        for concurrency in args.concurrency:
+            tracemalloc.start()
+            start = time.perf_counter()
+            found = asyncio.run(_sweep(args.network, port, concurrency, args.interval))
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            assert found == APPLIANCES
+            print(
+                f"{args.network} concurrency {concurrency:<5} {elapsed:8.2f} s "
+                f"{hosts / elapsed:10.0f} hosts/s {peak / 1024:8.1f} KiB peak",
+            )
+    finally:
+        simulator.close()
+
+
+if __name__ == "__main__":
+    main()
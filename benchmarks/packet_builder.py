@@ -0,0 +1,71 @@
+"""Packet builder benchmark.
+
+Builds query and heartbeat packets with ``PacketBuilder`` and with the
+former implementation (header rebuilt from a list, time formatted to a
+string and parsed back, a ``LocalSecurity`` per packet) and reports the
+packets per second of both.
+"""
+
+import time
+from collections.abc import Callable
+from datetime import UTC, datetime
+
+from midealocal.packet_builder import PacketBuilder
+from midealocal.security import LocalSecurity
+
+MIN_SECONDS = 0.5
+QUERY = bytes([0xAA, 0x0B, 0xAC] + [0x00] * 6 + [0x03, 0x41])
+HEARTBEAT = bytes([0x00])
+
+
+class _LegacyPacketBuilder:
+    """Packet builder before the header templates."""
+
+    def __init__(self, device_id: int, command: bytes) -> None:
+        self.security = LocalSecurity()
+        self.packet = bytearray(
+            [0x5A, 0x5A, 0x01, 0x11, 0x00, 0x00, 0x20, 0x00] + [0x00] * 32,
+        )
+        self.packet[12:20] = self.packet_time()
+        self.packet[20:28] = device_id.to_bytes(8, "little")
+        self.command = command
+
+    def finalize(self, msg_type: int = 1) -> bytearray:
+        if msg_type != 1:
+            self.packet[3] = 0x10
+            self.packet[6] = 0x7B
+        else:
+            self.packet.extend(self.security.aes_encrypt(self.command))
+        self.packet[4:6] = (len(self.packet) + 16).to_bytes(2, "little")
+        self.packet.extend(self.security.encode32_data(bytes(self.packet)))
+        return self.packet
+
+    @staticmethod
+    def packet_time() -> bytearray:
+        t = datetime.now(tz=UTC).strftime("%Y%m%d%H%M%S%f")[:16]
+        b = bytearray()
+        for i in range(0, len(t), 2):
+            b.insert(0, int(t[i : i + 2]))
+        return b
+
+
+def _rate(build: Callable[[int, bytes], PacketBuilder | _LegacyPacketBuilder]) -> str:
+    results = []
+    for command, msg_type in ((QUERY, 1), (HEARTBEAT, 0)):
+        count = 0
+        start = time.perf_counter()
+        while (elapsed := time.perf_counter() - start) < MIN_SECONDS:
+            build(count % 1000, command).finalize(msg_type)
+            count += 1
+        results.append(count / elapsed)
+    return f"query {results[0]:9.0f}/s, heartbeat {results[1]:9.0f}/s"
+
+
+def main() -> None:
+    """Run the benchmark."""
+    print(f"{'before':<8} {_rate(_LegacyPacketBuilder)}")
+    print(f"{'after':<8} {_rate(PacketBuilder)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Receive buffer microbenchmark.
+
+Feeds a burst of concatenated V2 (5A5A) and V3 (8370) frames, in 512 bytes
+reads as the device loop receives them and as one coalesced read, through
+the former ``buffer + msg`` reassembly and through ``ReceiveBuffer``, and
+reports the time and the peak of the memory allocated per frame.
+"""
+
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from functools import partial
+from hashlib import sha256
+
+from midealocal.buffer import ReceiveBuffer
+from midealocal.cloud import DEFAULT_KEYS
+from midealocal.device import MIN_V2_FACTUAL_MSG_LENGTH, MideaDevice
+from midealocal.packet_builder import PacketBuilder
+from midealocal.security import MSGTYPE_ENCRYPTED_RESPONSE, Buffer, LocalSecurity
+
+FRAMES = 500
+ROUNDS = 5
+RESPONSE = bytes([0xAA, 0x0E, 0xAC] + [0x00] * 5 + [0x03, 0x03, 0xC0, 0x01, 0, 0])
+
+
+def _legacy_fetch_v2_message(msg: bytes) -> tuple[list, bytes]:
+    """V2 reassembly before the receive buffer."""
+    result = []
+    while len(msg) >= MIN_V2_FACTUAL_MSG_LENGTH:
+        alleged_msg_len = msg[4] + (msg[5] << 8)
+        if len(msg) < alleged_msg_len:
+            break
+        result.append(msg[:alleged_msg_len])
+        msg = msg[alleged_msg_len:]
+    return result, msg
+
+
+def _security() -> LocalSecurity:
+    """Local security with an established V3 session."""
+    key = bytes.fromhex(DEFAULT_KEYS[99]["key"])
+    security = LocalSecurity()
+    plain = bytes(range(32))
+    security.tcp_key(
+        security.aes_cbc_encrypt(plain, key) + sha256(plain).digest(),
+        key,
+    )
+    return security
+
+
+def _chunks(stream: bytes, size: int) -> Iterator[bytes]:
+    for offset in range(0, len(stream), size):
+        yield stream[offset : offset + size]
+
+
+def _legacy(
+    stream: bytes,
+    size: int,
+    fetch: Callable[[bytes], tuple[list, Buffer]],
+) -> int:
+    count = 0
+    buffer = b""
+    for chunk in _chunks(stream, size):
+        messages, leftover = fetch(buffer + chunk)
+        buffer = bytes(leftover)
+        count += len(messages)
+    return count
+
+
+def _buffered(
+    stream: bytes,
+    size: int,
+    fetch: Callable[[memoryview], tuple[list, Buffer]],
+) -> int:
+    count = 0
+    buffer = ReceiveBuffer()
+    for chunk in _chunks(stream, size):
+        buffer.append(chunk)
+        with buffer.view() as view:
+            messages, leftover = fetch(view)
+            buffer.consume(len(view) - len(leftover))
+        del leftover
+        count += len(messages)
+    return count
+
+
+def _measure(name: str, run: Callable[[], int]) -> None:
+    tracemalloc.start()
+    assert run() == FRAMES
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        run()
+    elapsed = (time.perf_counter() - start) / ROUNDS
+    print(
+        f"{name:<36} {elapsed / FRAMES * 1e6:8.2f} us/frame "
+        f"{peak / FRAMES:8.1f} peak bytes/frame",
+    )
+
+
+def main() -> None:
+    """Run the benchmark."""
+    frame = bytes(PacketBuilder(1, RESPONSE).finalize())
+    v2_stream = frame * FRAMES
+    security = _security()
+    v3_stream = b"".join(
+        security.encode_8370(frame, MSGTYPE_ENCRYPTED_RESPONSE) for _ in range(FRAMES)
+    )
+    for size, label in ((512, "512 bytes reads"), (len(v3_stream), "one read")):
+        _measure(
+            f"v2 concatenation, {label}",
+            partial(_legacy, v2_stream, size, _legacy_fetch_v2_message),
+        )
+        _measure(
+            f"v2 receive buffer, {label}",
+            partial(_buffered, v2_stream, size, MideaDevice.fetch_v2_message),
+        )
+        _measure(
+            f"v3 concatenation, {label}",
+            partial(_legacy, v3_stream, size, security.decode_8370),
+        )
+        _measure(
+            f"v3 receive buffer, {label}",
+            partial(_buffered, v3_stream, size, security.decode_8370),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Local security benchmark.
+
+Encodes and decodes 5A5A (V2) and 8370 (V3) frames with ``LocalSecurity``
+and with a copy that creates an AES cipher for every call, as before the
+key schedules were cached, and reports the frames per second of both.
+"""
+
+import time
+from collections.abc import Callable
+from functools import partial
+from hashlib import sha256
+
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad, unpad
+
+from midealocal.cloud import DEFAULT_KEYS
+from midealocal.packet_builder import PacketBuilder
+from midealocal.security import MSGTYPE_ENCRYPTED_REQUEST, Buffer, LocalSecurity
+
+MIN_SECONDS = 0.5
+RESPONSE = bytes([0xAA, 0x0E, 0xAC] + [0x00] * 5 + [0x03, 0x03, 0xC0, 0x01, 0, 0])
+
+
+class _UncachedSecurity(LocalSecurity):
+    """Local security creating a cipher per call."""
+
+    def aes_decrypt(self, raw: bytes) -> bytearray:
+        return bytearray(unpad(AES.new(self.aes_key, AES.MODE_ECB).decrypt(raw), 16))
+
+    def aes_encrypt(self, raw: Buffer) -> bytes:
+        return AES.new(self.aes_key, AES.MODE_ECB).encrypt(pad(bytes(raw), 16))
+
+    def aes_cbc_decrypt(self, raw: Buffer, key: Buffer) -> bytes:
+        return AES.new(key=key, mode=AES.MODE_CBC, iv=self.iv).decrypt(raw)
+
+
+def _session(security: LocalSecurity) -> LocalSecurity:
+    key = bytes.fromhex(DEFAULT_KEYS[99]["key"])
+    plain = bytes(range(32))
+    security.tcp_key(
+        security.aes_cbc_encrypt(plain, key) + sha256(plain).digest(),
+        key,
+    )
+    return security
+
+
+def _rate(run: Callable[[], object]) -> float:
+    count = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < MIN_SECONDS:
+        run()
+        count += 1
+    return count / elapsed
+
+
+def main() -> None:
+    """Run the benchmark."""
+    body = bytes(PacketBuilder(1, RESPONSE).finalize())
+    for name, security in (
+        ("AES.new per frame", _session(_UncachedSecurity())),
+        ("cached key schedule", _session(LocalSecurity())),
+    ):
+        encrypted = security.aes_encrypt(RESPONSE)
+        frame = security.encode_8370(body, MSGTYPE_ENCRYPTED_REQUEST)
+        rates = (
+            _rate(partial(security.aes_encrypt, RESPONSE)),
+            _rate(partial(security.aes_decrypt, encrypted)),
+            _rate(partial(security.encode_8370, body, MSGTYPE_ENCRYPTED_REQUEST)),
+            _rate(partial(security.decode_8370, frame)),
+        )
+        print(
+            f"{name:<20} 5A5A encode {rates[0]:9.0f}/s decode {rates[1]:9.0f}/s, "
+            f"8370 encode {rates[2]:9.0f}/s decode {rates[3]:9.0f}/s",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+"""Hot path benchmark suite.
+
+Measures ``PacketBuilder.finalize``, the 8370 encoder and decoder,
+``MessageRequest.serialize``, ``process_message`` of every device type and
+connect/refresh cycles against simulated appliances on localhost, and the
+time the threaded devices and a ``DeviceHub`` take to bring many simulated
+appliances online.
+
+Each benchmark is calibrated to run rounds of at least ``--min-round``
+seconds and repeated for ``--rounds`` rounds, the per call statistics are
+printed and, with ``--json``, written in a pytest-benchmark like layout for
+trend tracking. With ``--compare``, benchmarks whose minimum got slower than
+the baseline by more than ``--max-regression`` fail the run.
+"""
+
+import argparse
+import json
+import logging
+import os
+import pkgutil
+import platform
+import statistics
+import sys
+import time
+from collections.abc import Callable, Iterator
+from datetime import UTC, datetime
+from functools import partial
+from hashlib import sha256
+from pathlib import Path
+from typing import Any
+
+import midealocal.devices
+from midealocal.cloud import DEFAULT_KEYS
+from midealocal.const import DeviceType, ProtocolVersion
+from midealocal.device import MideaDevice
+from midealocal.devices import device_selector
+from midealocal.hub import DeviceHub
+from midealocal.message import MessageType
+from midealocal.packet_builder import PacketBuilder
+from midealocal.security import (
+    MSGTYPE_ENCRYPTED_REQUEST,
+    MSGTYPE_ENCRYPTED_RESPONSE,
+    LocalSecurity,
+)
+from midealocal.simulator import Simulator, VirtualAppliance
+from midealocal.simulator.responses import response_body, response_frame
+from midealocal.version import __version__
+
+MIN_ROUND = 0.01
+ROUNDS = 20
+MAX_REGRESSION = 0.2
+DRIVER_DEVICES = 50
+ONLINE_TIMEOUT = 30
+QUERY = bytes([0xAA, 0x0B, 0xAC] + [0x00] * 6 + [0x03, 0x41])
+HEARTBEAT = bytes([0x00])
+# response frames of the device tests, replayed instead of the canned responses
+CAPTURED_FRAMES: dict[DeviceType, bytes] = {
+    # A1 general response, laid out as in tests/devices/a1
+    DeviceType.A1: bytes.fromhex(
+        "aa 00 a1 00 00 00 00 00 01 03"
+        "00 01 02 04 00 00 00 28 80 40 3f 00 00 00 00 32 2d 64 00 20 00",
+    ),
+    # AC C0 status, laid out as in tests/devices/ac
+    DeviceType.AC: bytes.fromhex(
+        "aa 00 ac 00 00 00 00 00 01 03"
+        "c0 01 ae 7f 00 00 00 0f 60 1e 47 64 64 20 70 32 00 00 00 00 00 80 01 00",
+    ),
+    # C3 generic response, laid out as in tests/devices/c3
+    DeviceType.C3: bytes.fromhex(
+        "aa 00 c3 00 00 00 00 00 01 03"
+        "01 2d 30 0a 03 02 15 16 2a 2d 1e 14 19 10 23 14 1e 12 3d 20 32 22 2c 00 00",
+    ),
+    # DA general response, laid out as in tests/devices/da
+    DeviceType.DA: bytes.fromhex(
+        "aa 00 da 00 00 00 00 00 01 03"
+        "04 01 02 00 05 41 32 00 54 1e 23 00 0a 00 00 00 04 0f 01 00 00 00 00 00 0a 00",
+    ),
+    # ED FF response, laid out as in tests/devices/ed
+    DeviceType.ED: bytes.fromhex(
+        "aa 00 ed 00 00 00 00 00 01 03"
+        "ff 01 07 00 40 00 00 01 01 10 40 01 02 03 00 11 40 01 02 03 04 13 40 04 03 02"
+        "01 00",
+    ),
+    # B8 work status, laid out as in tests/devices/b8
+    DeviceType.B8: bytes.fromhex(
+        "aa 00 00 00 00 00 00 00 01 03"
+        "32 01 01 00 01 00 01 01 00 01 28 00 50 14 c7 01 01 01 01 07 03 00",
+    ),
+}
+
+Case = tuple[str, str, Callable[[], object]]
+
+
+def _device(
+    device_type: int,
+    protocol: ProtocolVersion = ProtocolVersion.V2,
+    host: str = "127.0.0.1",
+    port: int = 6444,
+    device_id: int = 1,
+) -> MideaDevice:
+    return device_selector(
+        name="Benchmark",
+        device_id=device_id,
+        device_type=device_type,
+        ip_address=host,
+        port=port,
+        token=DEFAULT_KEYS[99]["token"],
+        key=DEFAULT_KEYS[99]["key"],
+        device_protocol=protocol,
+        model="benchmark",
+        subtype=0,
+        customize="",
+    )
+
+
+def _device_types() -> Iterator[DeviceType]:
+    for module in pkgutil.iter_modules(midealocal.devices.__path__):
+        yield DeviceType(int(module.name.lstrip("x"), 16))
+
+
+def _session() -> LocalSecurity:
+    security = LocalSecurity()
+    key = bytes.fromhex(DEFAULT_KEYS[99]["key"])
+    plain = bytes(range(32))
+    security.tcp_key(
+        security.aes_cbc_encrypt(plain, key) + sha256(plain).digest(),
+        key,
+    )
+    return security
+
+
+def _packet_cases() -> Iterator[Case]:
+    security = _session()
+    packet = bytes(PacketBuilder(1, QUERY).finalize())
+    frame = security.encode_8370(packet, MSGTYPE_ENCRYPTED_RESPONSE)
+    yield "packet", "finalize query", PacketBuilder(1, QUERY).finalize
+    yield (
+        "packet",
+        "finalize heartbeat",
+        partial(PacketBuilder(1, HEARTBEAT).finalize, msg_type=0),
+    )
+    yield (
+        "security",
+        "encode_8370",
+        partial(security.encode_8370, packet, MSGTYPE_ENCRYPTED_REQUEST),
+    )
+    yield "security", "decode_8370", partial(security.decode_8370, frame)
+
+
+def _message_cases() -> Iterator[Case]:
+    for device_type in _device_types():
+        queries = _device(device_type).build_query()
+        if queries:
+            yield "serialize", device_type.name, queries[0].serialize
+
+
+def _response(device_type: DeviceType, device: MideaDevice) -> bytes:
+    if device_type in CAPTURED_FRAMES:
+        return CAPTURED_FRAMES[device_type]
+    query = device.build_query()[0].serialize()
+    body = response_body(device_type, query[10:-1])
+    return bytes(response_frame(device_type, 3, MessageType(query[9]), body))
+
+
+def _process_cases() -> Iterator[Case]:
+    for device_type in _device_types():
+        device = _device(device_type)
+        if not device.build_query():
+            continue
+        process = partial(device.process_message, _response(device_type, device))
+        process()
+        yield "process_message", device_type.name, process
+
+
+def _cycle(device: MideaDevice) -> None:
+    device.connect(check_protocol=True)
+    device.close_socket()
+
+
+def _cycle_cases(simulator: Simulator) -> Iterator[Case]:
+    for protocol in (ProtocolVersion.V2, ProtocolVersion.V3):
+        appliance = simulator.add_appliance(
+            VirtualAppliance(protocol, DeviceType.AC, protocol),
+        )
+        device = _device(
+            DeviceType.AC,
+            protocol,
+            appliance.host,
+            appliance.port,
+            appliance.device_id,
+        )
+        if not device.connect(check_protocol=True):
+            raise RuntimeError(f"cannot connect to the simulated {protocol!r}")
+        refresh = partial(device.refresh_status, check_protocol=True)
+        yield "cycle", f"refresh {protocol.name}", refresh
+        yield "cycle", f"connect {protocol.name}", partial(_cycle, device)
+
+
+def _wait_online(devices: list[MideaDevice]) -> None:
+    deadline = time.monotonic() + ONLINE_TIMEOUT
+    while not all(device.available for device in devices):
+        if time.monotonic() > deadline:
+            raise RuntimeError("simulated appliances did not come online")
+        time.sleep(0.001)
+
+
+def _driver_devices(appliances: list[VirtualAppliance]) -> list[MideaDevice]:
+    return [
+        _device(
+            DeviceType.AC,
+            appliance.protocol,
+            appliance.host,
+            appliance.port,
+            appliance.device_id,
+        )
+        for appliance in appliances
+    ]
+
+
+def _online_threads(appliances: list[VirtualAppliance]) -> None:
+    devices = _driver_devices(appliances)
+    for device in devices:
+        device.open()
+    try:
+        _wait_online(devices)
+    finally:
+        for device in devices:
+            device.close()
+        for device in devices:
+            device.join()
+
+
+def _online_hub(appliances: list[VirtualAppliance]) -> None:
+    devices = _driver_devices(appliances)
+    hub = DeviceHub()
+    hub.open()
+    try:
+        for device in devices:
+            hub.add_device(device)
+        _wait_online(devices)
+    finally:
+        hub.close()
+
+
+def _driver_cases(simulator: Simulator) -> Iterator[Case]:
+    appliances = simulator.add_appliances(
+        VirtualAppliance(
+            device_id,
+            DeviceType.AC,
+            ProtocolVersion.V3 if device_id % 2 else ProtocolVersion.V2,
+        )
+        for device_id in range(100, 100 + DRIVER_DEVICES)
+    )
+    yield "drivers", f"threads {DRIVER_DEVICES}", partial(_online_threads, appliances)
+    yield "drivers", f"hub {DRIVER_DEVICES}", partial(_online_hub, appliances)
+
+
+def measure(run: Callable[[], object], min_round: float, rounds: int) -> dict:
+    """Per call statistics of ``run`` in seconds, calibrated like pytest-benchmark."""
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            run()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_round:
+            break
+        iterations *= 2 if elapsed <= 0 else max(2, int(min_round / elapsed) + 1)
+    data = [elapsed / iterations]
+    for _ in range(rounds - 1):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            run()
+        data.append((time.perf_counter() - start) / iterations)
+    return {
+        "min": min(data),
+        "max": max(data),
+        "mean": statistics.fmean(data),
+        "median": statistics.median(data),
+        "stddev": statistics.stdev(data) if len(data) > 1 else 0.0,
+        "rounds": rounds,
+        "iterations": iterations,
+        "ops": 1 / statistics.fmean(data),
+    }
+
+
+def _machine_info() -> dict[str, Any]:
+    return {
+        "python_implementation": platform.python_implementation(),
+        "python_version": platform.python_version(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "midealocal": __version__,
+    }
+
+
+def regressions(
+    results: list[dict],
+    baseline: list[dict],
+    max_regression: float,
+) -> list[str]:
+    """Benchmarks slower than the baseline by more than ``max_regression``."""
+    previous = {entry["fullname"]: entry["stats"]["min"] for entry in baseline}
+    slower = []
+    for entry in results:
+        before = previous.get(entry["fullname"])
+        if before and entry["stats"]["min"] > before * (1 + max_regression):
+            slower.append(
+                f"{entry['fullname']}: {before * 1e6:.2f} us -> "
+                f"{entry['stats']['min'] * 1e6:.2f} us",
+            )
+    return slower
+
+
+def main() -> int:
+    """Run the suite."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--json", type=Path, help="write the results to this file")
+    parser.add_argument("--compare", type=Path, help="baseline JSON results")
+    parser.add_argument("--max-regression", type=float, default=MAX_REGRESSION)
+    parser.add_argument("--min-round", type=float, default=MIN_ROUND)
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    parser.add_argument("-k", "--filter", default="", help="run matching names")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    simulator = Simulator()
+    simulator.open()
+    results = []
+    try:
+        cases = [
+            *_packet_cases(),
+            *_message_cases(),
+            *_process_cases(),
+            *_cycle_cases(simulator),
+            *_driver_cases(simulator),
+        ]
+        for group, name, run in cases:
+            fullname = f"{group}::{name}"
+            if args.filter not in fullname:
+                continue
+            stats = measure(run, args.min_round, args.rounds)
+            results.append(
+                {"group": group, "name": name, "fullname": fullname, "stats": stats},
+            )
+            print(
+                f"{fullname:<32} min {stats['min'] * 1e6:10.2f} us "
+                f"mean {stats['mean'] * 1e6:10.2f} us {stats['ops']:12.0f}/s",
+            )
+    finally:
+        simulator.close()
+
+    if args.json:
+        args.json.write_text(
+            json.dumps(
+                {
+                    "machine_info": _machine_info(),
+                    "datetime": datetime.now(tz=UTC).isoformat(),
+                    "benchmarks": results,
+                },
+                indent=2,
+            ),
+            encoding="utf-8",
+        )
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        slower = regressions(results, baseline["benchmarks"], args.max_regression)
+        for line in slower:
+            print(f"regression {line}")
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
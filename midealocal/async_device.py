@@ -0,0 +1,462 @@
+"""Midea local device asyncio transport."""
+
+import asyncio
+import contextlib
+import logging
+import socket
+import time
+from collections.abc import Callable
+from typing import Any, cast
+
+from .const import ProtocolVersion
+from .device import (
+    MIN_AUTH_RESPONSE,
+    QUERY_TIMEOUT,
+    RESPONSE_TIMEOUT,
+    SOCKET_TIMEOUT,
+    AuthException,
+    MessageResult,
+    MideaDevice,
+    NoSupportedProtocol,
+    _InflightQueries,
+)
+from .exceptions import SocketException
+from .message import MessageRequest
+from .security import MSGTYPE_HANDSHAKE_REQUEST
+
+_LOGGER = logging.getLogger(__name__)
+
+MAX_RECONNECT_SLEEP = 600
+
+
+class _TransportSocket:
+    """Socket-like adapter writing into an asyncio transport.
+
+    The device send path (``build_send`` -> ``send_message_v2``) only uses
+    ``send``/``settimeout``/``shutdown``/``close``, so the unchanged device
+    subclasses can write to the transport, from the loop or from any thread.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        transport: asyncio.Transport,
+    ) -> None:
+        """Initialize transport socket."""
+        self._loop = loop
+        self._transport = transport
+
+    def _in_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def send(self, data: bytes) -> int:
+        """Write data to the transport."""
+        if self._transport.is_closing():
+            raise ConnectionResetError("Transport is closing.")
+        if self._in_loop():
+            self._transport.write(data)
+        else:
+            self._loop.call_soon_threadsafe(self._transport.write, bytes(data))
+        return len(data)
+
+    def recv(self, bufsize: int) -> bytes:  # noqa: ARG002
+        """Blocking receive is not available on a transport."""
+        raise OSError("recv is not supported by the asyncio transport")
+
+    def settimeout(self, value: float | None) -> None:
+        """Socket timeouts are handled by the event loop."""
+
+    def shutdown(self, how: int) -> None:  # noqa: ARG002
+        """Shutdown transport."""
+        self.close()
+
+    def close(self) -> None:
+        """Close transport."""
+        if self._in_loop():
+            self._transport.close()
+        else:
+            self._loop.call_soon_threadsafe(self._transport.close)
+
+
+class _MideaDeviceProtocol(asyncio.Protocol):
+    """Asyncio protocol forwarding events to an AsyncMideaDevice."""
+
+    def __init__(self, owner: "AsyncMideaDevice") -> None:
+        """Initialize protocol."""
+        self._owner = owner
+
+    def data_received(self, data: bytes) -> None:
+        """Handle data received."""
+        self._owner.data_received(data)
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        """Handle connection lost."""
+        self._owner.connection_lost(exc)
+
+
+class AsyncMideaDevice:
+    """Drive a MideaDevice on an asyncio event loop instead of a thread.
+
+    The wrapped device is never started as a thread; its socket is replaced by
+    an asyncio transport, so ``parse_message``, ``process_message``,
+    ``set_attribute`` and the ``register_update`` callbacks keep working
+    unchanged for every device subclass.
+    """
+
+    def __init__(self, device: MideaDevice) -> None:
+        """Initialize asyncio device."""
+        self._device = device
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._transport: asyncio.Transport | None = None
+        self._auth_waiter: asyncio.Future[bytes] | None = None
+        self._result_waiter: asyncio.Future[MessageResult] | None = None
+        self._disconnected = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._is_run = False
+        self._previous_response = 0.0
+
+    @property
+    def device(self) -> MideaDevice:
+        """Wrapped device."""
+        return self._device
+
+    @property
+    def available(self) -> bool:
+        """Device available."""
+        return self._device.available
+
+    @property
+    def connected(self) -> bool:
+        """Transport connected."""
+        return self._transport is not None and not self._transport.is_closing()
+
+    def register_update(
+        self,
+        update: Callable[[dict[str, Any]], None],
+        full_snapshot: bool = False,
+    ) -> None:
+        """Register update."""
+        self._device.register_update(update, full_snapshot)
+
+    def data_received(self, data: bytes) -> None:
+        """Handle data received from the transport."""
+        if self._auth_waiter is not None and not self._auth_waiter.done():
+            self._auth_waiter.set_result(data)
+            return
+        try:
+            result = self._device.parse_message(data)
+        except Exception:
+            _LOGGER.exception("[%s] Unexpected error", self._device.device_id)
+            self._device.close_socket()
+            return
+        if result == MessageResult.SUCCESS:
+            self._previous_response = time.time()
+        elif result == MessageResult.ERROR:
+            _LOGGER.debug("[%s] Message 'ERROR' received", self._device.device_id)
+            self._device.close_socket()
+        if (
+            result != MessageResult.PADDING
+            and self._result_waiter is not None
+            and not self._result_waiter.done()
+        ):
+            self._result_waiter.set_result(result)
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        """Handle connection lost."""
+        _LOGGER.debug("[%s] Connection lost: %s", self._device.device_id, exc)
+        self._transport = None
+        self._disconnected.set()
+        error = ConnectionResetError("Connection closed by peer.")
+        for waiter in (self._auth_waiter, self._result_waiter):
+            if waiter is not None and not waiter.done():
+                waiter.set_exception(error)
+
+    async def connect(self, check_protocol: bool = False) -> bool:
+        """Connect to device."""
+        device = self._device
+        self._loop = asyncio.get_running_loop()
+        connected = False
+        metrics = device._metrics
+        if metrics is not None and metrics.connects:
+            metrics.reconnects += 1
+        try:
+            _LOGGER.debug(
+                "[%s] Connecting to %s:%s",
+                device.device_id,
+                device._ip_address,
+                device._port,
+            )
+            start = time.monotonic()
+            async with asyncio.timeout(SOCKET_TIMEOUT):
+                transport, _ = await self._loop.create_connection(
+                    lambda: _MideaDeviceProtocol(self),
+                    device._ip_address,
+                    device._port,
+                )
+            self._transport = transport
+            self._disconnected.clear()
+            device._socket = cast(
+                socket.socket,
+                _TransportSocket(self._loop, self._transport),
+            )
+            _LOGGER.debug("[%s] Connected", device.device_id)
+            if metrics is not None:
+                metrics.connect.observe(time.monotonic() - start)
+            if device._device_protocol_version == ProtocolVersion.V3:
+                start = time.monotonic()
+                await self.authenticate()
+                if metrics is not None:
+                    metrics.auth.observe(time.monotonic() - start)
+            if check_protocol:
+                await self._check_protocol()
+            connected = True
+        except TimeoutError:
+            _LOGGER.debug("[%s] Connection timed out", device.device_id)
+        except OSError:
+            _LOGGER.debug("[%s] Connection error", device.device_id)
+        except AuthException:
+            _LOGGER.debug("[%s] Authentication failed", device.device_id)
+        except SocketException:
+            _LOGGER.debug("[%s] Connect socket exception", device.device_id)
+        except NoSupportedProtocol:
+            _LOGGER.debug("[%s] No supported query protocol", device.device_id)
+        except Exception as e:
+            _LOGGER.exception(
+                "[%s] Unknown error during connect device",
+                device.device_id,
+                exc_info=e,
+            )
+        if metrics is not None:
+            if connected:
+                metrics.connects += 1
+            else:
+                metrics.connect_errors += 1
+        if check_protocol:
+            device.set_available(connected)
+        return connected
+
+    async def authenticate(self) -> None:
+        """Authenticate to device. V3 only."""
+        device = self._device
+        if self._transport is None or self._loop is None:
+            _LOGGER.debug(
+                "[%s] authenticate failure, device transport is none",
+                device.device_id,
+            )
+            raise SocketException
+        request = device._security.encode_8370(device._token, MSGTYPE_HANDSHAKE_REQUEST)
+        _LOGGER.debug("[%s] Authentication handshaking", device.device_id)
+        self._auth_waiter = self._loop.create_future()
+        try:
+            self._transport.write(request)
+            async with asyncio.timeout(SOCKET_TIMEOUT):
+                response = await self._auth_waiter
+        finally:
+            self._auth_waiter = None
+        _LOGGER.debug(
+            "[%s] Received auth response with %d bytes: %s",
+            device.device_id,
+            len(response),
+            response.hex(),
+        )
+        if len(response) < MIN_AUTH_RESPONSE:
+            raise AuthException
+        device._security.tcp_key(response[8:72], device._key)
+        _LOGGER.debug("[%s] Authentication success", device.device_id)
+
+    async def refresh_status(self, check_protocol: bool = False) -> None:
+        """Refresh device status.
+
+        Without ``check_protocol`` the queries are only sent, the responses
+        are processed as they arrive. With ``check_protocol`` every query
+        waits up to QUERY_TIMEOUT for its response and the unanswered ones
+        are recorded as unsupported, as the threaded implementation does.
+        After ``set_pipelined_refresh`` the queries are sent at once.
+        """
+        device = self._device
+        if not check_protocol:
+            device.refresh_status()
+            return
+        if self._loop is None:
+            raise SocketException
+        cmds = device.refresh_queries()
+        if device._pipelined_refresh:
+            error_count = await self._check_queries_pipelined(cmds)
+        else:
+            error_count = 0
+            for cmd in cmds:
+                if cmd.__class__.__name__ in device._unsupported_protocol:
+                    _LOGGER.debug(
+                        "[%s] refresh_status with cmd: %s, unsupported protocol, SKIP",
+                        device.device_id,
+                        cmd,
+                    )
+                    error_count += 1
+                elif not await self._check_query(cmd):
+                    error_count += 1
+        if error_count == len(cmds):
+            _LOGGER.debug(
+                "[%s] all the query cmds failed %s, please report bug",
+                device.device_id,
+                cmds,
+            )
+            raise NoSupportedProtocol
+
+    async def _wait_result(self, delay: float) -> MessageResult:
+        """Wait up to delay seconds for the next message received."""
+        if self._loop is None or not self.connected:
+            raise SocketException
+        self._result_waiter = self._loop.create_future()
+        try:
+            async with asyncio.timeout(delay):
+                return await self._result_waiter
+        finally:
+            self._result_waiter = None
+
+    async def _check_query(self, cmd: MessageRequest) -> bool:
+        """Send a query alone and wait for its response, False if it failed."""
+        device = self._device
+        if not self.connected:
+            raise SocketException
+        device.build_send(cmd, query=True)
+        try:
+            result = await self._wait_result(QUERY_TIMEOUT)
+        except TimeoutError:
+            device._set_unsupported(cmd)
+            return False
+        if result != MessageResult.SUCCESS:
+            _LOGGER.debug(
+                "[%s] refresh_status ResponseException %s, cmd %s",
+                device.device_id,
+                cmd.__class__.__name__,
+                cmd,
+            )
+            return False
+        return True
+
+    async def _check_queries_pipelined(self, cmds: list[MessageRequest]) -> int:
+        """Check the supported queries as MideaDevice._refresh_status_pipelined.
+
+        Return the number of queries that failed.
+        """
+        device = self._device
+        inflight = _InflightQueries()
+        for cmd in cmds:
+            if cmd.__class__.__name__ in device._unsupported_protocol:
+                _LOGGER.debug(
+                    "[%s] refresh_status with cmd: %s, unsupported protocol, SKIP",
+                    device.device_id,
+                    cmd,
+                )
+                inflight.errors += 1
+            else:
+                device.build_send(cmd, query=True)
+                inflight.add(cmd, time.monotonic() + QUERY_TIMEOUT)
+        device._inflight = inflight
+        try:
+            while (timeout := inflight.expire(time.monotonic())) is not None:
+                with contextlib.suppress(TimeoutError):
+                    if await self._wait_result(timeout) == MessageResult.ERROR:
+                        inflight.error()
+        finally:
+            device._inflight = None
+        error_count = inflight.errors
+        for cmd in inflight.expired:
+            if inflight.ambiguous:
+                device._abandon_query(cmd)
+                if await self._check_query(cmd):
+                    continue
+            else:
+                device._set_unsupported(cmd)
+            error_count += 1
+        return error_count
+
+    async def _check_protocol(self) -> None:
+        """Check the supported queries and get capabilities, or use the cache."""
+        device = self._device
+        if device._cached_capabilities() is None:
+            await self.refresh_status(check_protocol=True)
+            device._store_capabilities()
+            device.get_capabilities()
+            return
+        _LOGGER.debug("[%s] Using cached capabilities", device.device_id)
+        device.refresh_status()
+        device._load_capabilities()
+
+    async def open(self) -> None:
+        """Start the connect/refresh/heartbeat task on the running loop."""
+        if not self._is_run:
+            self._is_run = True
+            self._task = asyncio.get_running_loop().create_task(
+                self._run(),
+                name=f"midea-device-{self._device.device_id}",
+            )
+
+    async def close(self) -> None:
+        """Stop the device task and close the transport."""
+        self._is_run = False
+        self._device.close_socket()
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def _next_timeout(self, now: float) -> float:
+        """Seconds until the next refresh, heartbeat or response deadline."""
+        device = self._device
+        deadlines = [
+            device._previous_heartbeat + device._heartbeat_interval,
+            self._previous_response + RESPONSE_TIMEOUT * SOCKET_TIMEOUT,
+        ]
+        if device._refresh_interval > 0:
+            deadlines.append(device._previous_refresh + device._refresh_interval)
+        return max(min(deadlines) - now, 0.0)
+
+    async def _service_loop(self) -> None:
+        """Run refresh and heartbeat timers while connected."""
+        device = self._device
+        start = time.time()
+        device._previous_refresh = device._previous_heartbeat = start
+        self._previous_response = start
+        while self._is_run and self.connected:
+            now = time.time()
+            try:
+                device._check_refresh(now)
+                device._check_heartbeat(now)
+            except NoSupportedProtocol:
+                _LOGGER.debug("[%s] No Supported protocol", device.device_id)
+            except (SocketException, OSError):
+                _LOGGER.debug("[%s] Socket error", device.device_id)
+                break
+            if now - self._previous_response >= RESPONSE_TIMEOUT * SOCKET_TIMEOUT:
+                _LOGGER.debug("[%s] Heartbeat timed out", device.device_id)
+                break
+            with contextlib.suppress(TimeoutError):
+                async with asyncio.timeout(self._next_timeout(time.time())):
+                    await self._disconnected.wait()
+
+    async def _run(self) -> None:
+        """Connect, then keep the device refreshed until closed."""
+        connection_retries = 0
+        while self._is_run:
+            if not await self.connect(check_protocol=True):
+                self._device.close_socket()
+                connection_retries += 1
+                sleep_time = min(
+                    5 * (2 ** (connection_retries - 1)),
+                    MAX_RECONNECT_SLEEP,
+                )
+                _LOGGER.warning(
+                    "[%s] Unable to connect, sleep %s seconds and retry",
+                    self._device.device_id,
+                    sleep_time,
+                )
+                await asyncio.sleep(sleep_time)
+                continue
+            connection_retries = 0
+            await self._service_loop()
+            self._device.close_socket()
@@ -0,0 +1,77 @@
+"""Midea local receive buffer."""
+
+import socket
+
+DEFAULT_BUFFER_SIZE = 2048
+
+
+class ReceiveBuffer:
+    """Reusable receive buffer for stream frame reassembly.
+
+    Data is received straight into a preallocated ``bytearray`` with
+    ``recv_into`` and exposed to the frame parsers as a ``memoryview``.
+    Consuming a frame only advances the read offset; the unread tail is moved
+    to the front of the buffer once, when the free space runs out, instead of
+    copying the whole buffer on every read.
+
+    Views returned by ``view`` must be released (``with buffer.view() as
+    view:``) before the next ``append`` or ``recv_into``.
+    """
+
+    def __init__(self, size: int = DEFAULT_BUFFER_SIZE) -> None:
+        """Initialize receive buffer."""
+        self._data = bytearray(size)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self) -> int:
+        """Return the number of unread bytes."""
+        return self._end - self._start
+
+    def _reserve(self, size: int) -> None:
+        """Make room for ``size`` bytes after the unread data."""
+        if self._start == self._end:
+            self._start = self._end = 0
+        elif self._start and len(self._data) - self._end < size:
+            length = self._end - self._start
+            with memoryview(self._data) as data:
+                data[:length] = data[self._start : self._end]
+            self._start, self._end = 0, length
+        missing = self._end + size - len(self._data)
+        if missing > 0:
+            self._data.extend(bytes(max(missing, len(self._data))))
+
+    def append(self, data: bytes | bytearray | memoryview) -> None:
+        """Append received data."""
+        size = len(data)
+        if size == 0:
+            return
+        self._reserve(size)
+        self._data[self._end : self._end + size] = data
+        self._end += size
+
+    def recv_into(self, sock: socket.socket, size: int = 512) -> int:
+        """Receive up to ``size`` bytes from the socket into the buffer."""
+        self._reserve(size)
+        with memoryview(self._data) as data:
+            received = sock.recv_into(data[self._end :], size)
+        self._end += received
+        return received
+
+    def view(self) -> memoryview:
+        """Return a view of the unread data."""
+        return memoryview(self._data)[self._start : self._end]
+
+    def consume(self, size: int) -> None:
+        """Mark ``size`` bytes as read."""
+        self._start = min(self._start + size, self._end)
+        if self._start == self._end:
+            self._start = self._end = 0
+
+    def clear(self) -> None:
+        """Drop all unread data."""
+        self._start = self._end = 0
+
+    def hex(self) -> str:
+        """Return the unread data as hex string."""
+        return self._data[self._start : self._end].hex()
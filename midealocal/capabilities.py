@@ -0,0 +1,170 @@
+"""Midea local persistent capability cache."""
+
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from .storage import write_json_atomic
+
+_LOGGER = logging.getLogger(__name__)
+
+CACHE_VERSION = 2
+# seconds the results of a probe are used before the device is probed again
+DEFAULT_TTL = 30 * 24 * 3600.0
+
+
+class DeviceCapabilities:
+    """Protocol check results of one device."""
+
+    def __init__(
+        self,
+        protocol_version: int,
+        unsupported: list[str] | None = None,
+        capabilities: list[bytes] | None = None,
+        updated: float | None = None,
+    ) -> None:
+        """Initialize device capabilities.
+
+        ``unsupported`` are the query classes the device does not answer,
+        ``capabilities`` the decrypted responses to its capabilities queries.
+        """
+        self.protocol_version = protocol_version
+        self.unsupported = unsupported or []
+        self.capabilities = capabilities or []
+        self.updated = time.time() if updated is None else updated
+
+    def to_dict(self) -> dict[str, Any]:
+        """Serialize to a JSON compatible dict."""
+        return {
+            "protocol_version": self.protocol_version,
+            "unsupported": self.unsupported,
+            "capabilities": [message.hex() for message in self.capabilities],
+            "updated": self.updated,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "DeviceCapabilities":
+        """Deserialize from a dict of to_dict."""
+        return cls(
+            protocol_version=int(data["protocol_version"]),
+            unsupported=[str(name) for name in data.get("unsupported", [])],
+            capabilities=[
+                bytes.fromhex(message) for message in data.get("capabilities", [])
+            ],
+            updated=float(data.get("updated", 0)),
+        )
+
+
+class CapabilityCache:
+    """Capabilities of devices by id, model, subtype and protocol in a JSON file.
+
+    The file is read once, written atomically and shared by the devices of a
+    process, from any thread. Entries older than ``ttl`` seconds are ignored,
+    so their devices are probed again.
+    """
+
+    def __init__(self, path: str | Path, ttl: float = DEFAULT_TTL) -> None:
+        """Initialize capability cache."""
+        self._path = Path(path)
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: dict[str, DeviceCapabilities] = {}
+        self._dirty = False
+        self._load()
+
+    @property
+    def path(self) -> Path:
+        """Cache file path."""
+        return self._path
+
+    @staticmethod
+    def key(device_id: int, model: str, subtype: int, protocol: int) -> str:
+        """Cache key of a device."""
+        return f"{device_id}:{model}:{subtype}:{protocol}"
+
+    def get(
+        self,
+        device_id: int,
+        model: str,
+        subtype: int,
+        protocol: int,
+    ) -> DeviceCapabilities | None:
+        """Return the cached capabilities of a device, unless expired."""
+        with self._lock:
+            entry = self._entries.get(self.key(device_id, model, subtype, protocol))
+        if entry is None or time.time() - entry.updated >= self._ttl:
+            return None
+        return entry
+
+    def set(
+        self,
+        device_id: int,
+        model: str,
+        subtype: int,
+        protocol: int,
+        capabilities: DeviceCapabilities,
+        save: bool = True,
+    ) -> None:
+        """Store the capabilities of a device.
+
+        Without ``save`` the file is written by the next ``save`` or change.
+        """
+        capabilities.updated = time.time()
+        with self._lock:
+            self._entries[self.key(device_id, model, subtype, protocol)] = capabilities
+            if save:
+                self._save()
+            else:
+                self._dirty = True
+
+    def save(self) -> None:
+        """Write the changes stored without save."""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def remove(self, device_id: int, model: str, subtype: int, protocol: int) -> None:
+        """Forget the capabilities of a device."""
+        key = self.key(device_id, model, subtype, protocol)
+        with self._lock:
+            if self._entries.pop(key, None):
+                self._save()
+
+    def clear(self) -> None:
+        """Forget all capabilities."""
+        with self._lock:
+            self._entries.clear()
+            self._save()
+
+    def _load(self) -> None:
+        try:
+            with self._path.open(encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != CACHE_VERSION:
+                _LOGGER.debug(
+                    "Ignoring capability cache version %s",
+                    data.get("version"),
+                )
+                return
+            self._entries = {
+                key: DeviceCapabilities.from_dict(entry)
+                for key, entry in data["devices"].items()
+            }
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            _LOGGER.warning("Ignoring invalid capability cache %s: %s", self._path, e)
+
+    def _save(self) -> None:
+        self._dirty = False
+        data = {
+            "version": CACHE_VERSION,
+            "devices": {key: entry.to_dict() for key, entry in self._entries.items()},
+        }
+        try:
+            write_json_atomic(self._path, data)
+        except OSError as e:
+            _LOGGER.warning("Unable to write capability cache %s: %s", self._path, e)
@@ -17,9 +17,11 @@ from colorlog import ColoredFormatter
 from midealocal.cloud import (
     SUPPORTED_CLOUDS,
     MideaCloud,
+    get_cloud_connector,
     get_midea_cloud,
     get_preset_account_cloud,
 )
+from midealocal.cloud_session import CloudSessionStore
 from midealocal.const import ProtocolVersion
 from midealocal.device import (
     AuthException,
@@ -27,8 +29,11 @@ from midealocal.device import (
     NoSupportedProtocol,
 )
 from midealocal.devices import device_selector
-from midealocal.discover import discover
+from midealocal.discover import async_discover_sweep, discover
+from midealocal.discovery_cache import DiscoveryCache
 from midealocal.exceptions import SocketException
+from midealocal.keystore import KeyStore
+from midealocal.lua_cache import LuaCache
 from midealocal.version import __version__
 
 _LOGGER = logging.getLogger("cli")
@@ -47,7 +52,7 @@ class MideaCLI:
     async def _get_cloud(self) -> MideaCloud:
         """Get cloud instance."""
         if not hasattr(self, "session"):
-            self.session = aiohttp.ClientSession()
+            self.session = aiohttp.ClientSession(connector=get_cloud_connector())
 
         if (
             not self.namespace.cloud_name
@@ -56,19 +61,24 @@ class MideaCLI:
         ):
             default_cloud = get_preset_account_cloud()
             _LOGGER.info("Using preset account.")
-            return get_midea_cloud(
+            cloud = get_midea_cloud(
                 cloud_name=default_cloud["cloud_name"],
                 session=self.session,
                 account=default_cloud["username"],
                 password=default_cloud["password"],
             )
-
-        return get_midea_cloud(
-            cloud_name=self.namespace.cloud_name,
-            session=self.session,
-            account=self.namespace.username,
-            password=self.namespace.password,
-        )
+        else:
+            cloud = get_midea_cloud(
+                cloud_name=self.namespace.cloud_name,
+                session=self.session,
+                account=self.namespace.username,
+                password=self.namespace.password,
+            )
+        path = getattr(self.namespace, "cloud_session", None)
+        cloud.set_session_store(CloudSessionStore(path) if path else None)
+        path = getattr(self.namespace, "lua_cache", None)
+        cloud.set_lua_cache(LuaCache(path) if path else None)
+        return cloud
 
     async def _get_keys(self, device_id: int) -> dict[int, dict[str, Any]]:
         cloud = await self._get_cloud()
@@ -82,9 +92,57 @@ class MideaCLI:
 
         return {**cloud_keys, **default_keys}
 
+    async def _get_keys_many(
+        self,
+        device_ids: list[int],
+    ) -> dict[int, dict[int, dict[str, Any]]]:
+        """Get the keys of many devices, with a single login."""
+        if not device_ids:
+            return {}
+        cloud = await self._get_cloud()
+        default_keys = await cloud.get_default_keys()
+        if not await cloud.login():
+            _LOGGER.warning(
+                "Failed to authenticate to the cloud. Using only default keys.",
+            )
+            return dict.fromkeys(device_ids, default_keys)
+        cloud_keys = await cloud.get_cloud_keys_many(device_ids)
+        return {
+            device_id: {**cloud_keys.get(device_id, {}), **default_keys}
+            for device_id in device_ids
+        }
+
+    async def _discover(self, host: str | None) -> dict[int, dict[str, Any]]:
+        """Discover devices, of ``host`` only when set, through the cache.
+
+        A device cached for ``host`` is used as is while fresh, a stale one
+        is validated with a single probe, other lookups discover again.
+        """
+        path = getattr(self.namespace, "discovery_cache", None)
+        cache = DiscoveryCache(path) if path else None
+        if cache is not None and host:
+            entry = cache.find(host)
+            if entry is not None and cache.is_fresh(entry):
+                return {entry["device_id"]: entry}
+            if entry is not None:
+                device = await cache.async_validate(entry["device_id"])
+                if device is not None:
+                    return {device["device_id"]: device}
+        devices = discover(ip_address=host)
+        if cache is not None:
+            await cache.async_update(devices.values())
+        return devices
+
     async def discover(self) -> list[MideaDevice]:
         """Discover device information."""
-        devices = discover(ip_address=self.namespace.host)
+        networks = getattr(self.namespace, "network", None)
+        if networks:
+            devices = {
+                device["device_id"]: device
+                async for device in async_discover_sweep(networks)
+            }
+        else:
+            devices = await self._discover(self.namespace.host)
 
         device_list: list[MideaDevice] = []
         if len(devices) == 0:
@@ -93,46 +151,101 @@ class MideaCLI:
 
         # Dump only basic device info from the base class
         _LOGGER.info("Found %d devices.", len(devices))
+        store = self._key_store()
+        v3_ids = [
+            device["device_id"]
+            for device in devices.values()
+            if device["protocol"] == ProtocolVersion.V3
+        ]
+        stored_keys = {
+            device_id: keys
+            for device_id in v3_ids
+            if store is not None and (keys := store.get(device_id))
+        }
+        missing = [device_id for device_id in v3_ids if device_id not in stored_keys]
+        v3_keys = {
+            **(await self._get_keys_many(missing) if missing else {}),
+            **stored_keys,
+        }
         for device in devices.values():
-            keys = (
-                {0: {"token": "", "key": ""}}
-                if device["protocol"] != ProtocolVersion.V3
-                else await self._get_keys(device["device_id"])
-            )
-
-            for key in keys.values():
-                dev = device_selector(
-                    name=device["device_id"],
-                    device_id=device["device_id"],
-                    device_type=device["type"],
-                    ip_address=device["ip_address"],
-                    port=device["port"],
-                    token=key["token"],
-                    key=key["key"],
-                    device_protocol=device["protocol"],
-                    model=device["model"],
-                    subtype=0,
-                    customize="",
-                )
-                _LOGGER.debug("Opening socket for device.")
-                if dev.connect():
-                    try:
-                        if device["protocol"] == ProtocolVersion.V3:
-                            _LOGGER.debug("Trying to connect with key: %s", key)
-                            dev.authenticate()
-                        _LOGGER.debug("Trying to retrieve device attributes.")
-                        dev.refresh_status(True)
-                    except AuthException:
-                        _LOGGER.debug("Unable to connect with key: %s", key)
-                    except SocketException:
-                        _LOGGER.exception("Device socket closed.")
-                    except NoSupportedProtocol:
-                        _LOGGER.exception("Unable to retrieve device attributes.")
-                    else:
-                        _LOGGER.info("Found device:\n%s", dev.attributes)
-                        device_list.append(dev)
+            device_id = device["device_id"]
+            keys = v3_keys.get(device_id, {0: {"token": "", "key": ""}})
+            try:
+                connected = self._connect(device, keys)
+            except AuthException:
+                if device_id not in stored_keys or store is None:
+                    continue
+                # the stored keys are outdated, fetch them again
+                _LOGGER.info("Stored keys of %s rejected, renewing them.", device_id)
+                store.remove(device_id)
+                stored_keys.pop(device_id)
+                keys = (await self._get_keys_many([device_id]))[device_id]
+                try:
+                    connected = self._connect(device, keys)
+                except AuthException:
+                    continue
+            if connected is None:
+                continue
+            method, dev = connected
+            if store is not None and device_id in v3_keys:
+                if device_id not in stored_keys:
+                    store.set_keys(device_id, keys)
+                store.record_success(device_id, method)
+            device_list.append(dev)
         return device_list
 
+    def _key_store(self) -> KeyStore | None:
+        """Get the key store, unless disabled."""
+        path = getattr(self.namespace, "key_store", None)
+        return KeyStore(path) if path else None
+
+    def _connect(
+        self,
+        device: dict[str, Any],
+        keys: dict[int, dict[str, Any]],
+    ) -> tuple[int, MideaDevice] | None:
+        """Connect to a device with the first key that authenticates.
+
+        Return the method of the key and the device, raise ``AuthException``
+        when the device rejected every key.
+        """
+        rejected = 0
+        for method, key in keys.items():
+            dev = device_selector(
+                name=device["device_id"],
+                device_id=device["device_id"],
+                device_type=device["type"],
+                ip_address=device["ip_address"],
+                port=device["port"],
+                token=key["token"],
+                key=key["key"],
+                device_protocol=device["protocol"],
+                model=device["model"],
+                subtype=0,
+                customize="",
+            )
+            _LOGGER.debug("Opening socket for device.")
+            if device["protocol"] == ProtocolVersion.V3:
+                _LOGGER.debug("Trying to connect with key: %s", key)
+            if not dev.connect():
+                if dev.auth_failed:
+                    _LOGGER.debug("Unable to connect with key: %s", key)
+                    rejected += 1
+                continue
+            try:
+                _LOGGER.debug("Trying to retrieve device attributes.")
+                dev.refresh_status(True)
+            except SocketException:
+                _LOGGER.exception("Device socket closed.")
+            except NoSupportedProtocol:
+                _LOGGER.exception("Unable to retrieve device attributes.")
+            else:
+                _LOGGER.info("Found device:\n%s", dev.attributes)
+                return method, dev
+        if keys and rejected == len(keys):
+            raise AuthException
+        return None
+
     def message(self) -> None:
         """Load message into device."""
         device_type = int(self.namespace.message[2])
@@ -174,7 +287,7 @@ class MideaCLI:
         model: str | None = None
 
         if self.namespace.host:
-            devices = discover(ip_address=self.namespace.host)
+            devices = await self._discover(self.namespace.host)
 
             if len(devices) == 0:
                 _LOGGER.error("No devices found.")
@@ -314,6 +427,64 @@ def main() -> NoReturn:
         help="Set Cloud name",
         choices=SUPPORTED_CLOUDS.keys(),
     )
+    common_parser.add_argument(
+        "--discovery-cache",
+        type=Path,
+        help="Discovery cache file, reused for devices looked up by host.",
+        default=platformdirs.user_cache_path(appname="midea-local").joinpath(
+            "discovery.json",
+        ),
+    )
+    common_parser.add_argument(
+        "--no-discovery-cache",
+        help="Always discover devices again.",
+        dest="discovery_cache",
+        action="store_const",
+        const=None,
+    )
+    common_parser.add_argument(
+        "--key-store",
+        type=Path,
+        help="Encrypted store of V3 device keys, checked before the cloud.",
+        default=platformdirs.user_data_path(appname="midea-local").joinpath(
+            "keys.json",
+        ),
+    )
+    common_parser.add_argument(
+        "--no-key-store",
+        help="Always get V3 device keys from the cloud.",
+        dest="key_store",
+        action="store_const",
+        const=None,
+    )
+    common_parser.add_argument(
+        "--cloud-session",
+        type=Path,
+        help="Encrypted store of cloud logins, reused until they expire.",
+        default=platformdirs.user_data_path(appname="midea-local").joinpath(
+            "cloud_session.json",
+        ),
+    )
+    common_parser.add_argument(
+        "--no-cloud-session",
+        help="Always log in to the cloud again.",
+        dest="cloud_session",
+        action="store_const",
+        const=None,
+    )
+    common_parser.add_argument(
+        "--lua-cache",
+        type=Path,
+        help="Directory of downloaded lua scripts, reused until the cloud changes.",
+        default=platformdirs.user_cache_path(appname="midea-local").joinpath("lua"),
+    )
+    common_parser.add_argument(
+        "--no-lua-cache",
+        help="Always download lua scripts again.",
+        dest="lua_cache",
+        action="store_const",
+        const=None,
+    )
 
     # Setup discover parser
     discover_parser = subparsers.add_parser(
@@ -326,6 +497,12 @@ def main() -> NoReturn:
         help="Hostname or IP address of a single device to discover.",
         default=None,
     )
+    discover_parser.add_argument(
+        "--network",
+        help="CIDR range to sweep with unicast probes, may be repeated.",
+        action="append",
+        default=None,
+    )
     discover_parser.set_defaults(func=cli.discover)
 
     decode_msg_parser = subparsers.add_parser(
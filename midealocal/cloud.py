@@ -1,30 +1,62 @@
 """Midea Local cloud."""
 
+import asyncio
 import base64
 import json
 import logging
+import random
 import re
 import time
+from collections.abc import Iterable, Mapping
 from datetime import UTC, datetime
 from http import HTTPStatus
 from secrets import token_hex
-from threading import Lock
-from typing import Any, cast
+from typing import Any, ClassVar, cast
 
 import aiofiles
-from aiohttp import ClientConnectionError, ClientSession, ClientTimeout
+from aiohttp import ClientConnectionError, ClientSession, ClientTimeout, TCPConnector
 from commonregex import CommonRegex
 
 from midealocal.exceptions import ElementMissing
 
+from .cloud_session import CloudSessionStore
+from .lua_cache import LuaCache
 from .security import (
     CloudSecurity,
     MeijuCloudSecurity,
     MideaAirSecurity,
     MSmartCloudSecurity,
+    UdpIdMethod,
 )
 
 SN8_MIN_SERIAL_LENGTH = 17
+# cloud API requests in flight at once per cloud client
+API_CONCURRENCY = 8
+# response codes of a rejected access token, a new login is needed
+AUTH_ERROR_CODES = frozenset({3106, 40001, 40002})
+# request fields renewed when a request is sent again after a new login
+RENEWED_FIELDS = ("reqId", "stamp", "uid", "sessionId")
+# request fields ignored when matching identical requests in flight
+VOLATILE_FIELDS = ("reqId", "stamp", "sign")
+# attempts of a request, retried after a random delay up to the backoff,
+# doubled on each retry
+API_ATTEMPTS = 3
+API_BACKOFF = 0.5
+API_BACKOFF_MAX = 8.0
+# seconds before a request is abandoned, by endpoint
+API_TIMEOUT = 10.0
+ENDPOINT_TIMEOUTS = {
+    "/mj/user/login": 20.0,
+    "/v1/user/login": 20.0,
+    "/v1/appliance/user/list/get": 20.0,
+    "/v1/appliance/home/list/get": 20.0,
+    "/v1/appliance/protocol/lua/luaGet": 30.0,
+    "/v2/luaEncryption/luaGet": 30.0,
+}
+# connections of the cloud HTTP session, kept alive between requests
+CONNECTION_LIMIT = 2 * API_CONCURRENCY
+KEEPALIVE_TIMEOUT = 60.0
+DNS_CACHE_TTL = 300
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -115,6 +147,30 @@ def get_preset_account_cloud() -> dict[str, str]:
 block = "\u2588"
 
 
+def get_cloud_connector() -> TCPConnector:
+    """Get a connection pool sized for the cloud API concurrency."""
+    return TCPConnector(
+        limit=CONNECTION_LIMIT,
+        limit_per_host=API_CONCURRENCY,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=DNS_CACHE_TTL,
+    )
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Return a random delay before a retry, up to a backoff doubled each time."""
+    backoff = min(API_BACKOFF_MAX, API_BACKOFF * 2 ** (attempt - 1))
+    # the jitter only spreads retries in time, no need for a secure random
+    return random.uniform(0, backoff)  # noqa: S311
+
+
+def _lua_model(sn: str, model_number: str | None) -> str:
+    """Return the model a lua script is downloaded for, its sn8 when known."""
+    if len(sn) > SN8_MIN_SERIAL_LENGTH:
+        return sn[9:17]
+    return model_number or sn
+
+
 def _redact_data(data: str) -> str:
     """Redact sensitive data."""
     cr = CommonRegex(data)
@@ -140,6 +196,11 @@ def _redact_data(data: str) -> str:
 class MideaCloud:
     """Midea Cloud."""
 
+    # session store of the clouds created without set_session_store
+    default_session_store: ClassVar[CloudSessionStore | None] = None
+    # lua cache of the clouds created without set_lua_cache
+    default_lua_cache: ClassVar[LuaCache | None] = None
+
     def __init__(
         self,
         session: ClientSession,
@@ -154,7 +215,11 @@ class MideaCloud:
         self._device_id = CloudSecurity.get_deviceid(account)
         self._session = session
         self._security = security
-        self._api_lock = Lock()
+        self._api_lock = asyncio.Semaphore(API_CONCURRENCY)
+        self._login_lock = asyncio.Lock()
+        self._in_flight: dict[str, asyncio.Future[dict | None]] = {}
+        self._session_store = MideaCloud.default_session_store
+        self._lua_cache = MideaCloud.default_lua_cache
         self._app_id = app_id
         self._app_key = app_key
         self._account = account
@@ -164,6 +229,40 @@ class MideaCloud:
         self._uid: str | None = None
         self._login_id = ""
 
+    def set_session_store(self, store: CloudSessionStore | None) -> None:
+        """Reuse the logins kept in ``store``, or always log in without it."""
+        self._session_store = store
+
+    def set_lua_cache(self, cache: LuaCache | None) -> None:
+        """Reuse the lua scripts kept in ``cache``, or always download them."""
+        self._lua_cache = cache
+
+    @property
+    def _session_name(self) -> str:
+        return f"{self._app_id}:{self._account}"
+
+    def _session_state(self) -> dict[str, Any]:
+        aes_keys = self._security.aes_keys
+        return {
+            "api_url": self._api_url,
+            "access_token": self._access_token,
+            "uid": self._uid,
+            "login_id": self._login_id,
+            "aes_key": aes_keys[0].hex() if aes_keys else None,
+            "aes_iv": aes_keys[1].hex() if aes_keys else None,
+        }
+
+    def _restore_session_state(self, state: dict[str, Any]) -> None:
+        self._api_url = state["api_url"]
+        self._access_token = state["access_token"]
+        self._uid = state["uid"]
+        self._login_id = state["login_id"]
+        if state["aes_key"] is not None and state["aes_iv"] is not None:
+            self._security.aes_keys = (
+                bytes.fromhex(state["aes_key"]),
+                bytes.fromhex(state["aes_iv"]),
+            )
+
     def _make_general_data(self) -> dict[Any, Any]:
         return {}
 
@@ -173,7 +272,75 @@ class MideaCloud:
         data: dict[str, Any],
         header: dict[str, Any] | None = None,
     ) -> dict | None:
-        header = header or {}
+        """Send a request, sharing the response of an identical one in flight."""
+        key = json.dumps(
+            [
+                endpoint,
+                {k: v for k, v in data.items() if k not in VOLATILE_FIELDS},
+                header,
+            ],
+            sort_keys=True,
+            default=str,
+        )
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._api_exchange(endpoint, data, header))
+            self._in_flight[key] = future
+
+            def done(_: asyncio.Future[dict | None]) -> None:
+                if self._in_flight.get(key) is future:
+                    del self._in_flight[key]
+
+            future.add_done_callback(done)
+        else:
+            _LOGGER.debug("Sharing the response of %s in flight", endpoint)
+        # a cancelled caller must not cancel the request of the others
+        return await asyncio.shield(future)
+
+    async def _api_exchange(
+        self,
+        endpoint: str,
+        data: dict[str, Any],
+        header: dict[str, Any] | None,
+    ) -> dict | None:
+        """Send a request, logging in again once when the token is rejected."""
+        access_token = self._access_token
+        response = await self._api_send(endpoint, dict(data), dict(header or {}))
+        if (
+            access_token is not None
+            and self._auth_failed(response)
+            and await self._relogin(access_token)
+        ):
+            general = self._make_general_data()
+            data = {
+                **{k: v for k, v in data.items() if k not in RENEWED_FIELDS},
+                **{k: general[k] for k in RENEWED_FIELDS if k in data and k in general},
+            }
+            response = await self._api_send(endpoint, data, dict(header or {}))
+        return self._api_result(response)
+
+    def _auth_failed(self, response: dict) -> bool:
+        return int(response["code"]) in AUTH_ERROR_CODES
+
+    def _api_result(self, response: dict) -> dict | None:
+        if int(response["code"]) == 0 and "data" in response:
+            return cast(dict, response["data"])
+        return None
+
+    async def _relogin(self, access_token: str) -> bool:
+        async with self._login_lock:
+            if self._access_token != access_token:
+                # logged in again by a concurrent request
+                return self._access_token is not None
+            _LOGGER.info("Cloud access token rejected, logging in again")
+            return await self.login(force=True)
+
+    async def _api_send(
+        self,
+        endpoint: str,
+        data: dict[str, Any],
+        header: dict[str, Any],
+    ) -> dict:
         if not data.get("reqId"):
             data.update({"reqId": token_hex(16)})
         if not data.get("stamp"):
@@ -196,35 +363,50 @@ class MideaCloud:
             header.update({"uid": self._uid})
         if self._access_token is not None:
             header.update({"accessToken": self._access_token})
-        response: dict = {"code": -1}
-        for _ in range(3):
+        return await self._api_post(endpoint, url, header, dump_data, {"code": -1})
+
+    async def _api_post(
+        self,
+        endpoint: str,
+        url: str,
+        header: dict[str, Any],
+        body: str | dict[str, Any],
+        failure: dict,
+    ) -> dict:
+        """Post a prepared request, retried with backoff on transport errors.
+
+        The API lock is only held while a request is in flight, not while
+        waiting for a retry. Return ``failure`` once all attempts failed.
+        """
+        timeout = ClientTimeout(ENDPOINT_TIMEOUTS.get(endpoint, API_TIMEOUT))
+        for attempt in range(API_ATTEMPTS):
+            if attempt:
+                await asyncio.sleep(_backoff_delay(attempt))
             try:
-                with self._api_lock:
+                async with self._api_lock:
                     r = await self._session.request(
                         "POST",
                         url,
                         headers=header,
-                        data=dump_data,
-                        timeout=ClientTimeout(10),
+                        data=body,
+                        timeout=timeout,
                     )
                     raw = await r.read()
-                    _LOGGER.debug(
-                        "Midea cloud API url: %s, data: %s, response: %s",
-                        url,
-                        _redact_data(str(data)),
-                        _redact_data(str(raw)),
-                    )
-                    response = json.loads(raw)
-                    break
+                _LOGGER.debug(
+                    "Midea cloud API url: %s, data: %s, response: %s",
+                    url,
+                    _redact_data(str(body)),
+                    _redact_data(str(raw)),
+                )
+                return cast(dict, json.loads(raw))
             except (TimeoutError, ClientConnectionError, json.JSONDecodeError) as e:
                 _LOGGER.warning(
-                    "Midea cloud API error, url: %s, error: %s",
+                    "Midea cloud API error, url: %s, attempt: %d, error: %s",
                     url,
+                    attempt + 1,
                     repr(e),
                 )
-        if int(response["code"]) == 0 and "data" in response:
-            return cast(dict, response["data"])
-        return None
+        return failure
 
     async def _get_login_id(self) -> str | None:
         data = self._make_general_data()
@@ -236,8 +418,30 @@ class MideaCloud:
             return response.get("loginId")
         return None
 
-    async def login(self) -> bool:
-        """Authenticate."""
+    async def login(self, force: bool = False) -> bool:
+        """Authenticate, reusing the stored session unless ``force`` is set."""
+        store = self._session_store
+        if not force and store is not None:
+            state = store.get(self._session_name)
+            if state is not None:
+                try:
+                    self._restore_session_state(state)
+                except (KeyError, TypeError, ValueError) as e:
+                    _LOGGER.debug("Ignoring invalid cloud session: %s", e)
+                else:
+                    _LOGGER.debug("Reusing cloud session of %s", self._device_id)
+                    return True
+        # the former token must not be sent, nor rejected again, while logging in
+        self._access_token = None
+        if not await self._login():
+            if store is not None:
+                store.remove(self._session_name)
+            return False
+        if store is not None:
+            store.set(self._session_name, self._session_state())
+        return True
+
+    async def _login(self) -> bool:
         raise NotImplementedError
 
     @staticmethod
@@ -247,30 +451,57 @@ class MideaCloud:
 
     async def get_cloud_keys(self, appliance_id: int) -> dict[int, dict[str, Any]]:
         """Get keys for device."""
-        result = {}
-        for method in [1, 2]:
-            udp_id = self._security.get_udp_id(appliance_id, method)
-            data = self._make_general_data()
-            data.update({"udpid": udp_id})
-            response = await self._api_request(
-                endpoint="/v1/iot/secure/getToken",
-                data=data,
-            )
-            _LOGGER.debug(
-                "Response from get_keys() for appliance_id %s with method %s: %s",
-                appliance_id,
-                method,
-                response,
-            )
-            if response and "tokenlist" in response:
-                for token in response["tokenlist"]:
-                    if token["udpId"] == udp_id:
-                        result[method] = {
-                            "token": token["token"].lower(),
-                            "key": token["key"].lower(),
-                        }
+        return (await self.get_cloud_keys_many([appliance_id]))[appliance_id]
+
+    async def get_cloud_keys_many(
+        self,
+        appliance_ids: Iterable[int],
+        concurrency: int = API_CONCURRENCY,
+    ) -> dict[int, dict[int, dict[str, Any]]]:
+        """Get keys for many devices, by appliance id then udp id method.
+
+        Each distinct udp id is requested once, ``concurrency`` requests at
+        a time, within the limit of the API lock shared by all requests.
+        """
+        owners: dict[str, list[tuple[int, int]]] = {}
+        result: dict[int, dict[int, dict[str, Any]]] = {}
+        for appliance_id in appliance_ids:
+            result[appliance_id] = {}
+            for method in (UdpIdMethod.BIG, UdpIdMethod.LITTLE):
+                udp_id = self._security.get_udp_id(appliance_id, method)
+                if udp_id is not None:
+                    owners.setdefault(udp_id, []).append((appliance_id, int(method)))
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def get_token(udp_id: str) -> dict[str, Any] | None:
+            async with semaphore:
+                return await self._get_token(udp_id)
+
+        tokens = await asyncio.gather(*(get_token(udp_id) for udp_id in owners))
+        for (udp_id, appliances), token in zip(owners.items(), tokens, strict=True):
+            _LOGGER.debug("Keys of udp id %s for %s: %s", udp_id, appliances, token)
+            if token is not None:
+                for appliance_id, udp_id_method in appliances:
+                    result[appliance_id][udp_id_method] = dict(token)
         return result
 
+    async def _get_token(self, udp_id: str) -> dict[str, Any] | None:
+        data = self._make_general_data()
+        data.update({"udpid": udp_id})
+        response = await self._api_request(
+            endpoint="/v1/iot/secure/getToken",
+            data=data,
+        )
+        _LOGGER.debug("Response from getToken for udp id %s: %s", udp_id, response)
+        if response and "tokenlist" in response:
+            for token in response["tokenlist"]:
+                if token["udpId"] == udp_id:
+                    return {
+                        "token": token["token"].lower(),
+                        "key": token["key"].lower(),
+                    }
+        return None
+
     @staticmethod
     async def get_cloud_servers() -> dict[int, str]:
         """Get available cloud servers."""
@@ -306,6 +537,96 @@ class MideaCloud:
         """Download lua integration."""
         raise NotImplementedError
 
+    async def download_lua_many(
+        self,
+        path: str,
+        appliances: Mapping[int, Mapping[str, Any]],
+        concurrency: int = API_CONCURRENCY,
+    ) -> dict[int, str | None]:
+        """Download the lua integrations of many appliances, by appliance id.
+
+        ``appliances`` are the appliances of ``list_appliances``. Each script
+        is downloaded once per type and model, ``concurrency`` at a time.
+        """
+        # appliances sharing a script, by type, model and manufacturer
+        models: dict[tuple[int, str, str | None, str], tuple[str, list[int]]] = {}
+        for appliance_id, appliance in appliances.items():
+            sn = str(appliance["sn"])
+            model_number = str(appliance.get("model_number") or "") or None
+            model = (
+                int(appliance["type"]),
+                _lua_model(sn, model_number),
+                model_number,
+                str(appliance.get("manufacturer_code") or "0000"),
+            )
+            models.setdefault(model, (sn, []))[1].append(appliance_id)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def download(
+            model: tuple[int, str, str | None, str],
+            sn: str,
+        ) -> str | None:
+            device_type, _, model_number, manufacturer_code = model
+            async with semaphore:
+                return await self.download_lua(
+                    path,
+                    device_type,
+                    sn,
+                    model_number,
+                    manufacturer_code,
+                )
+
+        files = await asyncio.gather(
+            *(download(model, sn) for model, (sn, _) in models.items()),
+        )
+        return {
+            appliance_id: file
+            for (_, owners), file in zip(models.values(), files, strict=True)
+            for appliance_id in owners
+        }
+
+    async def _save_lua(
+        self,
+        path: str,
+        device_type: int,
+        model: str,
+        response: dict[str, Any],
+    ) -> str | None:
+        """Write the lua script of a luaGet response, from the cache if there.
+
+        The file is not written again when it already holds the script.
+        """
+        file_name = response["fileName"]
+        cache = self._lua_cache
+        key = LuaCache.key(device_type, model, file_name, response.get("md5") or "")
+        stream = cache.get(key) if cache is not None else None
+        if stream is None:
+            res = await self._session.get(response["url"])
+            if res.status != HTTPStatus.OK:
+                return None
+            lua = await res.text()
+            if not lua:
+                return None
+            stream = (
+                'local bit = require "bit"\n'
+                + self._security.aes_decrypt_with_fixed_key(lua)
+            )
+            stream = stream.replace("\r\n", "\n")
+            if cache is not None:
+                cache.set(key, stream)
+        else:
+            _LOGGER.debug("Using cached lua script %s", key)
+        fnm = f"{path}/{file_name}"
+        try:
+            async with aiofiles.open(fnm, encoding="utf-8") as fp:
+                if await fp.read() == stream:
+                    return fnm
+        except (OSError, UnicodeDecodeError):
+            pass
+        async with aiofiles.open(fnm, "w") as fp:
+            await fp.write(stream)
+        return fnm
+
 
 class MeijuCloud(MideaCloud):
     """Meiju Cloud."""
@@ -333,7 +654,7 @@ class MeijuCloud(MideaCloud):
             api_url=cloud_data["api_url"],
         )
 
-    async def login(self) -> bool:
+    async def _login(self) -> bool:
         """Authenticate to Meiju Cloud."""
         if login_id := await self._get_login_id():
             self._login_id = login_id
@@ -509,7 +830,7 @@ class MeijuCloud(MideaCloud):
         path: str,
         device_type: int,
         sn: str,
-        model_number: str | None = None,  # noqa: ARG002
+        model_number: str | None = None,
         manufacturer_code: str = "0000",
     ) -> str | None:
         """Download lua integration."""
@@ -525,19 +846,13 @@ class MeijuCloud(MideaCloud):
             endpoint="/v1/appliance/protocol/lua/luaGet",
             data=data,
         ):
-            res = await self._session.get(response["url"])
-            if res.status == HTTPStatus.OK:
-                lua = await res.text()
-                if lua:
-                    stream = (
-                        'local bit = require "bit"\n'
-                        + self._security.aes_decrypt_with_fixed_key(lua)
-                    )
-                    stream = stream.replace("\r\n", "\n")
-                    fnm = f"{path}/{response['fileName']}"
-                    async with aiofiles.open(fnm, "w") as fp:
-                        await fp.write(stream)
-        return str(fnm) if fnm else None
+            fnm = await self._save_lua(
+                path,
+                device_type,
+                _lua_model(sn, model_number),
+                response,
+            )
+        return fnm
 
 
 class SmartHomeCloud(MideaCloud):
@@ -584,18 +899,17 @@ class SmartHomeCloud(MideaCloud):
             "appId": self._app_id,
         }
 
-    async def _api_request(
+    async def _api_send(
         self,
         endpoint: str,
         data: dict[str, Any],
-        header: dict[str, Any] | None = None,
-    ) -> dict[str, Any] | None:
-        header = header or {}
+        header: dict[str, Any],
+    ) -> dict:
         header.update(
             {"x-recipe-app": self._app_id, "authorization": f"Basic {self._auth_base}"},
         )
 
-        return await super()._api_request(endpoint, data, header)
+        return await super()._api_send(endpoint, data, header)
 
     async def _re_route(self) -> None:
         data = self._make_general_data()
@@ -608,7 +922,7 @@ class SmartHomeCloud(MideaCloud):
         ) and (api_url := response.get("masUrl")):
             self._api_url = api_url
 
-    async def login(self) -> bool:
+    async def _login(self) -> bool:
         """Authenticate to MSmart Cloud."""
         await self._re_route()
         if login_id := await self._get_login_id():
@@ -720,19 +1034,13 @@ class SmartHomeCloud(MideaCloud):
             endpoint="/v2/luaEncryption/luaGet",
             data=data,
         ):
-            res = await self._session.get(response["url"])
-            if res.status == HTTPStatus.OK:
-                lua = await res.text()
-                if lua:
-                    stream = (
-                        'local bit = require "bit"\n'
-                        + self._security.aes_decrypt_with_fixed_key(lua)
-                    )
-                    stream = stream.replace("\r\n", "\n")
-                    fnm = f"{path}/{response['fileName']}"
-                    async with aiofiles.open(fnm, "w") as fp:
-                        await fp.write(stream)
-        return str(fnm) if fnm else None
+            fnm = await self._save_lua(
+                path,
+                device_type,
+                _lua_model(sn, model_number),
+                response,
+            )
+        return fnm
 
 
 class MideaAirCloud(MideaCloud):
@@ -772,13 +1080,27 @@ class MideaAirCloud(MideaCloud):
             data.update({"sessionId": self._session_id})
         return data
 
-    async def _api_request(
+    def _session_state(self) -> dict[str, Any]:
+        return {**super()._session_state(), "session_id": self._session_id}
+
+    def _restore_session_state(self, state: dict[str, Any]) -> None:
+        super()._restore_session_state(state)
+        self._session_id = state["session_id"]
+
+    def _auth_failed(self, response: dict) -> bool:
+        return int(response["errorCode"]) in AUTH_ERROR_CODES
+
+    def _api_result(self, response: dict) -> dict | None:
+        if int(response["errorCode"]) == 0 and "result" in response:
+            return cast(dict[str, Any], response["result"])
+        return None
+
+    async def _api_send(
         self,
         endpoint: str,
         data: dict[str, Any],
-        header: dict[str, Any] | None = None,
-    ) -> dict[str, Any] | None:
-        header = header or {}
+        header: dict[str, Any],
+    ) -> dict:
         url = self._api_url + endpoint
 
         sign = self._security.sign(url, data, "")
@@ -787,37 +1109,9 @@ class MideaAirCloud(MideaCloud):
             header.update({"uid": self._uid})
         if self._access_token is not None:
             header.update({"accessToken": self._access_token})
-        response: dict = {"errorCode": -1}
-        for _ in range(3):
-            try:
-                with self._api_lock:
-                    r = await self._session.request(
-                        "POST",
-                        url,
-                        headers=header,
-                        data=data,
-                        timeout=ClientTimeout(10),
-                    )
-                    raw = await r.read()
-                    _LOGGER.debug(
-                        "Midea cloud API url: %s, data: %s, response: %s",
-                        url,
-                        data,
-                        raw,
-                    )
-                    response = json.loads(raw)
-                    break
-            except (TimeoutError, ClientConnectionError, json.JSONDecodeError) as e:
-                _LOGGER.warning(
-                    "Midea cloud API error, url: %s, error: %s",
-                    url,
-                    repr(e),
-                )
-        if int(response["errorCode"]) == 0 and "result" in response:
-            return cast(dict[str, Any], response["result"])
-        return None
+        return await self._api_post(endpoint, url, header, data, {"errorCode": -1})
 
-    async def login(self) -> bool:
+    async def _login(self) -> bool:
         """Authenticate to Midea Air Cloud."""
         if login_id := await self._get_login_id():
             self._login_id = login_id
@@ -0,0 +1,93 @@
+"""Midea local cloud session store."""
+
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from .storage import EncryptedJsonFile
+
+_LOGGER = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+# seconds a login is reused, the cloud rejecting it earlier forces a new one
+DEFAULT_SESSION_TTL = 7 * 24 * 3600
+
+
+class CloudSessionStore:
+    """Cloud logins of accounts, reused across processes until they expire.
+
+    A session holds the access token, user id, routed API url and AES keys
+    of a login. Sessions are encrypted like the ``KeyStore`` entries.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        ttl: float = DEFAULT_SESSION_TTL,
+        secret: bytes | None = None,
+    ) -> None:
+        """Initialize cloud session store."""
+        self._path = Path(path)
+        self._file = EncryptedJsonFile(self._path, STORE_VERSION, secret)
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._sessions: dict[str, dict[str, Any]] = {}
+        self._load()
+
+    @property
+    def path(self) -> Path:
+        """Cloud session store file path."""
+        return self._path
+
+    def get(self, name: str) -> dict[str, Any] | None:
+        """Return the session of an account, unless expired."""
+        with self._lock:
+            entry = self._sessions.get(name)
+            if entry is None or entry["expires"] <= time.time():
+                return None
+            return dict(entry["session"])
+
+    def set(self, name: str, session: dict[str, Any]) -> None:
+        """Store the session of an account, valid for the store TTL."""
+        with self._lock:
+            self._sessions[name] = {
+                "session": dict(session),
+                "expires": time.time() + self._ttl,
+            }
+            self._save()
+
+    def remove(self, name: str) -> None:
+        """Forget the session of an account."""
+        with self._lock:
+            if self._sessions.pop(name, None):
+                self._save()
+
+    def _load(self) -> None:
+        try:
+            sessions = self._file.read()
+            now = time.time()
+            self._sessions = {
+                str(name): {
+                    "session": dict(entry["session"]),
+                    "expires": float(entry["expires"]),
+                }
+                for name, entry in sessions.items()
+                if float(entry["expires"]) > now
+            }
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            self._sessions = {}
+            _LOGGER.warning(
+                "Ignoring invalid cloud session store %s: %s",
+                self._path,
+                e,
+            )
+
+    def _save(self) -> None:
+        try:
+            self._file.write(self._sessions)
+        except (OSError, ValueError) as e:
+            _LOGGER.warning("Unable to write cloud session store %s: %s", self._path, e)
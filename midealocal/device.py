@@ -1,16 +1,20 @@
 """Midea local device."""
 
+import copy
 import logging
 import socket
 import threading
 import time
-from collections.abc import Callable
+from collections.abc import Callable, Hashable
 from enum import IntEnum, StrEnum
-from typing import Any
+from typing import Any, ClassVar
 
 from typing_extensions import deprecated
 
+from .buffer import ReceiveBuffer
+from .capabilities import CapabilityCache, DeviceCapabilities
 from .const import DeviceType, ProtocolVersion
+from .dispatcher import UpdateDispatcher
 from .exceptions import SocketException
 from .message import (
     MessageApplianceResponse,
@@ -19,16 +23,19 @@ from .message import (
     MessageRequest,
     MessageType,
 )
+from .metrics import DeviceMetrics
 from .packet_builder import PacketBuilder
 from .security import (
     MSGTYPE_ENCRYPTED_REQUEST,
     MSGTYPE_HANDSHAKE_REQUEST,
+    Decoder8370,
     LocalSecurity,
 )
 
 MIN_AUTH_RESPONSE = 20
 MIN_MSG_LENGTH = 56
 MIN_V2_FACTUAL_MSG_LENGTH = 6
+MIN_QUERY_LENGTH = 10  # header and body type of a decrypted message
 RESPONSE_TIMEOUT = 12  # main loop socket recv timeout, 12 * 10s = 120s
 SOCKET_TIMEOUT = 10  # socket connection default timeout
 QUERY_TIMEOUT = 2  # query response in 1s, 0xAC have more queries, set to 2s
@@ -36,6 +43,8 @@ QUERY_TIMEOUT = 2  # query response in 1s, 0xAC have more queries, set to 2s
 
 _LOGGER = logging.getLogger(__name__)
 
+_UNSET = object()
+
 
 class AuthException(Exception):
     """Authentication exception."""
@@ -64,9 +73,69 @@ class MessageResult(IntEnum):
     ERROR = 99
 
 
+class _InflightQueries:
+    """Queries of a pipelined refresh waiting for their response."""
+
+    def __init__(self) -> None:
+        """Initialize inflight queries."""
+        self.pending: list[tuple[MessageRequest, float]] = []
+        self.expired: list[MessageRequest] = []
+        self.errors = 0
+        self.ambiguous = False
+
+    def add(self, cmd: MessageRequest, deadline: float) -> None:
+        """Wait for the response to a query until deadline."""
+        self.pending.append((cmd, deadline))
+
+    def response(self, message_type: int, body_type: int) -> None:
+        """Match a response to the query of the same body type.
+
+        Without one, the oldest query of its message type is matched.
+        """
+        candidates = [
+            index
+            for index, (cmd, _) in enumerate(self.pending)
+            if cmd.message_type == message_type
+        ]
+        if not candidates:
+            return
+        for index in candidates:
+            if self.pending[index][0].body_type == body_type:
+                break
+        else:
+            index = candidates[0]
+            self.ambiguous |= len(candidates) > 1
+        del self.pending[index]
+
+    def error(self) -> None:
+        """Count an error response against the oldest query."""
+        if self.pending:
+            del self.pending[0]
+        self.errors += 1
+
+    def expire(self, now: float) -> float | None:
+        """Move the queries past their deadline to expired.
+
+        Return the seconds until the next deadline, None once no query waits.
+        """
+        waiting = []
+        for cmd, deadline in self.pending:
+            if deadline <= now:
+                self.expired.append(cmd)
+            else:
+                waiting.append((cmd, deadline))
+        self.pending = waiting
+        if not waiting:
+            return None
+        return min(deadline for _, deadline in waiting) - now
+
+
 class MideaDevice(threading.Thread):
     """Midea device."""
 
+    # capability cache of the devices created without set_capability_cache
+    default_capability_cache: ClassVar[CapabilityCache | None] = None
+
     def __init__(
         self,
         name: str,
@@ -90,7 +159,8 @@ class MideaDevice(threading.Thread):
         self._security = LocalSecurity()
         self._token = bytes.fromhex(token)
         self._key = bytes.fromhex(key)
-        self._buffer = b""
+        self._buffer = ReceiveBuffer()
+        self._decoder_8370 = Decoder8370(self._security, self._buffer)
         self._device_name = name
         self._device_id = device_id
         self._device_type = device_type
@@ -99,22 +169,43 @@ class MideaDevice(threading.Thread):
         self._subtype = subtype
         self._message_protocol_version: int = 0
         self._updates: list[Callable[[dict[str, Any]], None]] = []
+        self._snapshot_updates: list[Callable[[dict[str, Any]], None]] = []
+        self._dispatched: dict[str, Any] = {}
+        self._dispatcher: UpdateDispatcher | None = None
+        self._metrics: DeviceMetrics | None = None
+        self._unparsed = 0
+        self._pipelined_refresh = False
+        self._inflight: _InflightQueries | None = None
         self._unsupported_protocol: list[str] = []
         self._is_run = False
         self._available = False
+        self._auth_failed = False
         self._appliance_query = True
         self._refresh_interval = 30
         self._heartbeat_interval = SOCKET_TIMEOUT
         self._default_refresh_interval = 30
         self._previous_refresh = 0.0
         self._previous_heartbeat = 0.0
+        self._queries: list[MessageRequest] = []
+        self._query_cache: dict[MessageRequest, bytes | None] = {}
+        self._query_cache_key: Hashable = None
         self.name = self._device_name
+        self._capability_cache: CapabilityCache | None = None
+        self._capabilities: DeviceCapabilities | None = None
+        self._capability_queries: list[tuple[int, int]] = []
+        if MideaDevice.default_capability_cache is not None:
+            self.set_capability_cache(MideaDevice.default_capability_cache)
 
     @property
     def available(self) -> bool:
         """Device available."""
         return self._available
 
+    @property
+    def auth_failed(self) -> bool:
+        """Whether the last connect failed because the device rejected the key."""
+        return self._auth_failed
+
     @property
     def device_id(self) -> int:
         """Device ID."""
@@ -135,25 +226,49 @@ class MideaDevice(threading.Thread):
         """Device subtype."""
         return self._subtype
 
+    @property
+    def metrics(self) -> DeviceMetrics | None:
+        """Device metrics, None when disabled."""
+        return self._metrics
+
+    def enable_metrics(self, metrics: DeviceMetrics | None = None) -> DeviceMetrics:
+        """Record connection, query and traffic metrics."""
+        if metrics is None:
+            metrics = self._metrics or DeviceMetrics()
+        self._unparsed = len(self._buffer)
+        self._metrics = metrics
+        return metrics
+
+    def disable_metrics(self) -> None:
+        """Stop recording metrics."""
+        self._metrics = None
+
     @staticmethod
-    def fetch_v2_message(msg: bytes) -> tuple[list, bytes]:
-        """Fetch V2 message."""
+    def fetch_v2_message(msg: bytes | memoryview) -> tuple[list, bytes | memoryview]:
+        """Fetch V2 message.
+
+        Every complete message is copied out once, the leftover is returned
+        as a slice of ``msg`` (a view when ``msg`` is a memoryview).
+        """
         result = []
-        while len(msg) > 0:
-            factual_msg_len = len(msg)
-            if factual_msg_len < MIN_V2_FACTUAL_MSG_LENGTH:
-                break
-            alleged_msg_len = msg[4] + (msg[5] << 8)
-            if factual_msg_len >= alleged_msg_len:
-                result.append(msg[:alleged_msg_len])
-                msg = msg[alleged_msg_len:]
-            else:
+        offset = 0
+        total = len(msg)
+        while total - offset >= MIN_V2_FACTUAL_MSG_LENGTH:
+            # alleged message length, little endian
+            end = offset + (msg[offset + 4] | msg[offset + 5] << 8)
+            if end == offset or end > total:
                 break
-        return result, msg
+            result.append(bytes(msg[offset:end]))
+            offset = end
+        return result, msg[offset:]
 
     def connect(self, check_protocol: bool = False) -> bool:
         """Connect to device."""
         connected = False
+        self._auth_failed = False
+        metrics = self._metrics
+        if metrics is not None and metrics.connects:
+            metrics.reconnects += 1
         try:
             self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self._socket.settimeout(SOCKET_TIMEOUT)
@@ -163,15 +278,20 @@ class MideaDevice(threading.Thread):
                 self._ip_address,
                 self._port,
             )
+            start = time.monotonic()
             self._socket.connect((self._ip_address, self._port))
             _LOGGER.debug("[%s] Connected", self._device_id)
+            if metrics is not None:
+                metrics.connect.observe(time.monotonic() - start)
             if self._device_protocol_version == ProtocolVersion.V3:
+                start = time.monotonic()
                 self.authenticate()
+                if metrics is not None:
+                    metrics.auth.observe(time.monotonic() - start)
             # 1. midea_ac_lan add device verify token with connect and auth
             # 2. init connection, check_protocol
             if check_protocol:
-                self.refresh_status(check_protocol=check_protocol)
-                self.get_capabilities()
+                self._check_protocol()
             connected = True
         except TimeoutError:
             _LOGGER.debug("[%s] Connection timed out", self._device_id)
@@ -181,6 +301,7 @@ class MideaDevice(threading.Thread):
             self._socket = None
         except AuthException:  # authenticate exception
             _LOGGER.debug("[%s] Authentication failed", self._device_id)
+            self._auth_failed = True
         except SocketException:  # refresh_status exception
             _LOGGER.debug("[%s] Connect socket exception", self._device_id)
             self._socket = None
@@ -193,6 +314,11 @@ class MideaDevice(threading.Thread):
                 exc_info=e,
             )
             self._socket = None
+        if metrics is not None:
+            if connected:
+                metrics.connects += 1
+            else:
+                metrics.connect_errors += 1
         # enable/disable device in init connection
         if check_protocol:
             self.set_available(connected)
@@ -251,6 +377,8 @@ class MideaDevice(threading.Thread):
             if query:
                 self._socket.settimeout(QUERY_TIMEOUT)
             self._socket.send(data)
+            if self._metrics is not None:
+                self._metrics.bytes_out += len(data)
         except TimeoutError:
             _LOGGER.debug(
                 "[%s] send_message_v2 timed out",
@@ -295,10 +423,177 @@ class MideaDevice(threading.Thread):
 
     def build_send(self, cmd: MessageRequest, query: bool = False) -> None:
         """Serialize and send."""
-        data = cmd.serialize()
+        self.send_message(self.build_packet(cmd, query=query), query=query)
+
+    def build_packet(self, cmd: MessageRequest, query: bool = False) -> bytearray:
+        """Serialize a request into the packet passed to send_message.
+
+        Queries from refresh_queries are built from their cached encrypted
+        payload, or with a new message id when they carry one.
+        """
+        encrypted = self._query_cache.get(cmd)
+        if encrypted is None:
+            if cmd in self._query_cache:
+                cmd.renew_message_id()
+            data = cmd.serialize()
+        else:
+            data = bytearray()
         _LOGGER.debug("[%s] Sending: %s, query is %s", self._device_id, cmd, query)
-        msg = PacketBuilder(self._device_id, data).finalize()
-        self.send_message(msg, query=query)
+        msg = PacketBuilder(self._device_id, data, encrypted).finalize()
+        if query and self._metrics is not None:
+            self._metrics.query_sent(
+                cmd.message_type,
+                cmd.body_type,
+                cmd.__class__.__name__,
+            )
+        return msg
+
+    def query_cache_key(self) -> Hashable:
+        """Device state the queries of build_query depend on."""
+        return self._message_protocol_version
+
+    def refresh_queries(self) -> list[MessageRequest]:
+        """Return the queries sent by refresh_status.
+
+        The queries are built once per appliance query state and query cache
+        key; the ones without a message id in their serialization are also
+        serialized and encrypted once.
+        """
+        key = (self._appliance_query, self.query_cache_key())
+        if key != self._query_cache_key:
+            cmds: list[MessageRequest] = self.build_query()
+            if self._appliance_query:
+                cmds = [MessageQueryAppliance(self.device_type), *cmds]
+            cache: dict[MessageRequest, bytes | None] = {}
+            for cmd in cmds:
+                data = cmd.serialize()
+                cmd.renew_message_id()
+                static = cmd.serialize() == data
+                cache[cmd] = self._security.aes_encrypt(data) if static else None
+            self._queries, self._query_cache = cmds, cache
+            self._query_cache_key = key
+        return self._queries
+
+    def set_capability_cache(self, cache: CapabilityCache | None) -> None:
+        """Skip the protocol check when the device is in cache.
+
+        The cached message protocol version and unsupported queries are used
+        at once, the cached capabilities responses on the next connect.
+        """
+        self._capability_cache = cache
+        self._capabilities = None
+        if cache is not None:
+            self._capabilities = cache.get(
+                self._device_id,
+                self._model,
+                self._subtype,
+                self._device_protocol_version,
+            )
+        if self._capabilities is not None:
+            self._message_protocol_version = self._capabilities.protocol_version
+            self._unsupported_protocol = list(self._capabilities.unsupported)
+
+    def _cached_capabilities(self) -> DeviceCapabilities | None:
+        """Return the cached capabilities, None once their entry expired."""
+        cache = self._capability_cache
+        if (
+            self._capabilities is not None
+            and cache is not None
+            and cache.get(
+                self._device_id,
+                self._model,
+                self._subtype,
+                self._device_protocol_version,
+            )
+            is None
+        ):
+            _LOGGER.debug("[%s] Cached capabilities expired", self._device_id)
+            self._capabilities = None
+            self._unsupported_protocol = []
+        return self._capabilities
+
+    def _check_protocol(self) -> None:
+        """Check the supported queries and get capabilities, or use the cache."""
+        if self._cached_capabilities() is None:
+            self.refresh_status(check_protocol=True)
+            self._store_capabilities()
+            self.get_capabilities()
+            return
+        _LOGGER.debug("[%s] Using cached capabilities", self._device_id)
+        self.refresh_status()
+        self._load_capabilities()
+
+    def _load_capabilities(self) -> None:
+        """Process the cached capabilities responses, or get them again."""
+        capabilities = self._capabilities
+        if capabilities is None or not capabilities.capabilities:
+            self.get_capabilities()
+            return
+        for message in capabilities.capabilities:
+            try:
+                status = self.process_message(message)
+            except Exception:
+                _LOGGER.exception(
+                    "[%s] Error in cached capabilities, msg = %s",
+                    self._device_id,
+                    message.hex(),
+                )
+                self._forget_capabilities()
+                self.get_capabilities()
+                return
+            if status:
+                self.update_all(status)
+
+    def _store_capabilities(self) -> None:
+        """Cache the protocol check results, capabilities follow on receipt."""
+        cache = self._capability_cache
+        if cache is None:
+            return
+        self._capabilities = DeviceCapabilities(
+            self._message_protocol_version,
+            list(self._unsupported_protocol),
+        )
+        self._capability_queries = [
+            (cmd.message_type, cmd.body_type) for cmd in self.capabilities_query()
+        ]
+        # saved once the capabilities are received, or the socket is closed
+        cache.set(
+            self._device_id,
+            self._model,
+            self._subtype,
+            self._device_protocol_version,
+            self._capabilities,
+            save=not self._capability_queries,
+        )
+
+    def _record_capability(self, message: bytearray) -> None:
+        """Cache the response to a capabilities query."""
+        self._capability_queries.remove((message[9], message[10]))
+        if self._capabilities is None or self._capability_cache is None:
+            return
+        self._capabilities.capabilities.append(bytes(message))
+        self._capability_cache.set(
+            self._device_id,
+            self._model,
+            self._subtype,
+            self._device_protocol_version,
+            self._capabilities,
+            save=not self._capability_queries,
+        )
+
+    def _forget_capabilities(self) -> None:
+        """Drop cached capabilities, the next connect checks the protocol."""
+        _LOGGER.debug("[%s] Cached capabilities are outdated", self._device_id)
+        self._capabilities = None
+        self._capability_queries = []
+        self._unsupported_protocol = []
+        if self._capability_cache is not None:
+            self._capability_cache.remove(
+                self._device_id,
+                self._model,
+                self._subtype,
+                self._device_protocol_version,
+            )
 
     def get_capabilities(self) -> None:
         """Get device capabilities."""
@@ -308,9 +603,7 @@ class MideaDevice(threading.Thread):
 
     def refresh_status(self, check_protocol: bool = False) -> None:
         """Refresh device status."""
-        cmds: list = self.build_query()
-        if self._appliance_query:
-            cmds = [MessageQueryAppliance(self.device_type), *cmds]
+        cmds = self.refresh_queries()
         error_count = 0
         _LOGGER.debug(
             "[%s] refresh_status with cmds: %s, check_protocol %s",
@@ -318,55 +611,17 @@ class MideaDevice(threading.Thread):
             cmds,
             check_protocol,
         )
+        if check_protocol and self._pipelined_refresh:
+            self._refresh_status_pipelined(cmds)
+            return
         for cmd in cmds:
             if cmd.__class__.__name__ not in self._unsupported_protocol:
                 # set socket QUERY_TIMEOUT for query msg
                 # build_send exception should be catch by connect/run
                 self.build_send(cmd, query=True)
                 # init check_protocol, skip timeout exception
-                if check_protocol:
-                    try:
-                        while True:
-                            if not self._socket:
-                                _LOGGER.debug(
-                                    "[%s] device socket is none",
-                                    self._device_id,
-                                )
-                                # raise exception to connect/main loop
-                                raise SocketException
-                            msg = self._socket.recv(512)
-                            if len(msg) == 0:
-                                raise ConnectionResetError("Connection closed by peer.")
-                            result = self.parse_message(msg)
-                            # Prevent infinite loop
-                            if result == MessageResult.SUCCESS:
-                                break
-                            elif result == MessageResult.PADDING:  # noqa: RET508
-                                continue
-                            else:
-                                raise ResponseException  # noqa: TRY301
-                        # recovery SOCKET_TIMEOUT after recv msg
-                        self._socket.settimeout(SOCKET_TIMEOUT)
-                    # only catch TimoutError for check_protocol
-                    # unexpected exception in recv/settimeout, catch by main loop
-                    except TimeoutError:
-                        error_count += 1
-                        self._unsupported_protocol.append(cmd.__class__.__name__)
-                        _LOGGER.debug(
-                            "[%s] Does not supports the protocol %s, cmd %s, ignored",
-                            self._device_id,
-                            cmd.__class__.__name__,
-                            cmd,
-                        )
-                    except ResponseException:
-                        # parse msg error
-                        error_count += 1
-                        _LOGGER.debug(
-                            "[%s] refresh_status ResponseException %s, cmd %s",
-                            self._device_id,
-                            cmd.__class__.__name__,
-                            cmd,
-                        )
+                if check_protocol and not self._check_response(cmd):
+                    error_count += 1
             else:
                 _LOGGER.debug(
                     "[%s] refresh_status with cmd: %s, unsupported protocol, SKIP",
@@ -383,6 +638,128 @@ class MideaDevice(threading.Thread):
                 )
                 raise NoSupportedProtocol
 
+    def _check_response(self, cmd: MessageRequest) -> bool:
+        """Wait for the response to a query sent alone, False if it failed."""
+        try:
+            while True:
+                if not self._socket:
+                    _LOGGER.debug(
+                        "[%s] device socket is none",
+                        self._device_id,
+                    )
+                    # raise exception to connect/main loop
+                    raise SocketException
+                msg = self._socket.recv(512)
+                if len(msg) == 0:
+                    raise ConnectionResetError("Connection closed by peer.")
+                result = self.parse_message(msg)
+                # Prevent infinite loop
+                if result == MessageResult.SUCCESS:
+                    break
+                elif result == MessageResult.PADDING:  # noqa: RET508
+                    continue
+                else:
+                    raise ResponseException  # noqa: TRY301
+            # recovery SOCKET_TIMEOUT after recv msg
+            self._socket.settimeout(SOCKET_TIMEOUT)
+        # only catch TimoutError for check_protocol
+        # unexpected exception in recv/settimeout, catch by main loop
+        except TimeoutError:
+            self._set_unsupported(cmd)
+            return False
+        except ResponseException:
+            # parse msg error
+            _LOGGER.debug(
+                "[%s] refresh_status ResponseException %s, cmd %s",
+                self._device_id,
+                cmd.__class__.__name__,
+                cmd,
+            )
+            return False
+        return True
+
+    def _abandon_query(self, cmd: MessageRequest) -> None:
+        """Stop waiting for the response to a query sent before."""
+        if self._metrics is not None:
+            self._metrics.query_abandoned(cmd.message_type, cmd.__class__.__name__)
+
+    def _set_unsupported(self, cmd: MessageRequest) -> None:
+        self._abandon_query(cmd)
+        self._unsupported_protocol.append(cmd.__class__.__name__)
+        _LOGGER.debug(
+            "[%s] Does not supports the protocol %s, cmd %s, ignored",
+            self._device_id,
+            cmd.__class__.__name__,
+            cmd,
+        )
+
+    def set_pipelined_refresh(self, pipelined: bool = True) -> None:
+        """Send the protocol check queries back to back instead of one by one."""
+        self._pipelined_refresh = pipelined
+
+    def _refresh_status_pipelined(self, cmds: list[MessageRequest]) -> None:
+        """Check the supported queries in about one round trip.
+
+        Every query is sent at once with its own QUERY_TIMEOUT deadline and
+        the responses are matched by message type and body type. When a
+        response could belong to several queries, the queries left without
+        response are checked again one by one before being set unsupported,
+        while an unanswered query may be kept as supported, it then gets no
+        response on refresh as without the protocol check.
+        """
+        inflight = _InflightQueries()
+        for cmd in cmds:
+            if cmd.__class__.__name__ in self._unsupported_protocol:
+                _LOGGER.debug(
+                    "[%s] refresh_status with cmd: %s, unsupported protocol, SKIP",
+                    self._device_id,
+                    cmd,
+                )
+                inflight.errors += 1
+            else:
+                self.build_send(cmd, query=True)
+                inflight.add(cmd, time.monotonic() + QUERY_TIMEOUT)
+        self._inflight = inflight
+        try:
+            self._receive_inflight(inflight)
+        finally:
+            self._inflight = None
+        error_count = inflight.errors
+        for cmd in inflight.expired:
+            if inflight.ambiguous:
+                self._abandon_query(cmd)
+                self.build_send(cmd, query=True)
+                if self._check_response(cmd):
+                    continue
+            else:
+                self._set_unsupported(cmd)
+            error_count += 1
+        if error_count == len(cmds):
+            _LOGGER.debug(
+                "[%s] all the query cmds failed %s, please report bug",
+                self._device_id,
+                cmds,
+            )
+            raise NoSupportedProtocol
+
+    def _receive_inflight(self, inflight: "_InflightQueries") -> None:
+        """Receive until every query is answered or past its deadline."""
+        while (timeout := inflight.expire(time.monotonic())) is not None:
+            if not self._socket:
+                _LOGGER.debug("[%s] device socket is none", self._device_id)
+                raise SocketException
+            self._socket.settimeout(timeout)
+            try:
+                received = self._buffer.recv_into(self._socket, 512)
+            except TimeoutError:
+                continue
+            if received == 0:
+                raise ConnectionResetError("Connection closed by peer.")
+            if self.parse_message() == MessageResult.ERROR:
+                inflight.error()
+        if self._socket:
+            self._socket.settimeout(SOCKET_TIMEOUT)
+
     def pre_process_message(self, msg: bytearray) -> bool:
         """Pre process message."""
         if msg[9] == MessageType.query_appliance:
@@ -390,6 +767,12 @@ class MideaDevice(threading.Thread):
             self._appliance_query = False
             _LOGGER.debug("[%s] Appliance query Received: %s", self._device_id, message)
             self._message_protocol_version = message.protocol_version
+            capabilities = self._capabilities
+            if (
+                capabilities is not None
+                and capabilities.protocol_version != self._message_protocol_version
+            ):
+                self._forget_capabilities()
             _LOGGER.debug(
                 "[%s] Device protocol version: %s",
                 self._device_id,
@@ -398,16 +781,35 @@ class MideaDevice(threading.Thread):
             return False
         return True
 
-    def parse_message(self, msg: bytes) -> MessageResult:
-        """Parse message."""
+    def _fetch_messages(self) -> list:
+        """Extract the complete messages from the receive buffer."""
         if self._device_protocol_version == ProtocolVersion.V3:
-            messages, self._buffer = self._security.decode_8370(self._buffer + msg)
-        else:
-            messages, self._buffer = self.fetch_v2_message(self._buffer + msg)
+            return list(self._decoder_8370.feed())
+        with self._buffer.view() as view:
+            messages, leftover = self.fetch_v2_message(view)
+            self._buffer.consume(len(view) - len(leftover))
+        return messages
+
+    def parse_message(self, msg: bytes = b"") -> MessageResult:
+        """Parse message.
+
+        ``msg`` is appended to the receive buffer, data already received
+        into the buffer with ``recv_into`` is parsed without ``msg``.
+        """
+        metrics = self._metrics
+        if metrics is not None:
+            metrics.bytes_in += len(self._buffer) - self._unparsed + len(msg)
+        self._buffer.append(msg)
+        messages = self._fetch_messages()
+        if metrics is not None:
+            self._unparsed = len(self._buffer)
+            metrics.frames_received += len(messages)
         if len(messages) == 0:
             return MessageResult.PADDING
         for message in messages:
             if message == b"ERROR":
+                if metrics is not None:
+                    metrics.decode_errors += 1
                 return MessageResult.ERROR
             payload_len = message[4] + (message[5] << 8) - 56
             payload_type = message[2] + (message[3] << 8)
@@ -417,6 +819,7 @@ class MideaDevice(threading.Thread):
                 cryptographic = bytes(message[40:-16])
                 if payload_len % 16 == 0:
                     decrypted: bytearray = self._security.aes_decrypt(cryptographic)
+                    self._response_received(decrypted)
                     try:
                         cont = True
                         if self._appliance_query:
@@ -431,41 +834,56 @@ class MideaDevice(threading.Thread):
                                     self._device_id,
                                 )
                     except Exception:
+                        if metrics is not None:
+                            metrics.decode_errors += 1
                         _LOGGER.exception(
                             "[%s] Error in process message, msg = %s",
                             self._device_id,
                             decrypted.hex(),
                         )
                 else:
+                    if metrics is not None:
+                        metrics.decode_errors += 1
                     _LOGGER.warning(
                         "[%s] Illegal payload, "
-                        "original message = %s, buffer = %s, "
-                        "8370 decoded = %s, payload type = %s, "
+                        "message = %s, buffer = %s, payload type = %s, "
                         "alleged payload length = %s, factual payload length = %s, ",
                         self._device_id,
-                        msg.hex(),
-                        self._buffer.hex(),
                         message.hex(),
+                        self._buffer.hex(),
                         payload_type,
                         payload_len,
                         len(cryptographic),
                     )
             else:
+                if metrics is not None:
+                    metrics.decode_errors += 1
                 _LOGGER.warning(
                     "[%s] Illegal message, "
-                    "original message = %s, buffer = %s, "
-                    "8370 decoded = %s, payload type = %s, "
+                    "message = %s, buffer = %s, payload type = %s, "
                     "alleged payload length = %s, message length = %s, ",
                     self._device_id,
-                    msg.hex(),
-                    self._buffer.hex(),
                     message.hex(),
+                    self._buffer.hex(),
                     payload_type,
                     payload_len,
                     len(message),
                 )
         return MessageResult.SUCCESS
 
+    def _response_received(self, message: bytearray) -> None:
+        """End the round trip of the query a decrypted message answers."""
+        if len(message) <= MIN_QUERY_LENGTH:
+            if self._metrics is not None:
+                self._metrics.response_received(message[9], None)
+            return
+        if self._metrics is not None:
+            self._metrics.response_received(message[9], message[10])
+        if self._inflight is not None:
+            self._inflight.response(message[9], message[10])
+        if (message[9], message[10]) in self._capability_queries:
+            self._record_capability(message)
+
     def build_query(self) -> list:
         """Build query."""
         raise NotImplementedError
@@ -503,14 +921,61 @@ class MideaDevice(threading.Thread):
         msg = PacketBuilder(self._device_id, bytearray([0x00])).finalize(msg_type=0)
         self.send_message(msg)
 
-    def register_update(self, update: Callable[[dict[str, Any]], None]) -> None:
-        """Register update."""
-        self._updates.append(update)
+    def register_update(
+        self,
+        update: Callable[[dict[str, Any]], None],
+        full_snapshot: bool = False,
+    ) -> None:
+        """Register update.
+
+        Updates receive the attributes changed since the previous update,
+        ``full_snapshot`` updates receive every attribute of each status.
+        """
+        if full_snapshot:
+            self._snapshot_updates.append(update)
+        else:
+            self._updates.append(update)
+
+    def status_delta(self, status: dict[str, Any]) -> dict[str, Any]:
+        """Return the attributes of status changed since the previous update.
+
+        The status is compared by value with the last dispatched status,
+        not with ``_attributes`` which the messages change in place, and
+        copies of the dispatched values are kept for the next comparison.
+        """
+        dispatched = self._dispatched
+        delta = {}
+        for key, value in status.items():
+            previous = dispatched.get(key, _UNSET)
+            if type(previous) is type(value) and previous == value:
+                continue
+            delta[key] = value
+            dispatched[key] = copy.copy(value)
+        return delta
+
+    def set_dispatcher(self, dispatcher: UpdateDispatcher | None) -> None:
+        """Deliver updates with dispatcher instead of the device thread."""
+        self._dispatcher = dispatcher
 
     def update_all(self, status: dict[str, Any]) -> None:
         """Update all."""
-        _LOGGER.debug("[%s] Status update: %s", self._device_id, status)
-        for update in self._updates:
+        delta = self.status_delta(status)
+        dispatcher = self._dispatcher
+        if delta:
+            _LOGGER.debug("[%s] Status update: %s", self._device_id, delta)
+            if dispatcher is not None:
+                dispatcher.submit((self._device_id, "delta"), self._updates, delta)
+            else:
+                for update in self._updates:
+                    update(delta)
+        if dispatcher is not None and self._snapshot_updates:
+            dispatcher.submit(
+                (self._device_id, "snapshot"),
+                self._snapshot_updates,
+                status,
+            )
+            return
+        for update in self._snapshot_updates:
             update(status)
 
     def set_available(self, available: bool = True) -> None:
@@ -521,6 +986,9 @@ class MideaDevice(threading.Thread):
             "Enabling" if available else "Disabling",
         )
         self._available = available
+        if not available:
+            # the first status after reconnecting is sent in full
+            self._dispatched.clear()
         status = {"available": available}
         self.update_all(status)
 
@@ -543,17 +1011,24 @@ class MideaDevice(threading.Thread):
 
     def close_socket(self) -> None:
         """Close socket."""
-        self._unsupported_protocol = []
-        self._buffer = b""
-        if self._socket:
+        self._unsupported_protocol = (
+            [] if self._capabilities is None else list(self._capabilities.unsupported)
+        )
+        self._buffer.clear()
+        self._unparsed = 0
+        if self._capability_cache is not None:
+            self._capability_cache.save()
+        if self._metrics is not None:
+            self._metrics.connection_closed()
+        # the device thread may close the socket at the same time
+        sock, self._socket = self._socket, None
+        if sock:
             try:
-                self._socket.shutdown(socket.SHUT_RDWR)
-                self._socket.close()
+                sock.shutdown(socket.SHUT_RDWR)
+                sock.close()
                 _LOGGER.debug("[%s] Socket closed", self._device_id)
             except OSError as e:
                 _LOGGER.debug("[%s] Error while closing socket: %s", self._device_id, e)
-            finally:
-                self._socket = None
 
     def set_ip_address(self, ip_address: str) -> None:
         """Set IP address."""
@@ -595,7 +1070,7 @@ class MideaDevice(threading.Thread):
                 # sleep and reconnect loop until device online
                 time.sleep(sleep_time)
 
-    def run(self) -> None:  # noqa: PLR0915
+    def run(self) -> None:
         """Run loop brief description.
 
         1. first/init connection, self._socket is None
@@ -643,11 +1118,10 @@ class MideaDevice(threading.Thread):
                     # set SOCKET_TIMEOUT before recv socket msg
                     self._socket.settimeout(SOCKET_TIMEOUT)
                     # refresh status after set/query
-                    msg = self._socket.recv(512)
-                    if len(msg) == 0:
+                    if self._buffer.recv_into(self._socket, 512) == 0:
                         raise ConnectionResetError("Connection closed by peer")  # noqa: TRY301
                     # parse msg and update latest status
-                    result = self.parse_message(msg)
+                    result = self.parse_message()
                     if result == MessageResult.SUCCESS:
                         timeout_counter = 0
                     if result == MessageResult.ERROR:
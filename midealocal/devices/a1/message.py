@@ -42,10 +42,18 @@ class MessageA1Base(MessageRequest):
             message_type=message_type,
             body_type=body_type,
         )
+        self._message_id = self._next_message_id()
+
+    @staticmethod
+    def _next_message_id() -> int:
         MessageA1Base._message_serial += 1
         if MessageA1Base._message_serial >= MAX_MSG_SERIAL_NUM:
             MessageA1Base._message_serial = 1
-        self._message_id = MessageA1Base._message_serial
+        return MessageA1Base._message_serial
+
+    def renew_message_id(self) -> None:
+        """Assign the next message id, before sending the message again."""
+        self._message_id = self._next_message_id()
 
     @property
     def _body(self) -> bytearray:
@@ -2,6 +2,7 @@
 
 import json
 import logging
+from collections.abc import Hashable
 from enum import StrEnum
 from typing import Any, ClassVar
 
@@ -178,6 +179,10 @@ class MideaACDevice(MideaDevice):
             MessagePowerQuery(self._message_protocol_version),
         ]
 
+    def query_cache_key(self) -> Hashable:
+        """Midea AC device query cache key."""
+        return self._message_protocol_version, self._used_subprotocol
+
     def capabilities_query(self) -> list:
         """Capabilities query message."""
         return [
@@ -116,10 +116,18 @@ class MessageACBase(MessageRequest):
             message_type=message_type,
             body_type=body_type,
         )
+        self._message_id = self._next_message_id()
+
+    @staticmethod
+    def _next_message_id() -> int:
         MessageACBase._message_serial += 1
         if MessageACBase._message_serial >= MAX_MSG_SERIAL_NUM:
             MessageACBase._message_serial = 1
-        self._message_id = MessageACBase._message_serial
+        return MessageACBase._message_serial
+
+    def renew_message_id(self) -> None:
+        """Assign the next message id, before sending the message again."""
+        self._message_id = self._next_message_id()
 
     @property
     def _body(self) -> bytearray:
@@ -2,10 +2,14 @@
 
 from midealocal.const import MAX_BYTE_VALUE, DeviceType, ProtocolVersion
 from midealocal.message import (
+    BoolParser,
+    DurationParser,
+    IntParser,
     ListTypes,
     MessageBody,
     MessageRequest,
     MessageResponse,
+    MessageSchema,
     MessageType,
 )
 
@@ -69,36 +73,52 @@ class MessageQuery01(MessageB0Base):
 class B0MessageBody(MessageBody):
     """B0 message body."""
 
+    schema = MessageSchema(
+        BoolParser("door", 0, bit=7),
+        IntParser("status", 0, mask=0x7F),
+        DurationParser("time_remaining", 2),
+        IntParser("error_code", 5),
+    )
+
     def __init__(self, body: bytearray) -> None:
         """Initialize B0 message body."""
         super().__init__(body)
         if len(body) > MIN_MSG_BODY:
-            self.door = (body[0] & 0x80) > 0
-            self.status = body[0] & 0x7F
-            self.time_remaining = body[2] * 60 + body[3]
-            self.error_code = body[5]
+            self.parse_all()
 
 
 class B0Message01Body(MessageBody):
     """B0 message 01 body."""
 
+    schema = MessageSchema(
+        DurationParser(
+            "time_remaining",
+            22,
+            units=(3600, 60, 1),
+            invalid_value=MAX_BYTE_VALUE,
+        ),
+        IntParser(
+            "current_temperature",
+            25,
+            max_value=0xFFFF,
+            length_in_bytes=2,
+            first_upper=True,
+        ),
+        IntParser("status", 31),
+        BoolParser("door", 32, bit=1),
+        BoolParser("tank_ejected", 32, bit=2),
+        BoolParser("water_shortage", 32, bit=3),
+        BoolParser("water_change_reminder", 32, bit=4),
+    )
+    current_temperature: int
+
     def __init__(self, body: bytearray) -> None:
         """Initialize B0 message 01 body."""
         super().__init__(body)
         if len(body) > MIN_MSG_BODY:
-            self.door = (body[32] & 0x02) > 0
-            self.status = body[31]
-            self.time_remaining = (
-                (0 if body[22] == MAX_BYTE_VALUE else body[22]) * 3600
-                + (0 if body[23] == MAX_BYTE_VALUE else body[23]) * 60
-                + (0 if body[24] == MAX_BYTE_VALUE else body[24])
-            )
-            self.current_temperature = (body[25] << 8) + (body[26])
+            self.parse_all()
             if self.current_temperature == 0:
                 self.current_temperature = (body[27] << 8) + body[28]
-            self.tank_ejected = (body[32] & 0x04) > 0
-            self.water_shortage = (body[32] & 0x08) > 0
-            self.water_change_reminder = (body[32] & 0x10) > 0
 
 
 class MessageB0Response(MessageResponse):
@@ -2,10 +2,14 @@
 
 from midealocal.const import MAX_BYTE_VALUE, DeviceType
 from midealocal.message import (
+    BoolParser,
+    DurationParser,
+    IntParser,
     ListTypes,
     MessageBody,
     MessageRequest,
     MessageResponse,
+    MessageSchema,
     MessageType,
 )
 
@@ -51,22 +55,34 @@ class MessageQuery(MessageB4Base):
 class B4MessageBody(MessageBody):
     """B4 message body."""
 
+    schema = MessageSchema(
+        BoolParser("tank_ejected", 16, bit=2),
+        BoolParser("water_shortage", 16, bit=3),
+        BoolParser("water_change_reminder", 16, bit=4),
+        DurationParser(
+            "time_remaining",
+            22,
+            units=(3600, 60, 1),
+            invalid_value=MAX_BYTE_VALUE,
+        ),
+        IntParser(
+            "current_temperature",
+            25,
+            max_value=0xFFFF,
+            length_in_bytes=2,
+            first_upper=True,
+        ),
+        IntParser("status", 31),
+        BoolParser("door", 32, bit=1),
+    )
+    current_temperature: int
+
     def __init__(self, body: bytearray) -> None:
         """Initialize B4 message body."""
         super().__init__(body)
-        self.time_remaining = (
-            (0 if body[22] == MAX_BYTE_VALUE else body[22]) * 3600
-            + (0 if body[23] == MAX_BYTE_VALUE else body[23]) * 60
-            + (0 if body[24] == MAX_BYTE_VALUE else body[24])
-        )
-        self.current_temperature = (body[25] << 8) + body[26]
+        self.parse_all()
         if self.current_temperature == 0:
             self.current_temperature = (body[27] << 8) + body[28]
-        self.status = body[31]
-        self.door = (body[32] & 0x02) > 0
-        self.tank_ejected = (body[16] & 0x04) > 0
-        self.water_shortage = (body[16] & 0x08) > 0
-        self.water_change_reminder = (body[16] & 0x10) > 0
 
 
 class MessageB4Response(MessageResponse):
@@ -1,7 +1,10 @@
 """Midea local B8 message."""
 
+from functools import lru_cache
+
 from midealocal.const import DeviceType
 from midealocal.message import (
+    BodyParser,
     BoolParser,
     IntEnumParser,
     IntParser,
@@ -10,6 +13,7 @@ from midealocal.message import (
     MessageRequest,
     MessageResponse,
     MessageType,
+    ParserPlan,
 )
 
 from .const import (
@@ -129,96 +133,107 @@ class MessageSetCommand(MessageB8Base):
         )
 
 
+@lru_cache
+def _generic_parsers(offset: int) -> tuple[BodyParser, ...]:
+    """B8 generic body parsers."""
+    return (
+        IntEnumParser[B8WorkStatus](
+            B8DeviceAttributes.WORK_STATUS,
+            1 + offset,
+            B8WorkStatus,
+        ),
+        IntEnumParser[B8FunctionType](
+            B8DeviceAttributes.FUNCTION_TYPE,
+            2 + offset,
+            B8FunctionType,
+        ),
+        IntEnumParser[B8ControlType](
+            B8DeviceAttributes.CONTROL_TYPE,
+            3 + offset,
+            B8ControlType,
+        ),
+        IntEnumParser[B8Moviment](
+            B8DeviceAttributes.MOVE_DIRECTION,
+            4 + offset,
+            B8Moviment,
+        ),
+        IntEnumParser[B8CleanMode](
+            B8DeviceAttributes.CLEAN_MODE,
+            5 + offset,
+            B8CleanMode,
+        ),
+        IntEnumParser[B8FanLevel](
+            B8DeviceAttributes.FAN_LEVEL,
+            6 + offset,
+            B8FanLevel,
+        ),
+        IntParser(B8DeviceAttributes.AREA, 7 + offset),
+        IntEnumParser[B8WaterLevel](
+            B8DeviceAttributes.WATER_LEVEL,
+            8 + offset,
+            B8WaterLevel,
+        ),
+        IntParser(B8DeviceAttributes.VOICE_VOLUME, 9 + offset, max_value=100),
+        BoolParser(
+            B8DeviceAttributes.HAVE_RESERVE_TASK,
+            10 + offset,
+        ),
+        IntParser(
+            B8DeviceAttributes.BATTERY_PERCENT,
+            11 + offset,
+            max_value=100,
+        ),
+        IntParser(B8DeviceAttributes.WORK_TIME, 12 + offset),
+        BoolParser(B8DeviceAttributes.UV_SWITCH, 13 + offset, bit=0),
+        BoolParser(B8DeviceAttributes.WIFI_SWITCH, 13 + offset, bit=1),
+        BoolParser(B8DeviceAttributes.VOICE_SWITCH, 13 + offset, bit=2),
+        BoolParser(B8DeviceAttributes.COMMAND_SOURCE, 13 + offset, bit=6),
+        BoolParser(B8DeviceAttributes.DEVICE_ERROR, 13 + offset, bit=7),
+        IntEnumParser[B8ErrorType](
+            B8DeviceAttributes.ERROR_TYPE,
+            14 + offset,
+            B8ErrorType,
+        ),
+        IntEnumParser[B8MopState](
+            B8DeviceAttributes.MOP,
+            16 + offset,
+            B8MopState,
+            default_value=B8MopState.LACK_WATER,
+        ),
+        BoolParser(B8DeviceAttributes.CARPET_SWITCH, 17 + offset),
+        BoolParser(
+            B8DeviceAttributes.LASER_SENSOR_ERROR,
+            18 + offset,
+            bit=0,
+        ),
+        BoolParser(
+            B8DeviceAttributes.LASER_SENSOR_SHELTER,
+            18 + offset,
+            bit=1,
+        ),
+        BoolParser(
+            B8DeviceAttributes.BOARD_COMMUNICATION_ERROR,
+            18 + offset,
+            bit=2,
+        ),
+        IntEnumParser[B8Speed](B8DeviceAttributes.SPEED, 19 + offset, B8Speed),
+    )
+
+
+@lru_cache
+def _generic_plan(offset: int) -> ParserPlan:
+    """B8 generic body parser plan."""
+    return ParserPlan(_generic_parsers(offset))
+
+
 class MessageB8GenericBody(MessageBody):
     """B8 message generic body."""
 
     def __init__(self, body: bytearray, offset: int) -> None:
         """Initialize B8 message generic body."""
         super().__init__(body)
-        self.parser_list.extend(
-            [
-                IntEnumParser[B8WorkStatus](
-                    B8DeviceAttributes.WORK_STATUS,
-                    1 + offset,
-                    B8WorkStatus,
-                ),
-                IntEnumParser[B8FunctionType](
-                    B8DeviceAttributes.FUNCTION_TYPE,
-                    2 + offset,
-                    B8FunctionType,
-                ),
-                IntEnumParser[B8ControlType](
-                    B8DeviceAttributes.CONTROL_TYPE,
-                    3 + offset,
-                    B8ControlType,
-                ),
-                IntEnumParser[B8Moviment](
-                    B8DeviceAttributes.MOVE_DIRECTION,
-                    4 + offset,
-                    B8Moviment,
-                ),
-                IntEnumParser[B8CleanMode](
-                    B8DeviceAttributes.CLEAN_MODE,
-                    5 + offset,
-                    B8CleanMode,
-                ),
-                IntEnumParser[B8FanLevel](
-                    B8DeviceAttributes.FAN_LEVEL,
-                    6 + offset,
-                    B8FanLevel,
-                ),
-                IntParser(B8DeviceAttributes.AREA, 7 + offset),
-                IntEnumParser[B8WaterLevel](
-                    B8DeviceAttributes.WATER_LEVEL,
-                    8 + offset,
-                    B8WaterLevel,
-                ),
-                IntParser(B8DeviceAttributes.VOICE_VOLUME, 9 + offset, max_value=100),
-                BoolParser(
-                    B8DeviceAttributes.HAVE_RESERVE_TASK,
-                    10 + offset,
-                ),
-                IntParser(
-                    B8DeviceAttributes.BATTERY_PERCENT,
-                    11 + offset,
-                    max_value=100,
-                ),
-                IntParser(B8DeviceAttributes.WORK_TIME, 12 + offset),
-                BoolParser(B8DeviceAttributes.UV_SWITCH, 13 + offset, bit=0),
-                BoolParser(B8DeviceAttributes.WIFI_SWITCH, 13 + offset, bit=1),
-                BoolParser(B8DeviceAttributes.VOICE_SWITCH, 13 + offset, bit=2),
-                BoolParser(B8DeviceAttributes.COMMAND_SOURCE, 13 + offset, bit=6),
-                BoolParser(B8DeviceAttributes.DEVICE_ERROR, 13 + offset, bit=7),
-                IntEnumParser[B8ErrorType](
-                    B8DeviceAttributes.ERROR_TYPE,
-                    14 + offset,
-                    B8ErrorType,
-                ),
-                IntEnumParser[B8MopState](
-                    B8DeviceAttributes.MOP,
-                    16 + offset,
-                    B8MopState,
-                    default_value=B8MopState.LACK_WATER,
-                ),
-                BoolParser(B8DeviceAttributes.CARPET_SWITCH, 17 + offset),
-                BoolParser(
-                    B8DeviceAttributes.LASER_SENSOR_ERROR,
-                    18 + offset,
-                    bit=0,
-                ),
-                BoolParser(
-                    B8DeviceAttributes.LASER_SENSOR_SHELTER,
-                    18 + offset,
-                    bit=1,
-                ),
-                BoolParser(
-                    B8DeviceAttributes.BOARD_COMMUNICATION_ERROR,
-                    18 + offset,
-                    bit=2,
-                ),
-                IntEnumParser[B8Speed](B8DeviceAttributes.SPEED, 19 + offset, B8Speed),
-            ],
-        )
+        self.parser_list.extend(_generic_parsers(offset))
+        self.parser_plan = _generic_plan(offset)
         self.parse_all()
 
         # Error description without parser
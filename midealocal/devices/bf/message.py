@@ -2,10 +2,14 @@
 
 from midealocal.const import MAX_BYTE_VALUE, DeviceType, ProtocolVersion
 from midealocal.message import (
+    BoolParser,
+    DurationParser,
+    IntParser,
     ListTypes,
     MessageBody,
     MessageRequest,
     MessageResponse,
+    MessageSchema,
     MessageType,
 )
 
@@ -73,24 +77,35 @@ class MessageSet(MessageBFBase):
 class MessageBFBody(MessageBody):
     """BF message body."""
 
+    schema = MessageSchema(
+        DurationParser(
+            "time_remaining",
+            22,
+            units=(3600, 60, 1),
+            invalid_value=MAX_BYTE_VALUE,
+        ),
+        IntParser(
+            "current_temperature",
+            25,
+            max_value=0xFFFF,
+            length_in_bytes=2,
+            first_upper=True,
+        ),
+        IntParser("status", 31),
+        BoolParser("child_lock", 32, bit=0),
+        BoolParser("door", 32, bit=1),
+        BoolParser("tank_ejected", 32, bit=2),
+        BoolParser("water_state", 32, bit=3),
+        BoolParser("water_change_reminder", 32, bit=4),
+    )
+    current_temperature: int
+
     def __init__(self, body: bytearray) -> None:
         """Initialize BF message body."""
         super().__init__(body)
-        self.status = body[31]
-        self.time_remaining = (
-            (0 if body[22] == MAX_BYTE_VALUE else body[22]) * 3600
-            + (0 if body[23] == MAX_BYTE_VALUE else body[23]) * 60
-            + (0 if body[24] == MAX_BYTE_VALUE else body[24])
-        )
-        cur_temperature = body[25] * 256 + body[26]
-        if cur_temperature == 0:
-            cur_temperature = body[27] * 256 + body[28]
-        self.current_temperature = cur_temperature
-        self.child_lock = (body[32] & 0x01) > 0
-        self.door = (body[32] & 0x02) > 0
-        self.tank_ejected = (body[32] & 0x04) > 0
-        self.water_state = (body[32] & 0x08) > 0
-        self.water_change_reminder = (body[32] & 0x10) > 0
+        self.parse_all()
+        if self.current_temperature == 0:
+            self.current_temperature = body[27] * 256 + body[28]
 
 
 class MessageBFResponse(MessageResponse):
@@ -2,10 +2,13 @@
 
 from midealocal.const import MAX_BYTE_VALUE, DeviceType
 from midealocal.message import (
+    BoolParser,
+    IntParser,
     ListTypes,
     MessageBody,
     MessageRequest,
     MessageResponse,
+    MessageSchema,
     MessageType,
 )
 
@@ -51,6 +54,19 @@ class MessageQuery(MessageCEBase):
 class MessageSet(MessageCEBase):
     """CE message set."""
 
+    schema = MessageSchema(
+        BoolParser("power", 0, bit=7),
+        IntParser("fan_speed", 1),
+        BoolParser("link_to_ac", 2, bit=0),
+        BoolParser("sleep_mode", 2, bit=1),
+        BoolParser("eco_mode", 2, bit=2),
+        BoolParser("aux_heating", 2, bit=3),
+        BoolParser("powerful_purify", 2, bit=4),
+        BoolParser("scheduled", 3),
+        BoolParser("child_lock", 5, true_value=0x7F),
+        constants={0: 0x01},
+    )
+
     def __init__(self, protocol_version: int) -> None:
         """Initialize CE message set."""
         super().__init__(
@@ -71,24 +87,7 @@ class MessageSet(MessageCEBase):
 
     @property
     def _body(self) -> bytearray:
-        power = 0x80 if self.power else 0x00
-        link_to_ac = 0x01 if self.link_to_ac else 0x00
-        sleep_mode = 0x02 if self.sleep_mode else 0x00
-        eco_mode = 0x04 if self.eco_mode else 0x00
-        aux_heating = 0x08 if self.aux_heating else 0x00
-        powerful_purify = 0x10 if self.powerful_purify else 0x00
-        scheduled = 0x01 if self.scheduled else 0x00
-        child_lock = 0x7F if self.child_lock else 0x00
-        return bytearray(
-            [
-                power | 0x01,
-                self.fan_speed,
-                link_to_ac | sleep_mode | eco_mode | aux_heating | powerful_purify,
-                scheduled,
-                0x00,
-                child_lock,
-            ],
-        )
+        return self.schema.encode(self)
 
 
 class CEGeneralMessageBody(MessageBody):
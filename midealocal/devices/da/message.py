@@ -2,10 +2,14 @@
 
 from midealocal.const import DeviceType
 from midealocal.message import (
+    BoolParser,
+    DurationParser,
+    IntParser,
     ListTypes,
     MessageBody,
     MessageRequest,
     MessageResponse,
+    MessageSchema,
     MessageType,
 )
 
@@ -90,32 +94,38 @@ class MessageStart(MessageDABase):
 class DAGeneralMessageBody(MessageBody):
     """DA message general body."""
 
+    schema = MessageSchema(
+        BoolParser("power", 1),
+        IntParser("program", 4),
+        IntParser("rinse_level", 5, mask=0xF0),
+        IntParser("wash_level", 5, mask=0x0F),
+        IntParser("dehydration_speed", 6, mask=0xF0),
+        IntParser("wash_strength", 6, mask=0x0F),
+        IntParser("softener", 8, mask=0xF0),
+        IntParser("detergent", 8, mask=0x0F),
+        IntParser("wash_time", 9),
+        IntParser("dehydration_time", 10, mask=0xF0),
+        IntParser("rinse_count", 10, mask=0x0F),
+        IntParser("soak_time", 12),
+        DurationParser("time_remaining", 17, units=(1, 60)),
+        IntParser("error_code", 24),
+    )
+    power: bool
+    time_remaining: int | None
+
     def __init__(self, body: bytearray) -> None:
         """Initialize DA message general body."""
         super().__init__(body)
-        self.power = body[1] > 0
+        self.parse_all()
         self.start = body[2] in [2, 6]
-        self.error_code = body[24]
-        self.program = body[4]
-        self.wash_time = body[9]
-        self.soak_time = body[12]
-        self.dehydration_time = (body[10] & 0xF0) >> 4
-        self.dehydration_speed = (body[6] & 0xF0) >> 4
-        self.rinse_count = body[10] & 0xF
-        self.rinse_level = (body[5] & 0xF0) >> 4
-        self.wash_level = body[5] & 0xF
-        self.wash_strength = body[6] & 0xF
-        self.softener = (body[8] & 0xF0) >> 4
-        self.detergent = body[8] & 0x0F
         self.washing_data = body[3:15]
         self.progress = 0
-        self.time_remaining: int | None = None
         for i in range(1, 7):
             if (body[16] & (1 << i)) > 0:
                 self.progress = i
                 break
-        if self.power:
-            self.time_remaining = body[17] + body[18] * 60
+        if not self.power:
+            self.time_remaining = None
 
 
 class MessageDAResponse(MessageResponse):
@@ -2,10 +2,13 @@
 
 from midealocal.const import DeviceType
 from midealocal.message import (
+    BoolParser,
+    IntParser,
     ListTypes,
     MessageBody,
     MessageRequest,
     MessageResponse,
+    MessageSchema,
     MessageType,
 )
 
@@ -114,20 +117,26 @@ class MessageStart(MessageDBBase):
 class DBGeneralMessageBody(MessageBody):
     """DB message general body."""
 
+    schema = MessageSchema(
+        BoolParser("power", 1),
+        IntParser("time_remaining", 17, max_value=0xFFFF, length_in_bytes=2),
+    )
+    power: bool
+    time_remaining: float | None
+
     def __init__(self, body: bytearray) -> None:
         """Initialize DB message general body."""
         super().__init__(body)
-        self.power = body[1] > 0
+        self.parse_all()
         self.start = body[2] in [2, 6]
         self.washing_data = body[3:16]
         self.progress = 0
-        self.time_remaining: float | None = None
         for i in range(7):
             if (body[16] & (1 << i)) > 0:
                 self.progress = i + 1
                 break
-        if self.power:
-            self.time_remaining = body[17] + (body[18] << 8)
+        if not self.power:
+            self.time_remaining = None
 
 
 class MessageDBResponse(MessageResponse):
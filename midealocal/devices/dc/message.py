@@ -2,10 +2,13 @@
 
 from midealocal.const import DeviceType
 from midealocal.message import (
+    BoolParser,
+    DurationParser,
     ListTypes,
     MessageBody,
     MessageRequest,
     MessageResponse,
+    MessageSchema,
     MessageType,
 )
 
@@ -90,20 +93,26 @@ class MessageStart(MessageDCBase):
 class DCGeneralMessageBody(MessageBody):
     """DC message general body."""
 
+    schema = MessageSchema(
+        BoolParser("power", 1),
+        DurationParser("time_remaining", 17, units=(1, 60)),
+    )
+    power: bool
+    time_remaining: float | None
+
     def __init__(self, body: bytearray) -> None:
         """Initialize DC message general body."""
         super().__init__(body)
-        self.power = body[1] > 0
+        self.parse_all()
         self.start = body[2] in [2, 6]
         self.washing_data = body[3:15]
         self.progress = 0
-        self.time_remaining: float | None = None
         for i in range(7):
             if (body[16] & (1 << i)) > 0:
                 self.progress = i + 1
                 break
-        if self.power:
-            self.time_remaining = body[17] + body[18] * 60
+        if not self.power:
+            self.time_remaining = None
 
 
 class MessageDCResponse(MessageResponse):
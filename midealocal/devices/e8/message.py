@@ -4,10 +4,14 @@ from enum import IntEnum
 
 from midealocal.const import DeviceType
 from midealocal.message import (
+    BoolParser,
+    DurationParser,
+    IntParser,
     ListTypes,
     MessageBody,
     MessageRequest,
     MessageResponse,
+    MessageSchema,
     MessageType,
 )
 
@@ -63,17 +67,21 @@ class MessageQuery(MessageE8Base):
 class E8MessageBody(MessageBody):
     """E8 message body."""
 
+    schema = MessageSchema(
+        IntParser("status", 11),
+        DurationParser("time_remaining", 16, units=(3600, 60, 1)),
+        DurationParser("keep_warm_remaining", 19, units=(3600, 60, 1)),
+        DurationParser("working_time", 28, units=(3600, 60, 1)),
+        IntParser("target_temperature", 39),
+        IntParser("current_temperature", 39),
+        BoolParser("finished", 41, bit=0),
+        BoolParser("water_shortage", 43),
+    )
+
     def __init__(self, body: bytearray) -> None:
         """Initialize E8 message body."""
         super().__init__(body)
-        self.status = body[11]
-        self.time_remaining = body[16] * 3600 + body[17] * 60 + body[18]
-        self.keep_warm_remaining = body[19] * 3600 + body[20] * 60 + body[21]
-        self.working_time = body[28] * 3600 + body[29] * 60 + body[30]
-        self.target_temperature = body[39]
-        self.current_temperature = body[39]
-        self.finished = (body[41] & 0x01) > 0
-        self.water_shortage = body[43] > 0
+        self.parse_all()
 
 
 class MessageE8Response(MessageResponse):
@@ -2,10 +2,14 @@
 
 from midealocal.const import DeviceType
 from midealocal.message import (
+    BoolParser,
+    DurationParser,
+    IntParser,
     ListTypes,
     MessageBody,
     MessageRequest,
     MessageResponse,
+    MessageSchema,
     MessageType,
 )
 
@@ -55,32 +59,42 @@ class MessageQuery(MessageECBase):
 class ECGeneralMessageBody(MessageBody):
     """EC message general body."""
 
+    schema = MessageSchema(
+        IntParser("mode", 4, max_value=0xFFFF, length_in_bytes=2),
+        IntParser("progress", 8),
+        DurationParser("time_remaining", 12),
+        DurationParser("keep_warm_time", 16),
+        IntParser("top_temperature", 21),
+        IntParser("bottom_temperature", 22),
+        BoolParser("with_pressure", 23, bit=2),
+    )
+    progress: int
+
     def __init__(self, body: bytearray) -> None:
         """Initialize EC message general body."""
         super().__init__(body)
-        self.mode = body[4] + (body[5] << 8)
-        self.progress = body[8]
+        self.parse_all()
         self.cooking = self.progress == 1
-        self.time_remaining = body[12] * 60 + body[13]
-        self.keep_warm_time = body[16] * 60 + body[17]
-        self.top_temperature = body[21]
-        self.bottom_temperature = body[22]
-        self.with_pressure = (body[23] & 0x04) > 0
 
 
 class ECBodyNew(MessageBody):
     """EC message new body."""
 
+    schema = MessageSchema(
+        IntParser("progress", 11),
+        DurationParser("time_remaining", 16),
+        DurationParser("keep_warm_time", 19),
+        IntParser("top_temperature", 48),
+        IntParser("bottom_temperature", 49),
+        BoolParser("with_pressure", 33),
+    )
+    progress: int
+
     def __init__(self, body: bytearray) -> None:
         """Initialize EC message new body."""
         super().__init__(body)
-        self.progress = body[11]
+        self.parse_all()
         self.cooking = self.progress == 1
-        self.time_remaining = body[16] * 60 + body[17]
-        self.keep_warm_time = body[19] * 60 + body[20]
-        self.top_temperature = body[48]
-        self.bottom_temperature = body[49]
-        self.with_pressure = body[33] > 0
 
 
 class MessageECResponse(MessageResponse):
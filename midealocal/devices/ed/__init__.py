@@ -1,6 +1,7 @@
 """Midea local ED device."""
 
 import logging
+from collections.abc import Hashable
 from enum import StrEnum
 from typing import Any
 
@@ -81,6 +82,10 @@ class MideaEDDevice(MideaDevice):
         """Midea ED device build query."""
         return [MessageQuery(self._message_protocol_version, self._device_class)]
 
+    def query_cache_key(self) -> Hashable:
+        """Midea ED device query cache key."""
+        return self._message_protocol_version, self._device_class
+
     def process_message(self, msg: bytes) -> dict[str, Any]:
         """Midea ED device process message."""
         message = MessageEDResponse(msg)
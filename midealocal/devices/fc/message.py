@@ -46,10 +46,18 @@ class MessageFCBase(MessageRequest):
             message_type=message_type,
             body_type=body_type,
         )
+        self._message_id = self._next_message_id()
+
+    @staticmethod
+    def _next_message_id() -> int:
         MessageFCBase._message_serial += 1
         if MessageFCBase._message_serial >= MAX_MSG_SERIAL_NUM:
             MessageFCBase._message_serial = 1
-        self._message_id = MessageFCBase._message_serial
+        return MessageFCBase._message_serial
+
+    def renew_message_id(self) -> None:
+        """Assign the next message id, before sending the message again."""
+        self._message_id = self._next_message_id()
 
     @property
     def _body(self) -> bytearray:
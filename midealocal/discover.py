@@ -1,13 +1,17 @@
 """Midea local discover."""
 
+import asyncio
 import logging
 import socket
+from collections.abc import AsyncGenerator, Coroutine, Iterable, Iterator
 from ipaddress import IPv4Network
+from itertools import islice
 from typing import Any
 
 import ifaddr
 from defusedxml import ElementTree
 
+from .const import ProtocolVersion
 from .exceptions import ElementMissing
 from .security import LocalSecurity
 
@@ -153,82 +157,117 @@ DEVICE_INFO_MSG = bytearray(
 )
 
 DISCOVERY_MIN_RESPONSE_LENGTH = 104
+DISCOVERY_PORTS = (6445, 20086)
+DISCOVERY_DURATION = 5
+DEVICE_INFO_TIMEOUT = 8
+# hosts probed per batch of a sweep and seconds between batches
+SWEEP_CONCURRENCY = 256
+SWEEP_INTERVAL = 0.01
+V2_HEADER = b"\x5a\x5a"
+V3_HEADER = b"\x83\x70"
+XML_HEADER = b"<?xml "
 MAX_NETWORK_PREFIX_LENGHT = 32
 SERIAL_TYPE1_LENGTH = 32
 SERIAL_TYPE2_LENGTH = 22
 
 
+def _secure_response(data: bytes) -> tuple[int, bytes] | None:
+    """Protocol version and 5A5A packet of a V2/V3 discovery response."""
+    if len(data) < DISCOVERY_MIN_RESPONSE_LENGTH:
+        return None
+    if data[:2] == V2_HEADER:
+        return ProtocolVersion.V2, data
+    if data[:2] == V3_HEADER and data[8:10] == V2_HEADER:
+        return ProtocolVersion.V3, data[8:-16]
+    return None
+
+
+def _packet_device_id(packet: bytes) -> int:
+    return int.from_bytes(packet[20:26], "little")
+
+
+def _secure_device(packet: bytes, protocol: int, ip: str) -> dict[str, Any]:
+    """Device of the 5A5A packet of a V2/V3 discovery response."""
+    device_id = _packet_device_id(packet)
+    reply = LocalSecurity().aes_decrypt(packet[40:-16])
+    _LOGGER.debug("Declassified reply: %s", reply.hex())
+    ssid = reply[41 : 41 + reply[40]].decode("utf-8")
+    return {
+        "device_id": device_id,
+        "type": int(ssid.split("_")[1], 16),
+        "ip_address": ip,
+        "port": bytes2port(bytes(reply[4:8])),
+        "model": reply[17:25].decode("utf-8"),
+        "sn": reply[8:40].decode("utf-8"),
+        "protocol": protocol,
+    }
+
+
+def _xml_response(data: bytes) -> tuple[int, str, str] | None:
+    """Port, serial number and device type of a V1 discovery response."""
+    if data[:6] != XML_HEADER:
+        return None
+    root = ElementTree.fromstring(
+        data.decode(encoding="utf-8", errors="replace"),
+    )
+    child = root.find("body/device")
+    if not child:
+        raise ElementMissing
+    m = child.attrib
+    return int(m["port"]), m["apc_sn"], str(hex(int(m["apc_type"])))[2:]
+
+
+def _xml_device(
+    ip: str,
+    port: int,
+    sn: str,
+    device_type: str,
+    response: bytearray,
+) -> dict[str, Any]:
+    """Device of a V1 discovery response and its device info response."""
+    device_id = get_id_from_response(response)
+    if len(sn) == SERIAL_TYPE1_LENGTH:
+        model = sn[9:17]
+    elif len(sn) == SERIAL_TYPE2_LENGTH:
+        model = sn[3:11]
+    else:
+        model = ""
+    return {
+        "device_id": device_id,
+        "type": int(device_type, 16),
+        "ip_address": ip,
+        "port": port,
+        "model": model,
+        "sn": sn,
+        "protocol": ProtocolVersion.V1,
+    }
+
+
 def _parse_discover_response(
     sock: socket.socket,
     found_devices: dict[int, dict[str, Any]],
 ) -> tuple[int, dict[str, Any] | None]:
-    security = LocalSecurity()
     data, addr = sock.recvfrom(512)
     ip = addr[0]
     _LOGGER.debug("Received response from %s: %s", addr, data.hex())
-    if len(data) >= DISCOVERY_MIN_RESPONSE_LENGTH and (
-        data[:2].hex() == "5a5a" or data[8:10].hex() == "5a5a"
-    ):
-        if data[:2].hex() == "5a5a":
-            protocol = 2
-        elif data[:2].hex() == "8370":
-            protocol = 3
-            if data[8:10].hex() == "5a5a":
-                data = data[8:-16]
-        else:
+    secure = _secure_response(data)
+    if secure is not None:
+        protocol, packet = secure
+        if _packet_device_id(packet) in found_devices:
             return 0, None
-        device_id = int.from_bytes(
-            bytearray.fromhex(data[20:26].hex()),
-            "little",
-        )
-        if device_id in found_devices:
-            return 0, None
-        encrypt_data = data[40:-16]
-        reply = security.aes_decrypt(encrypt_data)
-        _LOGGER.debug("Declassified reply: %s", reply.hex())
-        ssid = reply[41 : 41 + reply[40]].decode("utf-8")
-        device_type = ssid.split("_")[1]
-        port = bytes2port(reply[4:8])
-        model = reply[17:25].decode("utf-8")
-        sn = reply[8:40].decode("utf-8")
-    elif data[:6].hex() == "3c3f786d6c20":
-        protocol = 1
-        root = ElementTree.fromstring(
-            data.decode(encoding="utf-8", errors="replace"),
-        )
-        child = root.find("body/device")
-        if not child:
-            raise ElementMissing
-        m = child.attrib
-        port, sn, device_type = (
-            int(m["port"]),
-            m["apc_sn"],
-            str(hex(int(m["apc_type"])))[2:],
-        )
-        response = get_device_info(ip, int(port))
-        device_id = get_id_from_response(response)
-        if len(sn) == SERIAL_TYPE1_LENGTH:
-            model = sn[9:17]
-        elif len(sn) == SERIAL_TYPE2_LENGTH:
-            model = sn[3:11]
-        else:
-            model = ""
+        device = _secure_device(packet, protocol, ip)
+    elif (xml := _xml_response(data)) is not None:
+        port, sn, device_type = xml
+        response = get_device_info(ip, port)
+        device = _xml_device(ip, port, sn, device_type, response)
     else:
         return 0, None
-    return device_id, {
-        "device_id": device_id,
-        "type": int(device_type, 16),
-        "ip_address": ip,
-        "port": port,
-        "model": model,
-        "sn": sn,
-        "protocol": protocol,
-    }
+    return device["device_id"], device
 
 
 def discover(
     discover_type: list | None = None,
-    ip_address: list | None = None,
+    ip_address: str | None = None,
 ) -> dict[int, dict[str, Any]]:
     """Discover devices."""
     if discover_type is None:
@@ -243,8 +282,8 @@ def discover(
     _LOGGER.debug("All addresses for broadcast: %s", addrs)
     for addr in addrs:
         try:
-            sock.sendto(BROADCAST_MSG, (addr, 6445))
-            sock.sendto(BROADCAST_MSG, (addr, 20086))
+            for port in DISCOVERY_PORTS:
+                sock.sendto(BROADCAST_MSG, (addr, port))
         except OSError as e:
             _LOGGER.warning("Can't access network %s: %s", addrs, repr(e))
     while True:
@@ -264,6 +303,307 @@ def discover(
     return found_devices
 
 
+class _DiscoveryProtocol(asyncio.DatagramProtocol):
+    """Queue the responses received on a discovery socket."""
+
+    def __init__(self, queue: "asyncio.Queue[_DiscoveryItem]") -> None:
+        """Initialize discovery protocol."""
+        self._queue = queue
+        self._writable = asyncio.Event()
+        self._writable.set()
+
+    def datagram_received(self, data: bytes, addr: tuple[str | Any, int]) -> None:
+        """Queue a response."""
+        _LOGGER.debug("Received response from %s: %s", addr, data.hex())
+        self._queue.put_nowait((data, addr[0]))
+
+    def error_received(self, exc: Exception) -> None:
+        """Log a socket error."""
+        _LOGGER.debug("Discovery socket error: %s", exc)
+
+    def pause_writing(self) -> None:
+        """Hold the probes while the send buffer is full."""
+        self._writable.clear()
+
+    def resume_writing(self) -> None:
+        """Resume the probes."""
+        self._writable.set()
+
+    def connection_lost(self, exc: Exception | None) -> None:  # noqa: ARG002
+        """Release the probes of a closed socket."""
+        self._writable.set()
+
+    async def drain(self) -> None:
+        """Wait for the send buffer to flush."""
+        await self._writable.wait()
+
+
+# a datagram and its sender, a V1 device, or None to wake the scan once the
+# probes are sent or a V1 info request failed
+_DiscoveryItem = tuple[bytes, str] | dict[str, Any] | None
+
+
+class _DiscoveryScan:
+    """Sockets, pending V1 info requests and found devices of one scan."""
+
+    def __init__(
+        self,
+        discover_type: Iterable[int] | None,
+        expected_ids: Iterable[int] | None,
+    ) -> None:
+        """Initialize discovery scan."""
+        self.queue: asyncio.Queue[_DiscoveryItem] = asyncio.Queue()
+        self.transports: list[asyncio.DatagramTransport] = []
+        self.follow_ups: set[asyncio.Task[None]] = set()
+        self.found: set[int] = set()
+        self._queried: set[str] = set()
+        self._types = set(discover_type or ())
+        self._expected = set(expected_ids) if expected_ids is not None else None
+
+    @property
+    def complete(self) -> bool:
+        """Whether all the expected devices were found."""
+        return self._expected is not None and self._expected <= self.found
+
+    async def broadcast(self, addrs: list[str], ports: Iterable[int]) -> None:
+        """Send the discovery message to all addresses, one socket each."""
+        ports = tuple(ports)
+        await asyncio.gather(*(self._broadcast(addr, ports) for addr in addrs))
+
+    async def _broadcast(self, addr: str, ports: tuple[int, ...]) -> None:
+        endpoint = await self._endpoint(addr)
+        if endpoint is None:
+            return
+        transport, _ = endpoint
+        for port in ports:
+            transport.sendto(BROADCAST_MSG, (addr, port))
+
+    async def sweep(
+        self,
+        hosts: Iterator[str],
+        ports: Iterable[int],
+        concurrency: int,
+        interval: float,
+    ) -> None:
+        """Send the discovery message unicast to each host, in paced batches.
+
+        Hosts are read from the iterator one batch at a time and the next
+        batch waits for the send buffer to flush, memory stays bounded for
+        any range size.
+        """
+        endpoint = await self._endpoint("sweep")
+        if endpoint is None:
+            return
+        transport, protocol = endpoint
+        ports = tuple(ports)
+        sent = 0
+        while batch := list(islice(hosts, concurrency)):
+            for host in batch:
+                for port in ports:
+                    transport.sendto(BROADCAST_MSG, (host, port))
+            sent += len(batch)
+            await protocol.drain()
+            await asyncio.sleep(interval)
+        _LOGGER.debug("Swept %d hosts", sent)
+
+    async def _endpoint(
+        self,
+        addr: str,
+    ) -> tuple[asyncio.DatagramTransport, _DiscoveryProtocol] | None:
+        loop = asyncio.get_running_loop()
+        try:
+            transport, protocol = await loop.create_datagram_endpoint(
+                lambda: _DiscoveryProtocol(self.queue),
+                family=socket.AF_INET,
+                allow_broadcast=True,
+            )
+        except OSError as e:
+            _LOGGER.warning("Can't access network %s: %s", addr, repr(e))
+            return None
+        self.transports.append(transport)
+        return transport, protocol
+
+    async def send(self, probes: Coroutine[Any, Any, None]) -> None:
+        """Send the probes, then wake the scan to start its duration."""
+        try:
+            await probes
+        finally:
+            self.queue.put_nowait(None)
+
+    def close_transports(self) -> None:
+        """Stop receiving responses."""
+        for transport in self.transports:
+            transport.close()
+        self.transports.clear()
+
+    async def close(self) -> None:
+        """Close the sockets and cancel the pending info requests."""
+        self.close_transports()
+        for task in self.follow_ups:
+            task.cancel()
+        await asyncio.gather(*self.follow_ups, return_exceptions=True)
+
+    def device(self, item: _DiscoveryItem) -> dict[str, Any] | None:
+        """Decode a queued item, a new wanted device or None."""
+        if isinstance(item, tuple):
+            data, ip = item
+            try:
+                device = self._decode(data, ip)
+            except (ValueError, LookupError, ElementMissing, SyntaxError) as e:
+                _LOGGER.debug("Invalid discovery response from %s: %s", ip, e)
+                return None
+        else:
+            device = item
+        if device is None or device["device_id"] in self.found:
+            return None
+        if self._types and device["type"] not in self._types:
+            _LOGGER.debug("Found a unsupported device: %s", device)
+            return None
+        _LOGGER.debug("Found a supported device: %s", device)
+        self.found.add(device["device_id"])
+        return device
+
+    def _decode(self, data: bytes, ip: str) -> dict[str, Any] | None:
+        secure = _secure_response(data)
+        if secure is not None:
+            protocol, packet = secure
+            if _packet_device_id(packet) in self.found:
+                return None
+            return _secure_device(packet, protocol, ip)
+        xml = _xml_response(data)
+        if xml is not None and ip not in self._queried:
+            # V1 devices answer each discovery port, ask them only once
+            self._queried.add(ip)
+            task = asyncio.create_task(self._device_info(ip, *xml))
+            self.follow_ups.add(task)
+            task.add_done_callback(self.follow_ups.discard)
+        return None
+
+    async def _device_info(
+        self,
+        ip: str,
+        port: int,
+        sn: str,
+        device_type: str,
+    ) -> None:
+        device = None
+        try:
+            response = await async_get_device_info(ip, port)
+            device = _xml_device(ip, port, sn, device_type, response)
+        except (ValueError, LookupError, ElementMissing, SyntaxError) as e:
+            _LOGGER.debug("Invalid device info from %s: %s", ip, e)
+        finally:
+            self.queue.put_nowait(device)
+
+
+async def _scan_devices(
+    scan: _DiscoveryScan,
+    probes: Coroutine[Any, Any, None],
+    duration: float,
+) -> AsyncGenerator[dict[str, Any], None]:
+    """Yield the devices found by a scan, until ``duration`` after the probes."""
+    loop = asyncio.get_running_loop()
+    sender = asyncio.create_task(scan.send(probes))
+    deadline: float | None = None
+    try:
+        while not scan.complete:
+            if deadline is None and sender.done():
+                deadline = loop.time() + duration
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                scan.close_transports()
+                if not scan.follow_ups and scan.queue.empty():
+                    break
+                remaining = None
+            try:
+                async with asyncio.timeout(remaining):
+                    item = await scan.queue.get()
+            except TimeoutError:
+                continue
+            device = scan.device(item)
+            if device is not None:
+                yield device
+    finally:
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
+        await scan.close()
+
+
+async def async_discover_iter(
+    discover_type: Iterable[int] | None = None,
+    ip_address: str | None = None,
+    duration: float = DISCOVERY_DURATION,
+    expected_ids: Iterable[int] | None = None,
+    ports: Iterable[int] = DISCOVERY_PORTS,
+) -> AsyncGenerator[dict[str, Any], None]:
+    """Discover devices, yielding each one as soon as it is decoded.
+
+    All broadcast addresses are scanned at once, responses are collected for
+    ``duration`` seconds, and the device info requests of V1 devices run
+    concurrently, awaited even past the duration. The scan stops as soon as
+    all ``expected_ids`` are found. Close the iterator when breaking out
+    early, for instance with ``contextlib.aclosing``.
+    """
+    scan = _DiscoveryScan(discover_type, expected_ids)
+    addrs = enum_all_broadcast() if ip_address is None else [ip_address]
+    _LOGGER.debug("All addresses for broadcast: %s", addrs)
+    async for device in _scan_devices(scan, scan.broadcast(addrs, ports), duration):
+        yield device
+
+
+def network_hosts(networks: Iterable[str | IPv4Network]) -> Iterator[str]:
+    """Lazily enumerate the host addresses of CIDR ranges."""
+    for network in networks:
+        for host in IPv4Network(network, strict=False).hosts():
+            yield str(host)
+
+
+async def async_discover_sweep(
+    networks: Iterable[str | IPv4Network],
+    discover_type: Iterable[int] | None = None,
+    duration: float = DISCOVERY_DURATION,
+    expected_ids: Iterable[int] | None = None,
+    ports: Iterable[int] = DISCOVERY_PORTS,
+    concurrency: int = SWEEP_CONCURRENCY,
+    interval: float = SWEEP_INTERVAL,
+) -> AsyncGenerator[dict[str, Any], None]:
+    """Discover devices of CIDR ranges, beyond the local broadcast domains.
+
+    The discovery message is sent unicast to every host of ``networks``,
+    ``concurrency`` hosts at a time with ``interval`` seconds between
+    batches, from a single socket. A /16 takes about 65536 / ``concurrency``
+    * ``interval`` seconds to sweep, responses are collected until
+    ``duration`` seconds after the last batch. Devices are yielded and
+    deduplicated as with ``async_discover_iter``.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be positive")
+    scan = _DiscoveryScan(discover_type, expected_ids)
+    probes = scan.sweep(network_hosts(networks), ports, concurrency, interval)
+    async for device in _scan_devices(scan, probes, duration):
+        yield device
+
+
+async def async_discover(
+    discover_type: Iterable[int] | None = None,
+    ip_address: str | None = None,
+    duration: float = DISCOVERY_DURATION,
+    expected_ids: Iterable[int] | None = None,
+    ports: Iterable[int] = DISCOVERY_PORTS,
+) -> dict[int, dict[str, Any]]:
+    """Discover devices from an event loop, as ``discover``."""
+    return {
+        device["device_id"]: device
+        async for device in async_discover_iter(
+            discover_type,
+            ip_address,
+            duration,
+            expected_ids,
+            ports,
+        )
+    }
+
+
 def get_id_from_response(response: bytearray) -> int:
     """Get ID from response."""
     if response[64:-16][:6].hex() == "3c3f786d6c20":
@@ -294,7 +634,7 @@ def get_device_info(device_ip: str, device_port: int) -> bytearray:
     response = bytearray(0)
     try:
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            sock.settimeout(8)
+            sock.settimeout(DEVICE_INFO_TIMEOUT)
             device_address = (device_ip, device_port)
             sock.connect(device_address)
             _LOGGER.debug(
@@ -317,6 +657,39 @@ def get_device_info(device_ip: str, device_port: int) -> bytearray:
     return response
 
 
+async def async_get_device_info(
+    device_ip: str,
+    device_port: int,
+) -> bytearray:
+    """Get device info from an event loop."""
+    response = bytearray(0)
+    try:
+        async with asyncio.timeout(DEVICE_INFO_TIMEOUT):
+            reader, writer = await asyncio.open_connection(device_ip, device_port)
+            try:
+                _LOGGER.debug(
+                    "Sending to %s:%s %s",
+                    device_ip,
+                    device_port,
+                    DEVICE_INFO_MSG.hex(),
+                )
+                writer.write(DEVICE_INFO_MSG)
+                await writer.drain()
+                response = bytearray(await reader.read(512))
+            finally:
+                writer.close()
+    except TimeoutError:
+        _LOGGER.warning(
+            "Connect the device %s:%s timed out for %ss.",
+            device_ip,
+            device_port,
+            DEVICE_INFO_TIMEOUT,
+        )
+    except OSError:
+        _LOGGER.warning("Can't connect to Device %s:%s", device_ip, device_port)
+    return response
+
+
 def enum_all_broadcast() -> list:
     """Enum all broadcast addresses."""
     nets = []
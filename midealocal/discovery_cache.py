@@ -0,0 +1,252 @@
+"""Midea local persistent discovery cache."""
+
+import asyncio
+import contextlib
+import json
+import logging
+import threading
+import time
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from .const import ProtocolVersion
+from .discover import DISCOVERY_PORTS, async_discover, async_discover_iter
+from .storage import write_json_atomic
+
+if TYPE_CHECKING:
+    from .device import MideaDevice
+
+_LOGGER = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+# seconds an entry is trusted without probing its device again
+DEFAULT_TTL = 3600.0
+# seconds a single unicast probe waits for its device
+PROBE_DURATION = 1.0
+DEFAULT_REFRESH_INTERVAL = 600.0
+
+
+class DiscoveryCache:
+    """Discovered devices by device id in a JSON file, with a time to live.
+
+    Entries are the device dicts of ``discover`` with their ``last_seen``
+    time. Fresh entries are used as is, stale ones are validated with a
+    single unicast probe to their last address before falling back to a
+    full discovery. When a device shows up at another address, the
+    registered devices with its id are moved with ``set_ip_address``.
+    """
+
+    def __init__(self, path: str | Path, ttl: float = DEFAULT_TTL) -> None:
+        """Initialize discovery cache."""
+        self._path = Path(path)
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: dict[int, dict[str, Any]] = {}
+        self._devices: dict[int, list[MideaDevice]] = {}
+        self._refresh_task: asyncio.Task[None] | None = None
+        self._load()
+
+    @property
+    def path(self) -> Path:
+        """Cache file path."""
+        return self._path
+
+    @property
+    def ttl(self) -> float:
+        """Seconds an entry stays fresh."""
+        return self._ttl
+
+    def is_fresh(self, entry: Mapping[str, Any]) -> bool:
+        """Whether an entry was seen less than ``ttl`` seconds ago."""
+        return time.time() - float(entry.get("last_seen", 0)) < self._ttl
+
+    def get(
+        self,
+        device_id: int,
+        include_stale: bool = False,
+    ) -> dict[str, Any] | None:
+        """Return the cached device, None if unknown or stale."""
+        with self._lock:
+            entry = self._entries.get(device_id)
+        if entry is None or not (include_stale or self.is_fresh(entry)):
+            return None
+        return dict(entry)
+
+    def find(self, ip_address: str) -> dict[str, Any] | None:
+        """Return the device last seen at an address, fresh or stale."""
+        with self._lock:
+            entries = [
+                e for e in self._entries.values() if e["ip_address"] == ip_address
+            ]
+        if not entries:
+            return None
+        return dict(max(entries, key=lambda entry: entry["last_seen"]))
+
+    def devices(self, include_stale: bool = False) -> dict[int, dict[str, Any]]:
+        """Return the cached devices by device id."""
+        with self._lock:
+            entries = list(self._entries.values())
+        return {
+            entry["device_id"]: dict(entry)
+            for entry in entries
+            if include_stale or self.is_fresh(entry)
+        }
+
+    def update(self, devices: Iterable[Mapping[str, Any]]) -> list[int]:
+        """Store discovered devices, return the ids of those that moved."""
+        now = time.time()
+        moved: list[tuple[int, str]] = []
+        with self._lock:
+            for device in devices:
+                device_id = device["device_id"]
+                previous = self._entries.get(device_id)
+                if previous and previous["ip_address"] != device["ip_address"]:
+                    _LOGGER.info(
+                        "[%s] IP address changed from %s to %s",
+                        device_id,
+                        previous["ip_address"],
+                        device["ip_address"],
+                    )
+                    moved.append((device_id, device["ip_address"]))
+                self._entries[device_id] = {**device, "last_seen": now}
+            self._save()
+            registered = {
+                device_id: list(self._devices.get(device_id, []))
+                for device_id, _ in moved
+            }
+        for device_id, ip_address in moved:
+            for running in registered[device_id]:
+                running.set_ip_address(ip_address)
+        return [device_id for device_id, _ in moved]
+
+    async def async_update(self, devices: Iterable[Mapping[str, Any]]) -> list[int]:
+        """Store discovered devices as ``update``, saving in an executor."""
+        return await asyncio.get_running_loop().run_in_executor(
+            None,
+            self.update,
+            list(devices),
+        )
+
+    def remove(self, device_id: int) -> None:
+        """Forget a device."""
+        with self._lock:
+            if self._entries.pop(device_id, None):
+                self._save()
+
+    def clear(self) -> None:
+        """Forget all devices."""
+        with self._lock:
+            self._entries.clear()
+            self._save()
+
+    def register_device(self, device: "MideaDevice") -> None:
+        """Move a running device when its address changes."""
+        with self._lock:
+            self._devices.setdefault(device.device_id, []).append(device)
+
+    def unregister_device(self, device: "MideaDevice") -> None:
+        """Stop moving a device."""
+        with self._lock:
+            devices = self._devices.get(device.device_id, [])
+            if device in devices:
+                devices.remove(device)
+            if not devices:
+                self._devices.pop(device.device_id, None)
+
+    async def async_validate(
+        self,
+        device_id: int,
+        ports: Iterable[int] = DISCOVERY_PORTS,
+    ) -> dict[str, Any] | None:
+        """Probe a cached device at its last address, None if it is not there."""
+        entry = self.get(device_id, include_stale=True)
+        if entry is None:
+            return None
+        async with contextlib.aclosing(
+            async_discover_iter(
+                ip_address=entry["ip_address"],
+                duration=PROBE_DURATION,
+                expected_ids=[device_id],
+                ports=ports,
+            ),
+        ) as found:
+            async for device in found:
+                if device["device_id"] == device_id:
+                    await self.async_update([device])
+                    return device
+        return None
+
+    async def async_lookup(
+        self,
+        device_id: int,
+        ports: Iterable[int] = DISCOVERY_PORTS,
+    ) -> dict[str, Any] | None:
+        """Return a device, from the cache, a single probe or a discovery."""
+        entry = self.get(device_id)
+        if entry is not None:
+            return entry
+        device = await self.async_validate(device_id, ports)
+        if device is not None:
+            return device
+        await self.async_refresh(expected_ids=[device_id], ports=ports)
+        return self.get(device_id)
+
+    async def async_refresh(
+        self,
+        expected_ids: Iterable[int] | None = None,
+        ports: Iterable[int] = DISCOVERY_PORTS,
+    ) -> dict[int, dict[str, Any]]:
+        """Discover the devices of the local networks and store them."""
+        devices = await async_discover(expected_ids=expected_ids, ports=ports)
+        await self.async_update(devices.values())
+        return devices
+
+    def start_refresh(self, interval: float = DEFAULT_REFRESH_INTERVAL) -> None:
+        """Refresh the cache every ``interval`` seconds in the running loop."""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.get_running_loop().create_task(
+                self._refresh_loop(interval),
+            )
+
+    async def stop_refresh(self) -> None:
+        """Stop the background refresh."""
+        task, self._refresh_task = self._refresh_task, None
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def _refresh_loop(self, interval: float) -> None:
+        while True:
+            try:
+                await self.async_refresh()
+            except OSError as e:
+                _LOGGER.warning("Discovery refresh failed: %s", e)
+            await asyncio.sleep(interval)
+
+    def _load(self) -> None:
+        try:
+            with self._path.open(encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != CACHE_VERSION:
+                _LOGGER.debug(
+                    "Ignoring discovery cache version %s",
+                    data.get("version"),
+                )
+                return
+            for entry in data["devices"]:
+                entry["protocol"] = ProtocolVersion(entry["protocol"])
+                self._entries[int(entry["device_id"])] = entry
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            self._entries.clear()
+            _LOGGER.warning("Ignoring invalid discovery cache %s: %s", self._path, e)
+
+    def _save(self) -> None:
+        data = {"version": CACHE_VERSION, "devices": list(self._entries.values())}
+        try:
+            write_json_atomic(self._path, data)
+        except OSError as e:
+            _LOGGER.warning("Unable to write discovery cache %s: %s", self._path, e)
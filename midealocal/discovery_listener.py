@@ -0,0 +1,280 @@
+"""Midea local passive discovery listener."""
+
+import contextlib
+import logging
+import random
+import selectors
+import socket
+import threading
+import time
+from collections.abc import Callable, Iterable
+from enum import StrEnum
+from typing import TYPE_CHECKING, Any
+
+from .const import ProtocolVersion
+from .discover import (
+    BROADCAST_MSG,
+    DISCOVERY_PORTS,
+    _secure_device,
+    _secure_response,
+    _xml_device,
+    _xml_response,
+    enum_all_broadcast,
+    get_device_info,
+)
+from .exceptions import ElementMissing
+
+if TYPE_CHECKING:
+    from .discovery_cache import DiscoveryCache
+
+_LOGGER = logging.getLogger(__name__)
+
+# seconds between probes, each one moved by up to +/- jitter of the interval
+DEFAULT_PROBE_INTERVAL = 300.0
+DEFAULT_JITTER = 0.2
+# probes a device can miss before it is removed
+MISSED_PROBES = 3
+RECV_BUFFER_SIZE = 512
+
+
+class DiscoveryEvent(StrEnum):
+    """Change of the devices tracked by a discovery listener."""
+
+    ADDED = "added"
+    REMOVED = "removed"
+    IP_CHANGED = "ip_changed"
+
+
+DiscoveryCallback = Callable[[DiscoveryEvent, dict[str, Any]], None]
+
+
+class DiscoveryListener(threading.Thread):
+    """Track the devices answering discovery on one socket, continuously.
+
+    Every response received on the socket, to the listener's own probes or
+    sent unsolicited, refreshes the registry of devices. Probes are broadcast
+    every ``probe_interval`` seconds, moved by a random ``jitter`` fraction
+    of the interval so listeners on a network do not probe in sync. A device
+    silent for ``MISSED_PROBES`` intervals is removed. Callbacks are called
+    on the listener thread with the event and the device, an IP change
+    carries the former address in ``previous_ip_address``.
+    """
+
+    def __init__(
+        self,
+        addresses: Iterable[str] | None = None,
+        probe_interval: float = DEFAULT_PROBE_INTERVAL,
+        jitter: float = DEFAULT_JITTER,
+        ports: Iterable[int] = DISCOVERY_PORTS,
+        listen_port: int = 0,
+        cache: "DiscoveryCache | None" = None,
+    ) -> None:
+        """Initialize discovery listener.
+
+        ``addresses`` are probed instead of the broadcast addresses of the
+        local networks. Added and moved devices are stored in ``cache``,
+        which moves its registered devices with ``set_ip_address``.
+        """
+        threading.Thread.__init__(self, name="midea-discovery-listener", daemon=True)
+        self._addresses = list(addresses) if addresses is not None else None
+        self._probe_interval = probe_interval
+        self._jitter = jitter
+        self._ports = tuple(ports)
+        self._listen_port = listen_port
+        self._cache = cache
+        self._expiry = probe_interval * (1 + jitter) * MISSED_PROBES
+        self._lock = threading.Lock()
+        self._devices: dict[int, dict[str, Any]] = {}
+        self._last_seen: dict[int, float] = {}
+        self._callbacks: list[DiscoveryCallback] = []
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_reader, self._wakeup_writer = socket.socketpair()
+        self._wakeup_reader.setblocking(False)
+        self._wakeup_writer.setblocking(False)
+        self._selector.register(self._wakeup_reader, selectors.EVENT_READ)
+        self._next_probe = 0.0
+        self._is_run = False
+        self.probes = 0
+
+    @property
+    def devices(self) -> dict[int, dict[str, Any]]:
+        """Devices currently tracked, by device id."""
+        with self._lock:
+            return {device_id: dict(d) for device_id, d in self._devices.items()}
+
+    def register_callback(self, callback: DiscoveryCallback) -> None:
+        """Call ``callback(event, device)`` on each change."""
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def unregister_callback(self, callback: DiscoveryCallback) -> None:
+        """Stop calling a callback."""
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def probe(self) -> None:
+        """Probe now instead of at the next scheduled time."""
+        self._next_probe = 0.0
+        self._wakeup()
+
+    def open(self) -> None:
+        """Open listener thread."""
+        if not self._is_run:
+            self._is_run = True
+            threading.Thread.start(self)
+
+    def close(self) -> None:
+        """Close listener thread and its selector."""
+        if self._is_run:
+            self._is_run = False
+            self._wakeup()
+            self.join()
+        self._selector.close()
+        self._wakeup_reader.close()
+        self._wakeup_writer.close()
+
+    def _wakeup(self) -> None:
+        with contextlib.suppress(OSError):
+            self._wakeup_writer.send(b"\0")
+
+    def _probe_delay(self) -> float:
+        # the jitter only spreads probes in time, no need for a secure random
+        spread = random.uniform(-self._jitter, self._jitter)  # noqa: S311
+        return self._probe_interval * (1 + spread)
+
+    def _send_probes(self, sock: socket.socket) -> None:
+        addresses = (
+            self._addresses if self._addresses is not None else enum_all_broadcast()
+        )
+        for addr in addresses:
+            try:
+                for port in self._ports:
+                    sock.sendto(BROADCAST_MSG, (addr, port))
+            except OSError as e:
+                _LOGGER.warning("Can't access network %s: %s", addr, repr(e))
+        self.probes += 1
+
+    def _receive(self, sock: socket.socket) -> None:
+        try:
+            data, (ip, _) = sock.recvfrom(RECV_BUFFER_SIZE)
+            _LOGGER.debug("Received response from %s: %s", ip, data.hex())
+            # known devices are decoded again to see their address changes
+            if (secure := _secure_response(data)) is not None:
+                protocol, packet = secure
+                device = _secure_device(packet, protocol, ip)
+            elif (xml := _xml_response(data)) is not None:
+                port, sn, device_type = xml
+                device = self._known_v1_device(ip, port, sn) or _xml_device(
+                    ip,
+                    port,
+                    sn,
+                    device_type,
+                    get_device_info(ip, port),
+                )
+            else:
+                return
+        except (ValueError, LookupError, ElementMissing, SyntaxError) as e:
+            _LOGGER.debug("Invalid discovery response: %s", e)
+            return
+        except OSError as e:
+            _LOGGER.debug("Discovery socket error: %s", e)
+            return
+        if device["device_id"]:
+            self._seen(device)
+
+    def _known_v1_device(self, ip: str, port: int, sn: str) -> dict[str, Any] | None:
+        """Tracked V1 device at the same address, without asking its device id."""
+        with self._lock:
+            for device in self._devices.values():
+                if (
+                    device["protocol"] == ProtocolVersion.V1
+                    and device["sn"] == sn
+                    and device["ip_address"] == ip
+                    and device["port"] == port
+                ):
+                    return dict(device)
+        return None
+
+    def _seen(self, device: dict[str, Any]) -> None:
+        device_id = device["device_id"]
+        with self._lock:
+            previous = self._devices.get(device_id)
+            self._devices[device_id] = device
+            self._last_seen[device_id] = time.monotonic()
+        if previous is None:
+            _LOGGER.debug("Found device %s at %s", device_id, device["ip_address"])
+            self._changed(DiscoveryEvent.ADDED, device)
+        elif previous["ip_address"] != device["ip_address"]:
+            _LOGGER.info(
+                "[%s] IP address changed from %s to %s",
+                device_id,
+                previous["ip_address"],
+                device["ip_address"],
+            )
+            self._changed(DiscoveryEvent.IP_CHANGED, device, previous["ip_address"])
+
+    def _expire(self, now: float) -> None:
+        with self._lock:
+            expired = [
+                self._devices.pop(device_id)
+                for device_id, seen in list(self._last_seen.items())
+                if now - seen > self._expiry
+            ]
+            for device in expired:
+                del self._last_seen[device["device_id"]]
+        for device in expired:
+            _LOGGER.debug("Lost device %s", device["device_id"])
+            self._changed(DiscoveryEvent.REMOVED, device)
+
+    def _changed(
+        self,
+        event: DiscoveryEvent,
+        device: dict[str, Any],
+        previous_ip_address: str | None = None,
+    ) -> None:
+        if self._cache is not None and event != DiscoveryEvent.REMOVED:
+            self._cache.update([device])
+        with self._lock:
+            callbacks = list(self._callbacks)
+        if previous_ip_address is not None:
+            device = {**device, "previous_ip_address": previous_ip_address}
+        for callback in callbacks:
+            try:
+                callback(event, dict(device))
+            except Exception:
+                _LOGGER.exception("Error in discovery callback")
+
+    def _timeout(self, now: float) -> float:
+        deadline = self._next_probe
+        with self._lock:
+            if self._last_seen:
+                deadline = min(deadline, min(self._last_seen.values()) + self._expiry)
+        return max(0.0, deadline - now)
+
+    def run(self) -> None:
+        """Run listener loop."""
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            sock.bind(("", self._listen_port))
+            sock.setblocking(False)
+            self._selector.register(sock, selectors.EVENT_READ)
+            try:
+                self._loop(sock)
+            finally:
+                self._selector.unregister(sock)
+
+    def _loop(self, sock: socket.socket) -> None:
+        while self._is_run:
+            now = time.monotonic()
+            if now >= self._next_probe:
+                self._send_probes(sock)
+                self._next_probe = now + self._probe_delay()
+            self._expire(now)
+            for key, _ in self._selector.select(self._timeout(time.monotonic())):
+                if key.fileobj is self._wakeup_reader:
+                    with contextlib.suppress(OSError):
+                        while self._wakeup_reader.recv(RECV_BUFFER_SIZE):
+                            pass
+                    continue
+                self._receive(sock)
@@ -0,0 +1,175 @@
+"""Midea local status update dispatcher."""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections.abc import Callable, Hashable, Sequence
+from concurrent.futures import Executor
+from typing import Any
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 0.1
+
+Update = Callable[[dict[str, Any]], None]
+
+
+class _PendingUpdate:
+    """Status coalesced for one device until it is delivered."""
+
+    def __init__(self, updates: Sequence[Update], submitted: float) -> None:
+        """Initialize pending update."""
+        self.updates = updates
+        self.status: dict[str, Any] = {}
+        self.submitted = submitted
+
+
+class UpdateDispatcher(threading.Thread):
+    """Deliver device status updates away from the socket threads.
+
+    Successive status of a device are merged while they wait, later values
+    win, and each device is delivered at most once per ``window`` seconds.
+    Updates are called on an ``executor``, on an event ``loop`` or, without
+    either, on the dispatcher thread.
+    """
+
+    def __init__(
+        self,
+        window: float = DEFAULT_WINDOW,
+        executor: Executor | None = None,
+        loop: asyncio.AbstractEventLoop | None = None,
+    ) -> None:
+        """Initialize update dispatcher."""
+        threading.Thread.__init__(self, name="midea-update-dispatcher", daemon=True)
+        self._window = window
+        self._executor = executor
+        self._loop = loop
+        self._condition = threading.Condition()
+        self._pending: dict[Hashable, _PendingUpdate] = {}
+        self._due: list[tuple[float, int, Hashable]] = []
+        self._sequence = itertools.count()
+        self._delivered_at: dict[Hashable, float] = {}
+        self._is_run = False
+        self._submitted = 0
+        self._coalesced = 0
+        self._delivered = 0
+        self._errors = 0
+        self._max_queue_depth = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """Devices with an update waiting for delivery."""
+        return len(self._pending)
+
+    @property
+    def metrics(self) -> dict[str, float]:
+        """Dispatcher counters, queue depth and delivery latency in seconds."""
+        with self._condition:
+            return {
+                "submitted": self._submitted,
+                "coalesced": self._coalesced,
+                "delivered": self._delivered,
+                "errors": self._errors,
+                "queue_depth": len(self._pending),
+                "max_queue_depth": self._max_queue_depth,
+                "latency_avg": (
+                    self._latency_total / self._delivered if self._delivered else 0.0
+                ),
+                "latency_max": self._latency_max,
+            }
+
+    def submit(
+        self,
+        key: Hashable,
+        updates: Sequence[Update],
+        status: dict[str, Any],
+    ) -> None:
+        """Queue a status for the updates, merged with a waiting status."""
+        now = time.monotonic()
+        with self._condition:
+            self._submitted += 1
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = _PendingUpdate(updates, now)
+                self._pending[key] = pending
+                self._max_queue_depth = max(self._max_queue_depth, len(self._pending))
+                delivered_at = self._delivered_at.get(key)
+                due = now if delivered_at is None else delivered_at + self._window
+                heapq.heappush(self._due, (due, next(self._sequence), key))
+                self._condition.notify()
+            else:
+                self._coalesced += 1
+                pending.updates = updates
+            pending.status.update(status)
+
+    def open(self) -> None:
+        """Open dispatcher thread."""
+        if not self._is_run:
+            self._is_run = True
+            threading.Thread.start(self)
+
+    def close(self) -> None:
+        """Close dispatcher thread, waiting updates are delivered first."""
+        if self._is_run:
+            with self._condition:
+                self._is_run = False
+                self._condition.notify()
+            self.join()
+
+    def _pop_due(self, flush: bool) -> list[tuple[Hashable, _PendingUpdate]]:
+        """Pop the updates due now, or all of them when flushing."""
+        now = time.monotonic()
+        ready = []
+        while self._due and (flush or self._due[0][0] <= now):
+            _, _, key = heapq.heappop(self._due)
+            pending = self._pending.pop(key)
+            self._delivered_at[key] = now
+            latency = now - pending.submitted
+            self._latency_total += latency
+            self._latency_max = max(self._latency_max, latency)
+            self._delivered += 1
+            ready.append((key, pending))
+        return ready
+
+    def _deliver(self, key: Hashable, pending: _PendingUpdate) -> None:
+        for update in pending.updates:
+            if self._executor is not None:
+                self._executor.submit(self._call, key, update, pending.status)
+            elif self._loop is not None:
+                self._loop.call_soon_threadsafe(
+                    self._call,
+                    key,
+                    update,
+                    pending.status,
+                )
+            else:
+                self._call(key, update, pending.status)
+
+    def _call(self, key: Hashable, update: Update, status: dict[str, Any]) -> None:
+        try:
+            update(status)
+        except Exception:
+            with self._condition:
+                self._errors += 1
+            _LOGGER.exception("[%s] Error in status update %s", key, status)
+
+    def run(self) -> None:
+        """Run dispatcher loop."""
+        while True:
+            with self._condition:
+                while self._is_run and (
+                    not self._due or self._due[0][0] > time.monotonic()
+                ):
+                    timeout = self._due[0][0] - time.monotonic() if self._due else None
+                    self._condition.wait(timeout)
+                ready = self._pop_due(flush=not self._is_run)
+                is_run = self._is_run
+            for key, pending in ready:
+                self._deliver(key, pending)
+            if not is_run:
+                break
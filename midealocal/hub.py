@@ -0,0 +1,632 @@
+"""Midea local device hub."""
+
+import contextlib
+import errno
+import heapq
+import itertools
+import logging
+import selectors
+import socket
+import threading
+import time
+from collections.abc import Callable
+from enum import IntEnum
+from typing import cast
+
+from .const import ProtocolVersion
+from .device import (
+    MIN_AUTH_RESPONSE,
+    QUERY_TIMEOUT,
+    RESPONSE_TIMEOUT,
+    SOCKET_TIMEOUT,
+    MessageResult,
+    MideaDevice,
+    NoSupportedProtocol,
+    _InflightQueries,
+)
+from .exceptions import SocketException
+from .security import MSGTYPE_HANDSHAKE_REQUEST
+
+_LOGGER = logging.getLogger(__name__)
+
+MAX_RECONNECT_SLEEP = 600
+RECV_BUFFER_SIZE = 512
+
+
+class HubState(IntEnum):
+    """Hub device connection state."""
+
+    IDLE = 0
+    CONNECTING = 1
+    AUTHENTICATING = 2
+    PROBING = 3
+    RUNNING = 4
+
+
+class _HubSocket:
+    """Socket-like adapter of the non-blocking socket of a hub device.
+
+    The device send path (``build_send`` -> ``send_message_v2``) sets the
+    query timeout on its socket, which would make the hub socket blocking,
+    so ``settimeout`` is ignored. The data the socket does not take at once
+    is buffered and ``want_write`` asks the hub to flush it once writable.
+    ``close`` only shuts the socket down, the hub closes it once unregistered
+    from the selector.
+    """
+
+    def __init__(self, sock: socket.socket, want_write: Callable[[], None]) -> None:
+        """Initialize hub socket."""
+        self._sock = sock
+        self._want_write = want_write
+        # the devices send from the hub thread and from the callers of
+        # set_attribute
+        self._lock = threading.Lock()
+        self._output = bytearray()
+
+    def send(self, data: bytes) -> int:
+        """Send data on the hub socket, buffer what it does not take."""
+        with self._lock:
+            if not self._output:
+                try:
+                    sent = self._sock.send(data)
+                except (BlockingIOError, InterruptedError):
+                    sent = 0
+                if sent == len(data):
+                    return sent
+                self._output += data[sent:]
+            else:
+                self._output += data
+        self._want_write()
+        return len(data)
+
+    def flush(self) -> bool:
+        """Send the buffered data, True once all of it is sent."""
+        with self._lock:
+            if self._output:
+                try:
+                    sent = self._sock.send(self._output)
+                except (BlockingIOError, InterruptedError):
+                    sent = 0
+                del self._output[:sent]
+            return not self._output
+
+    def settimeout(self, value: float | None) -> None:
+        """Keep the hub socket non-blocking."""
+
+    def shutdown(self, how: int) -> None:
+        """Shutdown the hub socket, the hub then sees it closed."""
+        self._sock.shutdown(how)
+
+    def close(self) -> None:
+        """Leave closing the socket to the hub."""
+
+
+class _HubDevice:
+    """Connection state machine of one device driven by the hub."""
+
+    def __init__(self, device: MideaDevice) -> None:
+        """Initialize hub device."""
+        self.device = device
+        self.sock: socket.socket | None = None
+        self.writer: _HubSocket | None = None
+        self.state = HubState.IDLE
+        self.deadline = 0.0
+        self.timer_seq = -1
+        self.connection_retries = 0
+        self.previous_response = 0.0
+        self.started = 0.0
+        self.cmds: list = []
+        self.cmd_index = 0
+        self.error_count = 0
+        self.query_count = 0
+        self.inflight: _InflightQueries | None = None
+
+    def next_wakeup(self) -> float:
+        """Next time this device needs the hub."""
+        if self.state != HubState.RUNNING:
+            return self.deadline
+        device = self.device
+        deadlines = [
+            device._previous_heartbeat + device._heartbeat_interval,
+            self.previous_response + RESPONSE_TIMEOUT * SOCKET_TIMEOUT,
+        ]
+        if device._refresh_interval > 0:
+            deadlines.append(device._previous_refresh + device._refresh_interval)
+        return min(deadlines)
+
+
+class DeviceHub(threading.Thread):
+    """Drive the connect/auth/recv/heartbeat cycle of many devices.
+
+    A single thread owns one selector and a heap of per-device deadlines, so
+    hundreds of appliances cost one thread instead of one thread each. Devices
+    added to the hub must not be started with ``MideaDevice.open``.
+    """
+
+    def __init__(self) -> None:
+        """Initialize device hub."""
+        threading.Thread.__init__(self, name="midea-device-hub", daemon=True)
+        self._selector = selectors.DefaultSelector()
+        self._devices: dict[int, _HubDevice] = {}
+        self._timers: list[tuple[float, int, _HubDevice]] = []
+        self._sequence = itertools.count()
+        self._pending: list[tuple[bool, MideaDevice]] = []
+        self._flush_pending: list[_HubDevice] = []
+        self._lock = threading.Lock()
+        self._wakeup_reader, self._wakeup_writer = socket.socketpair()
+        self._wakeup_reader.setblocking(False)
+        self._wakeup_writer.setblocking(False)
+        self._selector.register(self._wakeup_reader, selectors.EVENT_READ)
+        self._is_run = False
+
+    @property
+    def devices(self) -> list[MideaDevice]:
+        """Devices driven by the hub."""
+        return [entry.device for entry in self._devices.values()]
+
+    def add_device(self, device: MideaDevice) -> None:
+        """Add a device, it is connected on the next hub iteration."""
+        self._submit(True, device)
+
+    def remove_device(self, device: MideaDevice) -> None:
+        """Remove a device and close its socket."""
+        self._submit(False, device)
+
+    def _submit(self, add: bool, device: MideaDevice) -> None:
+        with self._lock:
+            self._pending.append((add, device))
+        self._wakeup()
+
+    def _wakeup(self) -> None:
+        with contextlib.suppress(OSError):
+            self._wakeup_writer.send(b"\0")
+
+    def _want_write(self, entry: _HubDevice) -> None:
+        """Wait for the socket of a device to be writable, from any thread."""
+        if threading.current_thread() is self:
+            self._watch_write(entry)
+            return
+        with self._lock:
+            self._flush_pending.append(entry)
+        self._wakeup()
+
+    def _watch_write(self, entry: _HubDevice) -> None:
+        if entry.sock is not None and entry.state != HubState.CONNECTING:
+            with contextlib.suppress(KeyError, ValueError):
+                self._selector.modify(
+                    entry.sock,
+                    selectors.EVENT_READ | selectors.EVENT_WRITE,
+                    entry,
+                )
+
+    def _flush(self, entry: _HubDevice, now: float) -> None:
+        """Send the buffered data, then only wait for the socket to be readable."""
+        sock, writer = entry.sock, entry.writer
+        if sock is None or writer is None:
+            return
+        try:
+            flushed = writer.flush()
+        except OSError as e:
+            self._fail(entry, now, repr(e))
+            return
+        if flushed:
+            with contextlib.suppress(KeyError, ValueError):
+                self._selector.modify(sock, selectors.EVENT_READ, entry)
+
+    def open(self) -> None:
+        """Open hub thread."""
+        if not self._is_run:
+            self._is_run = True
+            threading.Thread.start(self)
+
+    def close(self) -> None:
+        """Close hub thread and its selector."""
+        if self._is_run:
+            self._is_run = False
+            self._wakeup()
+            self.join()
+        self._selector.close()
+        self._wakeup_reader.close()
+        self._wakeup_writer.close()
+
+    def _schedule(self, entry: _HubDevice) -> None:
+        """Push the next wakeup of a device, older entries become stale."""
+        entry.timer_seq = next(self._sequence)
+        heapq.heappush(self._timers, (entry.next_wakeup(), entry.timer_seq, entry))
+
+    def _process_pending(self, now: float) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, []
+            flush_pending, self._flush_pending = self._flush_pending, []
+        for entry in flush_pending:
+            self._watch_write(entry)
+        for add, device in pending:
+            if add and device.device_id not in self._devices:
+                entry = _HubDevice(device)
+                self._devices[device.device_id] = entry
+                self._start_connect(entry, now)
+            elif not add and device.device_id in self._devices:
+                entry = self._devices.pop(device.device_id)
+                entry.timer_seq = -1
+                self._disconnect(entry)
+
+    def _unregister(self, entry: _HubDevice) -> None:
+        if entry.sock is not None:
+            with contextlib.suppress(KeyError, ValueError):
+                self._selector.unregister(entry.sock)
+            entry.sock.close()
+            entry.sock = None
+            entry.writer = None
+
+    def _disconnect(self, entry: _HubDevice) -> None:
+        self._unregister(entry)
+        entry.inflight = entry.device._inflight = None
+        entry.device.close_socket()
+        entry.state = HubState.IDLE
+
+    def _fail(self, entry: _HubDevice, now: float, reason: str) -> None:
+        """Drop the connection and retry with exponential backoff."""
+        was_running = entry.state == HubState.RUNNING
+        self._disconnect(entry)
+        if not was_running:
+            if entry.device._metrics is not None:
+                entry.device._metrics.connect_errors += 1
+            entry.device.set_available(False)
+            entry.connection_retries += 1
+            sleep_time = min(
+                5 * (2 ** (entry.connection_retries - 1)),
+                MAX_RECONNECT_SLEEP,
+            )
+            _LOGGER.warning(
+                "[%s] Unable to connect (%s), sleep %s seconds and retry",
+                entry.device.device_id,
+                reason,
+                sleep_time,
+            )
+        else:
+            _LOGGER.debug("[%s] %s, reconnecting", entry.device.device_id, reason)
+            sleep_time = 0
+        entry.deadline = now + sleep_time
+        self._schedule(entry)
+
+    def _start_connect(self, entry: _HubDevice, now: float) -> None:
+        device = entry.device
+        _LOGGER.debug(
+            "[%s] Connecting to %s:%s",
+            device.device_id,
+            device._ip_address,
+            device._port,
+        )
+        metrics = device._metrics
+        if metrics is not None and metrics.connects:
+            metrics.reconnects += 1
+        entry.started = time.monotonic()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        err = sock.connect_ex((device._ip_address, device._port))
+        if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            sock.close()
+            self._fail(entry, now, errno.errorcode.get(err, str(err)))
+            return
+        entry.sock = sock
+        entry.state = HubState.CONNECTING
+        entry.deadline = now + SOCKET_TIMEOUT
+        self._selector.register(sock, selectors.EVENT_WRITE, entry)
+        self._schedule(entry)
+
+    def _on_connected(self, entry: _HubDevice, now: float) -> None:
+        sock = entry.sock
+        if sock is None:
+            return
+        err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err != 0:
+            self._fail(entry, now, errno.errorcode.get(err, str(err)))
+            return
+        device = entry.device
+        _LOGGER.debug("[%s] Connected", device.device_id)
+        if device._metrics is not None:
+            device._metrics.connect.observe(time.monotonic() - entry.started)
+        entry.started = time.monotonic()
+        entry.writer = _HubSocket(sock, lambda: self._want_write(entry))
+        device._socket = cast("socket.socket", entry.writer)
+        self._selector.modify(sock, selectors.EVENT_READ, entry)
+        if device._device_protocol_version == ProtocolVersion.V3:
+            _LOGGER.debug("[%s] Authentication handshaking", device.device_id)
+            entry.state = HubState.AUTHENTICATING
+            entry.deadline = now + SOCKET_TIMEOUT
+            try:
+                entry.writer.send(
+                    device._security.encode_8370(
+                        device._token,
+                        MSGTYPE_HANDSHAKE_REQUEST,
+                    ),
+                )
+            except OSError as e:
+                self._fail(entry, now, repr(e))
+                return
+            self._schedule(entry)
+        else:
+            self._start_probe(entry, now)
+
+    def _on_auth_response(self, entry: _HubDevice, response: bytes, now: float) -> None:
+        device = entry.device
+        if len(response) < MIN_AUTH_RESPONSE:
+            self._fail(entry, now, "authentication failed")
+            return
+        try:
+            device._security.tcp_key(response[8:72], device._key)
+        except Exception:  # noqa: BLE001
+            self._fail(entry, now, "authentication failed")
+            return
+        _LOGGER.debug("[%s] Authentication success", device.device_id)
+        if device._metrics is not None:
+            device._metrics.auth.observe(time.monotonic() - entry.started)
+        self._start_probe(entry, now)
+
+    def _refresh(self, entry: _HubDevice, now: float) -> None:
+        """Send the supported status queries once the refresh interval passed."""
+        device = entry.device
+        if 0 < device._refresh_interval <= now - device._previous_refresh:
+            device._previous_refresh = now
+            self._send_refresh(entry)
+
+    def _send_refresh(self, entry: _HubDevice) -> None:
+        """Send the supported status queries."""
+        device = entry.device
+        sent = False
+        for cmd in device.refresh_queries():
+            if cmd.__class__.__name__ not in device._unsupported_protocol:
+                device.build_send(cmd, query=True)
+                sent = True
+        if not sent:
+            raise NoSupportedProtocol
+
+    def _start_probe(self, entry: _HubDevice, now: float) -> None:
+        """Send the status queries one at a time to find the supported ones.
+
+        After ``set_pipelined_refresh`` the queries are sent at once instead,
+        and devices with cached capabilities skip the probe.
+        """
+        device = entry.device
+        if device._cached_capabilities() is not None:
+            _LOGGER.debug("[%s] Using cached capabilities", device.device_id)
+            try:
+                self._send_refresh(entry)
+                device._load_capabilities()
+            except NoSupportedProtocol:
+                self._fail(entry, now, "no supported query protocol")
+                return
+            except (OSError, SocketException) as e:
+                self._fail(entry, now, repr(e))
+                return
+            self._set_running(entry, now)
+            return
+        cmds = device.refresh_queries()
+        entry.cmds = cmds
+        entry.cmd_index = -1
+        entry.error_count = 0
+        entry.query_count = len(cmds)
+        entry.state = HubState.PROBING
+        if device._pipelined_refresh:
+            self._start_pipelined_probe(entry, now)
+        else:
+            self._next_probe(entry, now)
+
+    def _start_pipelined_probe(self, entry: _HubDevice, now: float) -> None:
+        """Send every query at once, as MideaDevice._refresh_status_pipelined."""
+        device = entry.device
+        inflight = _InflightQueries()
+        for cmd in entry.cmds:
+            if cmd.__class__.__name__ in device._unsupported_protocol:
+                inflight.errors += 1
+                continue
+            try:
+                device.build_send(cmd, query=True)
+            except (OSError, SocketException) as e:
+                self._fail(entry, now, repr(e))
+                return
+            inflight.add(cmd, now + QUERY_TIMEOUT)
+        entry.inflight = device._inflight = inflight
+        self._check_inflight(entry, now)
+
+    def _check_inflight(self, entry: _HubDevice, now: float) -> None:
+        """Wait for the next deadline, or end the pipelined probe.
+
+        When a response could belong to several queries, the queries left
+        without response are checked again one at a time.
+        """
+        inflight = entry.inflight
+        if inflight is None:
+            return
+        wait = inflight.expire(now)
+        if wait is not None:
+            entry.deadline = now + wait
+            self._schedule(entry)
+            return
+        device = entry.device
+        entry.inflight = device._inflight = None
+        entry.error_count = inflight.errors
+        entry.cmd_index = -1
+        if inflight.ambiguous:
+            for cmd in inflight.expired:
+                device._abandon_query(cmd)
+            entry.cmds = inflight.expired
+        else:
+            for cmd in inflight.expired:
+                device._set_unsupported(cmd)
+                entry.error_count += 1
+            entry.cmds = []
+        self._next_probe(entry, now)
+
+    def _next_probe(self, entry: _HubDevice, now: float) -> None:
+        device = entry.device
+        entry.cmd_index += 1
+        while entry.cmd_index < len(entry.cmds):
+            cmd = entry.cmds[entry.cmd_index]
+            if cmd.__class__.__name__ not in device._unsupported_protocol:
+                try:
+                    device.build_send(cmd, query=True)
+                except (OSError, SocketException) as e:
+                    self._fail(entry, now, repr(e))
+                    return
+                entry.deadline = now + QUERY_TIMEOUT
+                self._schedule(entry)
+                return
+            entry.error_count += 1
+            entry.cmd_index += 1
+        if entry.error_count == entry.query_count:
+            _LOGGER.debug(
+                "[%s] all the query cmds failed %s, please report bug",
+                device.device_id,
+                entry.cmds,
+            )
+            self._fail(entry, now, "no supported query protocol")
+            return
+        device._store_capabilities()
+        try:
+            device.get_capabilities()
+        except (OSError, SocketException) as e:
+            self._fail(entry, now, repr(e))
+            return
+        self._set_running(entry, now)
+
+    def _set_running(self, entry: _HubDevice, now: float) -> None:
+        device = entry.device
+        if device._metrics is not None:
+            device._metrics.connects += 1
+        entry.connection_retries = 0
+        entry.state = HubState.RUNNING
+        entry.previous_response = now
+        device._previous_refresh = device._previous_heartbeat = now
+        device.set_available(True)
+        self._schedule(entry)
+
+    def _on_readable(self, entry: _HubDevice, now: float) -> None:
+        sock = entry.sock
+        if sock is None:
+            return
+        authenticating = entry.state == HubState.AUTHENTICATING
+        msg = b""
+        try:
+            if authenticating:
+                msg = sock.recv(RECV_BUFFER_SIZE)
+                received = len(msg)
+            else:
+                received = entry.device._buffer.recv_into(sock, RECV_BUFFER_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            self._fail(entry, now, repr(e))
+            return
+        if received == 0:
+            self._fail(entry, now, "connection closed by peer")
+            return
+        if authenticating:
+            self._on_auth_response(entry, msg, now)
+            return
+        try:
+            result = entry.device.parse_message()
+        except Exception:
+            _LOGGER.exception("[%s] Unexpected error", entry.device.device_id)
+            self._fail(entry, now, "unexpected error")
+            return
+        if result == MessageResult.ERROR and entry.inflight is not None:
+            entry.inflight.error()
+            self._check_inflight(entry, now)
+        elif result == MessageResult.ERROR and entry.state == HubState.PROBING:
+            # as refresh_status, the query failed but stays supported
+            entry.error_count += 1
+            self._next_probe(entry, now)
+        elif result == MessageResult.ERROR:
+            self._fail(entry, now, "message 'ERROR' received")
+        elif result == MessageResult.SUCCESS:
+            entry.previous_response = now
+            if entry.inflight is not None:
+                self._check_inflight(entry, now)
+            elif entry.state == HubState.PROBING:
+                self._next_probe(entry, now)
+
+    def _on_timer(self, entry: _HubDevice, now: float) -> None:
+        device = entry.device
+        if entry.state == HubState.IDLE:
+            self._start_connect(entry, now)
+        elif entry.state == HubState.PROBING and entry.inflight is not None:
+            self._check_inflight(entry, now)
+        elif entry.state == HubState.PROBING:
+            device._set_unsupported(entry.cmds[entry.cmd_index])
+            entry.error_count += 1
+            self._next_probe(entry, now)
+        elif entry.state != HubState.RUNNING:
+            self._fail(entry, now, "timed out")
+        elif device._socket is not cast("socket.socket", entry.writer):
+            # closed outside of the hub, e.g. by set_ip_address
+            self._fail(entry, now, "socket closed")
+        elif now - entry.previous_response >= RESPONSE_TIMEOUT * SOCKET_TIMEOUT:
+            self._fail(entry, now, "heartbeat timed out")
+        else:
+            try:
+                self._refresh(entry, now)
+                device._check_heartbeat(now)
+            except NoSupportedProtocol:
+                _LOGGER.debug("[%s] No Supported protocol", device.device_id)
+            except (OSError, SocketException) as e:
+                self._fail(entry, now, repr(e))
+                return
+            self._schedule(entry)
+
+    def _on_event(self, entry: _HubDevice, mask: int, now: float) -> None:
+        try:
+            if entry.state == HubState.CONNECTING:
+                if mask & selectors.EVENT_WRITE:
+                    self._on_connected(entry, now)
+                return
+            if mask & selectors.EVENT_WRITE:
+                self._flush(entry, now)
+            if mask & selectors.EVENT_READ:
+                self._on_readable(entry, now)
+        except Exception:
+            _LOGGER.exception("[%s] Unexpected error", entry.device.device_id)
+            self._fail(entry, now, "unexpected error")
+
+    def _run_timers(self, now: float) -> None:
+        # the timers scheduled while running are left to the next iteration,
+        # a device due again right away must not starve the selector
+        limit = next(self._sequence)
+        while self._timers and self._timers[0][0] <= now:
+            if self._timers[0][1] > limit:
+                break
+            _, seq, entry = heapq.heappop(self._timers)
+            if seq != entry.timer_seq:
+                continue
+            try:
+                self._on_timer(entry, now)
+            except Exception:
+                _LOGGER.exception("[%s] Unexpected error", entry.device.device_id)
+                self._fail(entry, now, "unexpected error")
+
+    def _select_timeout(self, now: float) -> float | None:
+        while self._timers and self._timers[0][1] != self._timers[0][2].timer_seq:
+            heapq.heappop(self._timers)
+        if not self._timers:
+            return None
+        return max(self._timers[0][0] - now, 0.0)
+
+    def run(self) -> None:
+        """Run hub loop."""
+        while self._is_run:
+            now = time.time()
+            self._process_pending(now)
+            self._run_timers(now)
+            events = self._selector.select(self._select_timeout(time.time()))
+            now = time.time()
+            for key, mask in events:
+                if key.fileobj is self._wakeup_reader:
+                    with contextlib.suppress(OSError):
+                        while self._wakeup_reader.recv(RECV_BUFFER_SIZE):
+                            pass
+                    continue
+                self._on_event(key.data, mask, now)
+        for entry in list(self._devices.values()):
+            self._disconnect(entry)
+        self._devices.clear()
+        self._timers.clear()
@@ -0,0 +1,110 @@
+"""Midea local encrypted key store."""
+
+import logging
+import threading
+import time
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any
+
+from .storage import EncryptedJsonFile
+
+_LOGGER = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+
+
+class KeyStore:
+    """Token and key pairs of V3 appliances, by appliance id and udp id method.
+
+    Entries are encrypted with AES-GCM in an ``EncryptedJsonFile``, whose
+    secret file is created with the store. The method whose key last
+    authenticated is recorded and tried first.
+    """
+
+    def __init__(self, path: str | Path, secret: bytes | None = None) -> None:
+        """Initialize key store."""
+        self._path = Path(path)
+        self._file = EncryptedJsonFile(self._path, STORE_VERSION, secret)
+        self._lock = threading.Lock()
+        self._entries: dict[int, dict[str, Any]] = {}
+        self._load()
+
+    @property
+    def path(self) -> Path:
+        """Key store file path."""
+        return self._path
+
+    def get(self, appliance_id: int) -> dict[int, dict[str, str]]:
+        """Return the keys of an appliance by method, the working one first."""
+        with self._lock:
+            entry = self._entries.get(appliance_id)
+            if entry is None:
+                return {}
+            keys = {method: dict(key) for method, key in entry["keys"].items()}
+            working = entry.get("working")
+        if working in keys:
+            keys = {working: keys[working], **keys}
+        return keys
+
+    def working(self, appliance_id: int) -> int | None:
+        """Return the method whose key last authenticated the appliance."""
+        with self._lock:
+            entry = self._entries.get(appliance_id)
+            return None if entry is None else entry.get("working")
+
+    def set_keys(
+        self,
+        appliance_id: int,
+        keys: Mapping[int, Mapping[str, str]],
+    ) -> None:
+        """Store the keys of an appliance, replacing the former ones."""
+        with self._lock:
+            self._entries[appliance_id] = {
+                "keys": {
+                    int(method): {"token": key["token"], "key": key["key"]}
+                    for method, key in keys.items()
+                },
+                "working": None,
+                "updated": time.time(),
+            }
+            self._save()
+
+    def record_success(self, appliance_id: int, method: int) -> None:
+        """Record the method whose key authenticated an appliance."""
+        with self._lock:
+            entry = self._entries.get(appliance_id)
+            if entry is None or entry.get("working") == method:
+                return
+            entry["working"] = method
+            entry["updated"] = time.time()
+            self._save()
+
+    def remove(self, appliance_id: int) -> None:
+        """Forget the keys of an appliance, once none of them authenticates."""
+        with self._lock:
+            if self._entries.pop(appliance_id, None):
+                self._save()
+
+    def _load(self) -> None:
+        try:
+            entries = self._file.read()
+            self._entries = {
+                int(appliance_id): {
+                    "keys": {int(method): key for method, key in entry["keys"].items()},
+                    "working": entry.get("working"),
+                    "updated": entry.get("updated", 0),
+                }
+                for appliance_id, entry in entries.items()
+            }
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            self._entries = {}
+            _LOGGER.warning("Ignoring invalid key store %s: %s", self._path, e)
+
+    def _save(self) -> None:
+        try:
+            self._file.write(self._entries)
+        except (OSError, ValueError) as e:
+            _LOGGER.warning("Unable to write key store %s: %s", self._path, e)
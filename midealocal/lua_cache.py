@@ -0,0 +1,109 @@
+"""Midea local cache of downloaded lua scripts."""
+
+import hashlib
+import json
+import logging
+import threading
+from pathlib import Path
+
+from .storage import write_json_atomic, write_text_atomic
+
+_LOGGER = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+INDEX_FILE = "index.json"
+SCRIPT_SUFFIX = ".lua"
+
+
+class LuaCache:
+    """Decrypted lua scripts in a directory, stored once by content hash.
+
+    An index maps the device type, model, file name and MD5 returned by the
+    cloud to a script, so a script is downloaded again only once the cloud
+    returns another one. Scripts shared by several models are stored once.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        """Initialize lua cache in the ``path`` directory."""
+        self._path = Path(path)
+        self._lock = threading.Lock()
+        self._index: dict[str, str] = {}
+        self._load()
+
+    @property
+    def path(self) -> Path:
+        """Cache directory path."""
+        return self._path
+
+    @staticmethod
+    def key(device_type: int, model: str, file_name: str, md5: str) -> str:
+        """Cache key of a script returned by the cloud."""
+        return f"{device_type:02x}/{model}/{file_name}/{md5.lower()}"
+
+    def get(self, key: str) -> str | None:
+        """Return a cached script, unless missing or altered."""
+        with self._lock:
+            digest = self._index.get(key)
+        if digest is None:
+            return None
+        try:
+            script = self._script_path(digest).read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError) as e:
+            _LOGGER.debug("Missing lua script %s: %s", key, e)
+            script = None
+        if script is None or _digest(script) != digest:
+            with self._lock:
+                if self._index.get(key) == digest:
+                    del self._index[key]
+                    self._save()
+            return None
+        return script
+
+    def set(self, key: str, script: str) -> None:
+        """Store a script downloaded for ``key``."""
+        digest = _digest(script)
+        script_path = self._script_path(digest)
+        try:
+            if not script_path.exists():
+                write_text_atomic(script_path, script)
+        except OSError as e:
+            _LOGGER.warning("Unable to write lua script %s: %s", script_path, e)
+            return
+        with self._lock:
+            if self._index.get(key) != digest:
+                self._index[key] = digest
+                self._save()
+
+    def _script_path(self, digest: str) -> Path:
+        return self._path / f"{digest}{SCRIPT_SUFFIX}"
+
+    def _load(self) -> None:
+        path = self._path / INDEX_FILE
+        try:
+            with path.open(encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != CACHE_VERSION:
+                _LOGGER.debug("Ignoring lua cache version %s", data.get("version"))
+                return
+            self._index = {
+                str(key): str(digest) for key, digest in data["scripts"].items()
+            }
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            self._index = {}
+            _LOGGER.warning("Ignoring invalid lua cache %s: %s", path, e)
+
+    def _save(self) -> None:
+        path = self._path / INDEX_FILE
+        try:
+            write_json_atomic(
+                path,
+                {"version": CACHE_VERSION, "scripts": self._index},
+            )
+        except OSError as e:
+            _LOGGER.warning("Unable to write lua cache %s: %s", path, e)
+
+
+def _digest(script: str) -> str:
+    return hashlib.sha256(script.encode("utf-8")).hexdigest()
@@ -1,9 +1,19 @@
 """Midea local message."""
 
 import logging
+import struct
 import warnings
+from collections.abc import Callable, Iterable
 from enum import IntEnum
-from typing import Any, Generic, SupportsIndex, TypeVar, cast
+from typing import (
+    Any,
+    ClassVar,
+    Generic,
+    Literal,
+    SupportsIndex,
+    TypeVar,
+    cast,
+)
 
 from deprecated import deprecated
 
@@ -498,6 +508,9 @@ class MessageRequest(MessageBase):
             body.extend(self._body)
         return body
 
+    def renew_message_id(self) -> None:
+        """Assign the next message id, before sending the message again."""
+
     def serialize(self) -> bytearray:
         """Serialize message."""
         stream = self.header + self.body
@@ -559,6 +572,9 @@ class MessageQueryAppliance(MessageRequest):
 T = TypeVar("T")
 E = TypeVar("E", bound="IntEnum")
 
+# struct formats of the multi byte fields of a parser plan
+_WIDE_FORMATS = {2: "H", 4: "I", 8: "Q"}
+
 
 class BodyParser(Generic[T]):
     """Body parser to decode message."""
@@ -571,11 +587,14 @@ class BodyParser(Generic[T]):
         length_in_bytes: int = 1,
         first_upper: bool = True,
         default_raw_value: int = 0,
+        mask: int | None = None,
     ) -> None:
         """Init body parser with attribute name."""
         self.name = name
         self._byte = byte
         self._bit = bit
+        self._mask = mask
+        self._shift = (mask & -mask).bit_length() - 1 if mask else 0
         self._length_in_bytes = length_in_bytes
         self._first_upper = first_upper
         self._default_raw_value = default_raw_value
@@ -586,6 +605,11 @@ class BodyParser(Generic[T]):
                 "Bit, if set, must be a valid value position for %d bytes.",
                 length_in_bytes,
             )
+        if mask is not None and (mask <= 0 or mask >= 1 << (length_in_bytes * 8)):
+            raise ValueError(
+                "Mask, if set, must be a valid value for %d bytes.",
+                length_in_bytes,
+            )
 
     def _get_raw_value(self, body: bytearray) -> int:
         """Get raw value from body."""
@@ -599,10 +623,24 @@ class BodyParser(Generic[T]):
                 else self._byte + i
             )
             data += body[byte] << (8 * i)
+        return self._select(data)
+
+    def _select(self, data: int) -> int:
+        """Select the bit or masked bits of the field data."""
         if self._bit is not None:
-            data = (data & (1 << self._bit)) >> self._bit
+            return (data & (1 << self._bit)) >> self._bit
+        if self._mask is not None:
+            return (data & self._mask) >> self._shift
         return data
 
+    def _place(self, raw_value: int) -> int:
+        """Place a raw value at the bit or masked bits of the field data."""
+        if self._bit is not None:
+            return (raw_value & 1) << self._bit
+        if self._mask is not None:
+            return (raw_value << self._shift) & self._mask
+        return raw_value
+
     def get_value(self, body: bytearray) -> T:
         """Get attribute value."""
         return self._parse(self._get_raw_value(body))
@@ -611,6 +649,14 @@ class BodyParser(Generic[T]):
         """Convert raw value to attribute value."""
         raise NotImplementedError
 
+    def _unparse(self, value: T) -> int:
+        """Convert attribute value to raw value."""
+        raise NotImplementedError
+
+    def _byte_terms(self) -> tuple[tuple[int, tuple[int, ...]], ...] | None:
+        """Return the byte offsets and tables of a value summed per byte."""
+        return None
+
 
 class BoolParser(BodyParser[bool]):
     """Bool message body parser."""
@@ -635,6 +681,9 @@ class BoolParser(BodyParser[bool]):
             return self._default_value
         return raw_value == self._true_value
 
+    def _unparse(self, value: bool) -> int:
+        return self._true_value if value else self._false_value
+
 
 class IntEnumParser(BodyParser[E]):
     """IntEnum message body parser."""
@@ -668,6 +717,9 @@ class IntEnumParser(BodyParser[E]):
                 else self._enum_class(0)
             )
 
+    def _unparse(self, value: E) -> int:
+        return int(value)
+
 
 class IntParser(BodyParser[int]):
     """IntEnum message body parser."""
@@ -680,6 +732,7 @@ class IntParser(BodyParser[int]):
         min_value: int = 0,
         length_in_bytes: int = 1,
         first_upper: bool = False,
+        mask: int | None = None,
     ) -> None:
         """Init IntEnum body parser."""
         super().__init__(
@@ -687,6 +740,7 @@ class IntParser(BodyParser[int]):
             byte,
             length_in_bytes=length_in_bytes,
             first_upper=first_upper,
+            mask=mask,
         )
         self._max_value = max_value
         self._min_value = min_value
@@ -698,14 +752,265 @@ class IntParser(BodyParser[int]):
             return self._min_value
         return raw_value
 
+    def _unparse(self, value: int) -> int:
+        return self._parse(int(value))
+
+
+class DurationParser(BodyParser[int]):
+    """Duration message body parser, one byte per unit in body order."""
+
+    def __init__(
+        self,
+        name: str,
+        byte: int,
+        units: tuple[int, ...] = (60, 1),
+        invalid_value: int | None = None,
+    ) -> None:
+        """Init duration body parser, units in seconds or minutes."""
+        super().__init__(name, byte, length_in_bytes=len(units))
+        self._units = units
+        self._invalid_value = invalid_value
+
+    def _parse(self, raw_value: int) -> int:
+        value = 0
+        for index, unit in enumerate(self._units):
+            part = (raw_value >> (8 * (len(self._units) - 1 - index))) & 0xFF
+            if part != self._invalid_value:
+                value += part * unit
+        return value
+
+    def _byte_terms(self) -> tuple[tuple[int, tuple[int, ...]], ...]:
+        return tuple(
+            (
+                self._byte + index,
+                tuple(
+                    0 if raw == self._invalid_value else raw * unit
+                    for raw in range(256)
+                ),
+            )
+            for index, unit in enumerate(self._units)
+        )
+
+    def _unparse(self, value: int) -> int:
+        parts = dict.fromkeys(self._units, 0)
+        for unit in sorted(self._units, reverse=True):
+            parts[unit], value = divmod(value, unit)
+        raw_value = 0
+        for unit in self._units:
+            raw_value = raw_value << 8 | min(parts[unit], 0xFF)
+        return raw_value
+
+
+class ParserPlan:
+    """Extraction plan compiled from a list of body parsers.
+
+    Every single byte field is read in one ``struct`` unpack and converted
+    through a 256 entry table holding the parsed value of each raw byte, bit
+    and mask selection included. Values summed per byte, like durations, are
+    read in the same unpack. Wider fields are unpacked with ``struct`` and
+    parsed. Parsers overriding the raw value extraction are called as they
+    are.
+    """
+
+    def __init__(self, parsers: Iterable[BodyParser]) -> None:
+        """Compile the parsers, later parsers win for a repeated name."""
+        fields = {parser.name: parser for parser in parsers}
+        byte_fields: list[tuple[str, int, tuple[Any, ...]]] = []
+        summed: list[tuple[BodyParser, tuple[tuple[int, tuple[int, ...]], ...]]] = []
+        wide: list[tuple] = []
+        custom: list[BodyParser] = []
+        for name, parser in fields.items():
+            if (
+                type(parser).get_value is not BodyParser.get_value
+                or type(parser)._get_raw_value is not BodyParser._get_raw_value  # noqa: SLF001
+            ):
+                custom.append(parser)
+            elif terms := parser._byte_terms():  # noqa: SLF001
+                summed.append((parser, terms))
+            elif parser._length_in_bytes == 1:  # noqa: SLF001
+                byte_fields.append(
+                    (name, parser._byte, self._table(parser)),  # noqa: SLF001
+                )
+            else:
+                wide.append(self._wide_field(parser))
+        offsets = sorted(
+            {byte for _, byte, _ in byte_fields}
+            | {byte for _, terms in summed for byte, _ in terms},
+        )
+        position = {byte: index for index, byte in enumerate(offsets)}
+        layout, previous = [], -1
+        for byte in offsets:
+            layout.append(f"{byte - previous - 1}xB")
+            previous = byte
+        self._struct = struct.Struct("<" + "".join(layout))
+        self._bytes = tuple(
+            (name, position[byte], table) for name, byte, table in byte_fields
+        )
+        self._byte_offsets = tuple(
+            (name, byte, table, table[-1]) for name, byte, table in byte_fields
+        )
+        self._summed = tuple(
+            (
+                parser.name,
+                tuple((position[byte], table) for byte, table in terms),
+            )
+            for parser, terms in summed
+        )
+        self._summed_parsers = tuple(parser for parser, _ in summed)
+        self._wide = tuple(wide)
+        self._custom = tuple(custom)
+        self._unpacked = self._unpacker()
+
+    def _unpacker(self) -> Callable[[bytearray], dict[str, Any]]:
+        """Return the function parsing the fields read in one unpack."""
+        unpack = self._struct.unpack_from
+        byte_fields = self._bytes
+        summed = self._summed
+
+        def unpacked(body: bytearray) -> dict[str, Any]:
+            raw = unpack(body)
+            values = {
+                name: table[raw[position]] for name, position, table in byte_fields
+            }
+            for name, terms in summed:
+                total = 0
+                for position, table in terms:
+                    total += table[raw[position]]
+                values[name] = total
+            return values
+
+        return unpacked
+
+    @staticmethod
+    def _table(parser: BodyParser) -> tuple[Any, ...]:
+        """Build the parsed value of every raw byte, default value last."""
+        table = [
+            parser._parse(parser._select(raw))  # noqa: SLF001
+            for raw in range(256)
+        ]
+        table.append(parser._parse(parser._default_raw_value))  # noqa: SLF001
+        return tuple(table)
+
+    @staticmethod
+    def _wide_field(parser: BodyParser) -> tuple:
+        """Field read with struct when its width allows it."""
+        length = parser._length_in_bytes  # noqa: SLF001
+        order = ">" if parser._first_upper else "<"  # noqa: SLF001
+        fmt = _WIDE_FORMATS.get(length)
+        return (
+            parser.name,
+            parser._byte,  # noqa: SLF001
+            parser._byte + length,  # noqa: SLF001
+            struct.Struct(order + fmt) if fmt else None,
+            "big" if parser._first_upper else "little",  # noqa: SLF001
+            parser._select  # noqa: SLF001
+            if parser._bit is not None or parser._mask is not None  # noqa: SLF001
+            else None,
+            parser._parse,  # noqa: SLF001
+            parser._parse(parser._default_raw_value),  # noqa: SLF001
+        )
+
+    def parse(self, body: bytearray) -> dict[str, Any]:
+        """Parse all fields of the body in one pass."""
+        if len(body) >= self._struct.size:
+            values = self._unpacked(body)
+        else:
+            size = len(body)
+            values = {
+                name: table[body[byte]] if byte < size else default
+                for name, byte, table, default in self._byte_offsets
+            }
+            for parser in self._summed_parsers:
+                values[parser.name] = parser.get_value(body)
+        for name, byte, end, unpacker, order, select, parse, default in self._wide:
+            if len(body) < end:
+                values[name] = default
+                continue
+            data = (
+                unpacker.unpack_from(body, byte)[0]
+                if unpacker
+                else int.from_bytes(body[byte:end], order)
+            )
+            values[name] = parse(select(data) if select else data)
+        for parser in self._custom:
+            values[parser.name] = parser.get_value(body)
+        return values
+
+
+class MessageSchema(ParserPlan):
+    """Declarative message body layout.
+
+    The fields decode bodies with the compiled parser plan and encode the
+    attributes of a message back into a body, with the ``constants`` bits
+    always set. Both are compiled once, when the schema is created.
+    """
+
+    def __init__(
+        self,
+        *parsers: BodyParser,
+        size: int = 0,
+        constants: dict[int, int] | None = None,
+    ) -> None:
+        """Compile the schema fields."""
+        super().__init__(parsers)
+        self.parsers = parsers
+        self.size = max(
+            [size] + [parser._byte + parser._length_in_bytes for parser in parsers],  # noqa: SLF001
+        )
+        template = bytearray(self.size)
+        for byte, value in (constants or {}).items():
+            template[byte] |= value
+        self._template = bytes(template)
+        self._encoders = tuple(
+            (
+                parser.name,
+                parser._byte,  # noqa: SLF001
+                parser._length_in_bytes,  # noqa: SLF001
+                parser._first_upper,  # noqa: SLF001
+                parser._unparse,  # noqa: SLF001
+                parser._place,  # noqa: SLF001
+            )
+            for parser in parsers
+        )
+
+    def decode(self, body: bytearray) -> dict[str, Any]:
+        """Decode the fields of a body."""
+        return self.parse(body)
+
+    def decode_many(self, bodies: Iterable[bytearray]) -> list[dict[str, Any]]:
+        """Decode the fields of many bodies, e.g. captured traffic."""
+        parse = self.parse
+        return [parse(body) for body in bodies]
+
+    def encode(self, source: object) -> bytearray:
+        """Encode the attributes of source, attributes set to None are skipped."""
+        body = bytearray(self._template)
+        for name, byte, length, first_upper, unparse, place in self._encoders:
+            value = getattr(source, name, None)
+            if value is None:
+                continue
+            raw_value = place(unparse(value))
+            if length == 1:
+                body[byte] |= raw_value
+            else:
+                end = byte + length
+                order: Literal["big", "little"] = "big" if first_upper else "little"
+                body[byte:end] = (
+                    int.from_bytes(body[byte:end], order) | raw_value
+                ).to_bytes(length, order)
+        return body
+
 
 class MessageBody:
     """Message body."""
 
+    schema: ClassVar[MessageSchema | None] = None
+
     def __init__(self, body: bytearray) -> None:
         """Initialize message body."""
         self._data = body
         self.parser_list: list[BodyParser] = []
+        self.parser_plan: ParserPlan | None = self.schema
 
     @property
     def data(self) -> bytearray:
@@ -723,7 +1028,14 @@ class MessageBody:
         return body[byte] if len(body) > byte else default_value
 
     def parse_all(self) -> None:
-        """Process parses and set body attrs."""
+        """Process parses and set body attrs.
+
+        Bodies with a ``schema`` or a compiled ``parser_plan`` parse all
+        fields in one pass.
+        """
+        if self.parser_plan is not None:
+            vars(self).update(self.parser_plan.parse(self._data))
+            return
         for parse in self.parser_list:
             setattr(self, parse.name, parse.get_value(self._data))
 
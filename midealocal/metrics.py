@@ -0,0 +1,233 @@
+"""Midea local device metrics."""
+
+import math
+import time
+from bisect import bisect_left
+from collections import deque
+from collections.abc import Hashable, Mapping
+from typing import Any
+
+# upper bounds in seconds, from LAN round trips to slow cloud bridged devices
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+# a query without response after this many seconds is counted as timed out
+QUERY_EXPIRY = 10.0
+PROMETHEUS_PREFIX = "midea_"
+
+
+class Histogram:
+    """Histogram of observations with fixed buckets."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        """Initialize histogram."""
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """Add an observation."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate the ``q`` quantile, as the upper bound of its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts, strict=False):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self) -> dict[str, Any]:
+        """Histogram as a dict, buckets are cumulative as in Prometheus."""
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip((*self.buckets, math.inf), self.counts, strict=True):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "avg": self.sum / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+
+class DeviceMetrics:
+    """Latency histograms and counters of one device.
+
+    Enabled with ``MideaDevice.enable_metrics``, a device without metrics
+    only tests for ``None`` on its hot paths.
+    """
+
+    COUNTERS = (
+        "connects",
+        "connect_errors",
+        "reconnects",
+        "frames_received",
+        "decode_errors",
+        "bytes_in",
+        "bytes_out",
+        "query_timeouts",
+    )
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        """Initialize device metrics."""
+        self._buckets = buckets
+        self.connect = Histogram(buckets)
+        self.auth = Histogram(buckets)
+        self.query: dict[str, Histogram] = {}
+        self.connects = 0
+        self.connect_errors = 0
+        self.reconnects = 0
+        self.frames_received = 0
+        self.decode_errors = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.query_timeouts = 0
+        self._pending: dict[int, deque[tuple[str, int, float]]] = {}
+
+    def query_sent(self, message_type: int, body_type: int, name: str) -> None:
+        """Start the round trip of a query."""
+        self._pending.setdefault(message_type, deque()).append(
+            (name, body_type, time.monotonic()),
+        )
+
+    def response_received(self, message_type: int, body_type: int | None) -> None:
+        """End the round trip of the query a response answers.
+
+        That is the oldest query of the same body type, without one the
+        oldest query of the message type.
+        """
+        pending = self._pending.get(message_type)
+        if not pending:
+            return
+        now = time.monotonic()
+        while pending and now - pending[0][2] > QUERY_EXPIRY:
+            pending.popleft()
+            self.query_timeouts += 1
+        if not pending:
+            return
+        index = next(
+            (index for index, entry in enumerate(pending) if entry[1] == body_type),
+            0,
+        )
+        name, _, sent = pending[index]
+        del pending[index]
+        histogram = self.query.get(name)
+        if histogram is None:
+            histogram = self.query[name] = Histogram(self._buckets)
+        histogram.observe(now - sent)
+
+    def query_abandoned(self, message_type: int, name: str) -> None:
+        """Stop the round trip of a query left without response.
+
+        The query is not counted as timed out, its response is not expected
+        any more, e.g. once it is set unsupported.
+        """
+        pending = self._pending.get(message_type)
+        if not pending:
+            return
+        for index, (pending_name, _, _) in enumerate(pending):
+            if pending_name == name:
+                del pending[index]
+                return
+
+    def connection_closed(self) -> None:
+        """Count the queries left without response as timed out."""
+        self.query_timeouts += sum(len(pending) for pending in self._pending.values())
+        self._pending.clear()
+
+    def snapshot(self) -> dict[str, Any]:
+        """Counters and histograms as a dict."""
+        snapshot: dict[str, Any] = {name: getattr(self, name) for name in self.COUNTERS}
+        snapshot["connect"] = self.connect.snapshot()
+        snapshot["auth"] = self.auth.snapshot()
+        snapshot["query"] = {
+            name: histogram.snapshot() for name, histogram in list(self.query.items())
+        }
+        return snapshot
+
+
+def _escape(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict[str, Any]) -> str:
+    text = ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+    return f"{{{text}}}"
+
+
+def _histogram_lines(
+    name: str,
+    histogram: Histogram,
+    labels: dict[str, Any],
+) -> list[str]:
+    lines = []
+    cumulative = 0
+    bounds = (*histogram.buckets, math.inf)
+    for bound, count in zip(bounds, histogram.counts, strict=True):
+        cumulative += count
+        le = "+Inf" if bound == math.inf else repr(bound)
+        lines.append(f"{name}_bucket{_labels({**labels, 'le': le})} {cumulative}")
+    lines.append(f"{name}_sum{_labels(labels)} {histogram.sum!r}")
+    lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+    return lines
+
+
+def prometheus_text(metrics: Mapping[Hashable, DeviceMetrics]) -> str:
+    """Metrics of devices by device id in the Prometheus text format."""
+    lines = []
+    for counter in DeviceMetrics.COUNTERS:
+        name = f"{PROMETHEUS_PREFIX}{counter}_total"
+        lines.append(f"# TYPE {name} counter")
+        lines.extend(
+            f"{name}{_labels({'device_id': device_id})} {getattr(device, counter)}"
+            for device_id, device in metrics.items()
+        )
+    for histogram_name in ("connect", "auth"):
+        name = f"{PROMETHEUS_PREFIX}{histogram_name}_seconds"
+        lines.append(f"# TYPE {name} histogram")
+        for device_id, device in metrics.items():
+            lines.extend(
+                _histogram_lines(
+                    name,
+                    getattr(device, histogram_name),
+                    {"device_id": device_id},
+                ),
+            )
+    name = f"{PROMETHEUS_PREFIX}query_seconds"
+    lines.append(f"# TYPE {name} histogram")
+    for device_id, device in metrics.items():
+        for message, histogram in list(device.query.items()):
+            lines.extend(
+                _histogram_lines(
+                    name,
+                    histogram,
+                    {"device_id": device_id, "message": message},
+                ),
+            )
+    return "\n".join(lines) + "\n"
@@ -1,90 +1,93 @@
 """Midea local packet builder."""
 
+import struct
 from datetime import UTC, datetime
+from functools import lru_cache
 from typing import cast
 
 from .security import LocalSecurity
 
+HEADER_LENGTH = 40
+SIGN_LENGTH = 16
+
+# aa20ac00000000000003418100ff03ff000200000000000000000000000006f274
+# 2 bytes StaticHeader, 2 bytes MessageType, 2 bytes PacketLength, 2 bytes,
+# 4 bytes MessageId, 8 bytes Date&Time, 8 bytes DeviceID, 12 bytes
+_HEADER = bytes([0x5A, 0x5A, 0x01, 0x11, 0x00, 0x00, 0x20, 0x00]) + bytes(32)
+_LENGTH = struct.Struct("<H")
+_TIME = struct.Struct("8B")
+# stateless, shared by every packet
+_SECURITY = LocalSecurity()
+
+
+@lru_cache(maxsize=1024)
+def _header_template(device_id: int) -> bytes:
+    """Packet header with the device id already encoded."""
+    header = bytearray(_HEADER)
+    header[20:28] = device_id.to_bytes(8, "little")
+    return bytes(header)
+
+
+def _time_fields() -> tuple[int, ...]:
+    """Packet time, two decimal digits per byte, least significant first."""
+    now = datetime.now(tz=UTC)
+    return (
+        now.microsecond // 10000,
+        now.second,
+        now.minute,
+        now.hour,
+        now.day,
+        now.month,
+        now.year % 100,
+        now.year // 100,
+    )
+
 
 class PacketBuilder:
     """Packet builder."""
 
-    def __init__(self, device_id: int, command: bytes) -> None:
-        """Initialize packet builder."""
-        self.command: bytes
-        self.security = LocalSecurity()
-        # aa20ac00000000000003418100ff03ff000200000000000000000000000006f274
-        # Init the packet with the header data.
-        self.packet = bytearray(
-            [
-                # 2 bytes - StaicHeader
-                0x5A,
-                0x5A,
-                # 2 bytes - mMessageType
-                0x01,
-                0x11,
-                # 2 bytes - PacketLenght
-                0x00,
-                0x00,
-                # 2 bytes
-                0x20,
-                0x00,
-                # 4 bytes - MessageId
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                # 8 bytes - Date&Time
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                # 6 bytes - mDeviceID
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                # 12 bytes
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-                0x00,
-            ],
-        )
-        self.packet[12:20] = self.packet_time()
-        self.packet[20:28] = device_id.to_bytes(8, "little")
+    def __init__(
+        self,
+        device_id: int,
+        command: bytes,
+        encrypted: bytes | None = None,
+    ) -> None:
+        """Initialize packet builder.
+
+        ``encrypted`` is the AES encrypted command, when it is already known.
+        """
         self.command = command
+        self.encrypted = encrypted
+        self.security = _SECURITY
+        self._header = _header_template(device_id)
+        self.packet = bytearray()
 
     def finalize(self, msg_type: int = 1) -> bytearray:
-        """Finalize packet builder."""
+        """Finalize packet builder.
+
+        The packet is allocated once with its final size and the header
+        template, time, length, payload and checksum are written into it.
+        """
+        payload = b""
+        if msg_type == 1:
+            payload = self.encrypted or self.security.aes_encrypt(self.command)
+        size = HEADER_LENGTH + len(payload) + SIGN_LENGTH
+        packet = bytearray(size)
+        packet[:HEADER_LENGTH] = self._header
         if msg_type != 1:
-            self.packet[3] = 0x10
-            self.packet[6] = 0x7B
-        else:
-            self.packet.extend(self.security.aes_encrypt(self.command))
+            packet[3] = 0x10
+            packet[6] = 0x7B
         # PacketLenght
-        self.packet[4:6] = (len(self.packet) + 16).to_bytes(2, "little")
+        _LENGTH.pack_into(packet, 4, size)
+        _TIME.pack_into(packet, 12, *_time_fields())
+        packet[HEADER_LENGTH : size - SIGN_LENGTH] = payload
         # Append a basic checksum data(16 bytes) to the packet
-        self.packet.extend(self.encode32(self.packet))
-        return self.packet
+        with memoryview(packet) as view:
+            packet[size - SIGN_LENGTH :] = self.encode32(view[: size - SIGN_LENGTH])
+        self.packet = packet
+        return packet
 
-    def encode32(self, data: bytearray) -> bytes:
+    def encode32(self, data: bytes | bytearray | memoryview) -> bytes:
         """Encode 32."""
         return self.security.encode32_data(data)
 
@@ -96,9 +99,4 @@ class PacketBuilder:
     @staticmethod
     def packet_time() -> bytearray:
         """Packet builder packet time."""
-        t = datetime.now(tz=UTC).strftime("%Y%m%d%H%M%S%f")[:16]
-        b = bytearray()
-        for i in range(0, len(t), 2):
-            d = int(t[i : i + 2])
-            b.insert(0, d)
-        return b
+        return bytearray(_TIME.pack(*_time_fields()))
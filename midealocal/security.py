@@ -1,16 +1,20 @@
 """Midea local security."""
 
 import hmac
+from collections.abc import Iterator
 from enum import IntEnum
+from functools import lru_cache
 from hashlib import md5, sha256
 from typing import Any, cast
 from urllib.parse import unquote_plus, urlencode, urlparse
 
 from Crypto.Cipher import AES
+from Crypto.Cipher._mode_ecb import EcbMode
 from Crypto.Random import get_random_bytes
 from Crypto.Util.Padding import pad, unpad
 from Crypto.Util.strxor import strxor
 
+from .buffer import ReceiveBuffer
 from .const import MAX_DOUBLE_BYTE_VALUE
 from .exceptions import (
     CannotAuthenticate,
@@ -33,6 +37,15 @@ MSGTYPE_ENCRYPTED_REQUEST = 0x6
 TCP_KEY_RESPONSE_LENGTH = 64
 
 
+@lru_cache(maxsize=64)
+def _ecb_cipher(key: bytes) -> EcbMode:
+    """AES ECB cipher, the key schedule is expanded once per key.
+
+    ECB cipher objects keep no state between calls, so they are shared.
+    """
+    return AES.new(key, AES.MODE_ECB)
+
+
 class UdpIdMethod(IntEnum):
     """Udp Id format method."""
 
@@ -114,6 +127,18 @@ class CloudSecurity:
         self._aes_key = key
         self._aes_iv = iv
 
+    @property
+    def aes_keys(self) -> tuple[bytes, bytes] | None:
+        """AES key and IV of the login, once set."""
+        if not hasattr(self, "_aes_key"):
+            return None
+        return self._aes_key, self._aes_iv
+
+    @aes_keys.setter
+    def aes_keys(self, keys: tuple[bytes, bytes]) -> None:
+        """Restore the AES key and IV of a former login."""
+        self._aes_key, self._aes_iv = keys
+
     def aes_encrypt_with_fixed_key(self, data: bytes) -> bytes:
         """Encrypt AES with fixed key."""
         return self.aes_encrypt(data, self._fixed_key, self._fixed_iv)
@@ -263,6 +288,7 @@ class LocalSecurity:
             ),
         )
         self._tcp_key: bytes
+        self._tcp_cipher: EcbMode | None = None
         self._request_count = 0
         self._response_count = 0
 
@@ -271,26 +297,44 @@ class LocalSecurity:
         try:
             return cast(
                 bytearray,
-                unpad(AES.new(self.aes_key, AES.MODE_ECB).decrypt(bytearray(raw)), 16),
+                unpad(_ecb_cipher(self.aes_key).decrypt(raw), 16),
             )
         except ValueError:
             return bytearray(0)
 
-    def aes_encrypt(self, raw: bytes) -> bytes:
+    def aes_encrypt(self, raw: Buffer) -> bytes:
         """Encrypt AES."""
-        return AES.new(self.aes_key, AES.MODE_ECB).encrypt(bytearray(pad(raw, 16)))
+        return _ecb_cipher(self.aes_key).encrypt(pad(bytes(raw), 16))
 
-    def aes_cbc_decrypt(self, raw: bytes, key: Buffer) -> bytes:
-        """Decrypt AES with CBC."""
-        return AES.new(key=key, mode=AES.MODE_CBC, iv=self.iv).decrypt(raw)
+    def aes_cbc_decrypt(self, raw: Buffer, key: Buffer) -> bytes:
+        """Decrypt AES with CBC.
+
+        CBC decryption is an ECB decryption of all the blocks xored with the
+        previous ciphertext blocks, so the cached key schedule of the session
+        (or of ``key``) is reused instead of creating a CBC cipher per frame.
+        """
+        if len(raw) == 0:
+            return b""
+        if self._tcp_cipher is not None and key == self._tcp_key:
+            cipher = self._tcp_cipher
+        else:
+            cipher = _ecb_cipher(bytes(key))
+        return strxor(cipher.decrypt(raw), self.iv + raw[:-16])
 
     def aes_cbc_encrypt(self, raw: bytes, key: Buffer) -> bytes:
-        """Encrypt AES with CBC."""
+        """Encrypt AES with CBC.
+
+        CBC cipher objects carry the chaining state, a new one is required
+        per frame; chaining the blocks through the cached ECB cipher in
+        Python is slower than the key setup it saves.
+        """
         return AES.new(key=key, mode=AES.MODE_CBC, iv=self.iv).encrypt(raw)
 
-    def encode32_data(self, raw: bytes) -> bytes:
+    def encode32_data(self, raw: Buffer) -> bytes:
         """Encode 32 data."""
-        return md5(raw + self.salt).digest()
+        digest = md5(raw)
+        digest.update(self.salt)
+        return digest.digest()
 
     def tcp_key(self, response: bytes, key: Buffer) -> bytes:
         """TCP key."""
@@ -304,6 +348,7 @@ class LocalSecurity:
         if sha256(plain).digest() != sign:
             raise DataSignDoesntMatch
         self._tcp_key = strxor(plain, key)
+        self._tcp_cipher = AES.new(self._tcp_key, AES.MODE_ECB)
         self._request_count = 0
         self._response_count = 0
         return self._tcp_key
@@ -329,36 +374,86 @@ class LocalSecurity:
             data = self.aes_cbc_encrypt(raw=data, key=self._tcp_key) + sign
         return header + data
 
-    def decode_8370(self, data: bytes) -> tuple[list, bytes]:
-        """Decode 8370 data."""
+    @staticmethod
+    def frame_size_8370(data: Buffer) -> int:
+        """Return the size of the first 8370 frame, 0 if it is incomplete."""
         if len(data) < MIN_DECODE_8370_DATA_LENGTH:
-            return [], data
-        header = data[:6]
-        if header[0] != HEADER_8370_1ST_BYTE or header[1] != HEADER_8370_2ND_BYTE:
+            return 0
+        if data[0] != HEADER_8370_1ST_BYTE or data[1] != HEADER_8370_2ND_BYTE:
             raise MessageWrongFormat("not an 8370 message")
-        size = int.from_bytes(header[2:4], "big") + 8
-        leftover = None
-        if len(data) > size:
-            leftover = data[size:]
-            data = data[:size]
-        elif len(data) < size:
-            return [], data
+        size = (data[2] << 8 | data[3]) + 8
+        return size if len(data) >= size else 0
+
+    def decode_8370_frame(self, frame: Buffer) -> bytes:
+        """Decode a single complete 8370 frame."""
+        header = bytes(frame[:6])
         if header[4] != HEADER_8370_4TH_BYTE:
             raise MessageWrongFormat("missing byte 4")
         padding = header[5] >> 4
         msgtype = header[5] & 0xF
-        data = data[6:]
+        data = frame[6:]
         if msgtype in (MSGTYPE_ENCRYPTED_RESPONSE, MSGTYPE_ENCRYPTED_REQUEST):
             sign = data[-32:]
-            data = data[:-32]
-            data = self.aes_cbc_decrypt(raw=data, key=self._tcp_key)
+            data = self.aes_cbc_decrypt(raw=data[:-32], key=self._tcp_key)
             if sha256(header + data).digest() != sign:
                 raise DataSignDoesntMatch
             if padding:
                 data = data[:-padding]
         self._response_count = int.from_bytes(data[:2], "big")
-        data = data[2:]
-        if leftover:
-            packets, incomplete = self.decode_8370(leftover)
-            return [data, *packets], incomplete
-        return [data], b""
+        return bytes(data[2:])
+
+    def decode_8370(self, data: Buffer) -> tuple[list, Buffer]:
+        """Decode 8370 data.
+
+        ``data`` may be a memoryview of a receive buffer, the leftover is
+        then returned as a view and the frames are only copied when decoded.
+        """
+        packets = []
+        offset = 0
+        with memoryview(data) as view:
+            while size := self.frame_size_8370(view[offset:]):
+                packets.append(self.decode_8370_frame(view[offset : offset + size]))
+                offset += size
+        return packets, data[offset:]
+
+
+class Decoder8370:
+    """Streaming 8370 decoder.
+
+    Data is fed as it is received; partial frames are kept in the receive
+    buffer until they are complete and every complete frame is validated
+    and decoded in turn, without recursion or re-slicing the stream.
+    """
+
+    def __init__(
+        self,
+        security: LocalSecurity,
+        buffer: ReceiveBuffer | None = None,
+    ) -> None:
+        """Initialize decoder."""
+        self._security = security
+        self._buffer = buffer if buffer is not None else ReceiveBuffer()
+
+    @property
+    def buffer(self) -> ReceiveBuffer:
+        """Receive buffer holding the partial frames."""
+        return self._buffer
+
+    def feed(self, data: Buffer = b"") -> Iterator[bytes]:
+        """Append data and iterate over the decoded complete frames.
+
+        Data already received into the buffer is decoded without ``data``.
+        A frame failing validation is dropped before the error is raised.
+        """
+        self._buffer.append(data)
+        return self._frames()
+
+    def _frames(self) -> Iterator[bytes]:
+        while True:
+            with self._buffer.view() as view:
+                size = self._security.frame_size_8370(view)
+                if size == 0:
+                    return
+                self._buffer.consume(size)
+                packet = self._security.decode_8370_frame(view[:size])
+            yield packet
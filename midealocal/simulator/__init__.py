@@ -0,0 +1,148 @@
+"""Midea local appliance simulator.
+
+Virtual appliances speaking the V2 (5A5A) and V3 (8370) LAN protocols on
+localhost, for tests and load tests of the device, hub and discovery code.
+"""
+
+import asyncio
+import logging
+import threading
+from collections.abc import Coroutine, Iterable
+from typing import Any
+
+from .appliance import ApplianceProtocol, DiscoveryProtocol, VirtualAppliance
+from .responses import RESPONSES
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+START_TIMEOUT = 10
+
+__all__ = [
+    "RESPONSES",
+    "ApplianceProtocol",
+    "DiscoveryProtocol",
+    "Simulator",
+    "VirtualAppliance",
+]
+
+
+class Simulator(threading.Thread):
+    """Serve virtual appliances from an event loop on its own thread.
+
+    Each appliance listens on its own port of ``host``, picked by the system,
+    the address is set on the appliance once it is added.
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST) -> None:
+        """Initialize simulator."""
+        threading.Thread.__init__(self, name="midea-simulator", daemon=True)
+        self._host = host
+        self._loop = asyncio.new_event_loop()
+        self._servers: dict[int, asyncio.Server] = {}
+        self._appliances: dict[int, VirtualAppliance] = {}
+        self._discovery: asyncio.DatagramTransport | None = None
+        self._discovery_port = 0
+        self._is_run = False
+
+    @property
+    def appliances(self) -> list[VirtualAppliance]:
+        """Appliances served by the simulator."""
+        return list(self._appliances.values())
+
+    def open(self) -> None:
+        """Open simulator thread."""
+        if not self._is_run:
+            self._is_run = True
+            threading.Thread.start(self)
+
+    def close(self) -> None:
+        """Close all appliances and the simulator thread."""
+        if self._is_run:
+            self._run(self._close_all())
+            self._is_run = False
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self.join()
+            self._loop.close()
+
+    def run(self) -> None:
+        """Run simulator event loop."""
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def add_appliance(self, appliance: VirtualAppliance) -> VirtualAppliance:
+        """Start serving an appliance."""
+        self._run(self._add(appliance))
+        return appliance
+
+    def add_appliances(
+        self,
+        appliances: Iterable[VirtualAppliance],
+    ) -> list[VirtualAppliance]:
+        """Start serving many appliances at once."""
+        appliances = list(appliances)
+        self._run(self._add_many(appliances))
+        return appliances
+
+    def remove_appliance(self, appliance: VirtualAppliance) -> None:
+        """Stop serving an appliance, open connections are closed."""
+        self._run(self._remove(appliance))
+
+    def open_discovery(self, port: int = 0) -> int:
+        """Answer discovery broadcasts on a UDP port of ``host``.
+
+        Returns the port, picked by the system when ``port`` is 0. Real
+        appliances listen on the ports of ``midealocal.discover.DISCOVERY_PORTS``.
+        """
+        self._run(self._open_discovery(port))
+        return self._discovery_port
+
+    def _run(self, coroutine: Coroutine[Any, Any, None]) -> None:
+        if not self._is_run:
+            self.open()
+        asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(START_TIMEOUT)
+
+    async def _open_discovery(self, port: int) -> None:
+        if self._discovery is not None:
+            raise ValueError("discovery already open")
+        self._discovery, _ = await self._loop.create_datagram_endpoint(
+            lambda: DiscoveryProtocol(self._appliances.values),
+            local_addr=(self._host, port),
+        )
+        self._discovery_port = self._discovery.get_extra_info("sockname")[1]
+
+    async def _add(self, appliance: VirtualAppliance) -> None:
+        if appliance.device_id in self._servers:
+            raise ValueError(f"appliance {appliance.device_id} already added")
+        server = await self._loop.create_server(
+            lambda: ApplianceProtocol(appliance),
+            self._host,
+            0,
+        )
+        appliance.host, appliance.port = server.sockets[0].getsockname()[:2]
+        self._servers[appliance.device_id] = server
+        self._appliances[appliance.device_id] = appliance
+        _LOGGER.debug(
+            "[%s] Serving on %s:%s",
+            appliance.device_id,
+            appliance.host,
+            appliance.port,
+        )
+
+    async def _add_many(self, appliances: list[VirtualAppliance]) -> None:
+        await asyncio.gather(*(self._add(appliance) for appliance in appliances))
+
+    async def _remove(self, appliance: VirtualAppliance) -> None:
+        server = self._servers.pop(appliance.device_id, None)
+        self._appliances.pop(appliance.device_id, None)
+        if server is not None:
+            server.close()
+            appliance.close_connections()
+            await server.wait_closed()
+
+    async def _close_all(self) -> None:
+        if self._discovery is not None:
+            self._discovery.close()
+            self._discovery = None
+        for appliance in list(self._appliances.values()):
+            await self._remove(appliance)
@@ -0,0 +1,301 @@
+"""Midea local simulated appliance."""
+
+import asyncio
+import logging
+import os
+from collections.abc import Callable, Iterable
+from hashlib import sha256
+from typing import Any, cast
+
+from midealocal.buffer import ReceiveBuffer
+from midealocal.cloud import DEFAULT_KEYS
+from midealocal.const import DeviceType, ProtocolVersion
+from midealocal.exceptions import MessageWrongFormat, MideaLocalError
+from midealocal.message import MessageType
+from midealocal.packet_builder import HEADER_LENGTH, SIGN_LENGTH, PacketBuilder
+from midealocal.security import (
+    MSGTYPE_ENCRYPTED_RESPONSE,
+    MSGTYPE_HANDSHAKE_REQUEST,
+    MSGTYPE_HANDSHAKE_RESPONSE,
+    LocalSecurity,
+)
+
+from .responses import APPLIANCE_BODY, response_body, response_frame
+
+_LOGGER = logging.getLogger(__name__)
+
+V2_HEADER = b"\x5a\x5a"
+V3_HEADER = b"\x83\x70"
+V1_DEVICE_INFO = b"\x15\x00"
+DEVICE_INFO_HEADER_LENGTH = 64
+V2_COMMAND = b"\x01\x11"
+V2_HEARTBEAT = b"\x01\x10"
+
+
+class VirtualAppliance:
+    """Configuration and counters of one simulated appliance."""
+
+    def __init__(
+        self,
+        device_id: int,
+        device_type: DeviceType = DeviceType.AC,
+        protocol: ProtocolVersion = ProtocolVersion.V3,
+        token: str = DEFAULT_KEYS[99]["token"],
+        key: str = DEFAULT_KEYS[99]["key"],
+        message_protocol_version: int = 3,
+        responses: dict[int, bytes] | None = None,
+        latency: float = 0.0,
+        unanswered: Iterable[int] = (),
+        model: str = "00000Q11",
+    ) -> None:
+        """Initialize virtual appliance.
+
+        ``responses`` maps query body types to response bodies, over the
+        canned responses of the device type, queries of the ``unanswered``
+        body types get no response. Replies are sent ``latency`` seconds
+        after the request. ``model`` is the 8 characters model in the
+        serial number of discovery responses.
+        """
+        self.device_id = device_id
+        self.device_type = device_type
+        self.protocol = protocol
+        self.token = bytes.fromhex(token)
+        self.key = bytes.fromhex(key)
+        self.message_protocol_version = message_protocol_version
+        self.responses = responses or {}
+        self.latency = latency
+        self.unanswered = frozenset(unanswered)
+        self.model = model
+        self.host = ""
+        self.port = 0
+        self.protocols: set[ApplianceProtocol] = set()
+        self.requests = 0
+        self.heartbeats = 0
+        self.authentications = 0
+
+    @property
+    def connections(self) -> int:
+        """Open client connections."""
+        return len(self.protocols)
+
+    def close_connections(self) -> None:
+        """Close all client connections."""
+        for protocol in list(self.protocols):
+            protocol.close()
+
+    @property
+    def sn(self) -> str:
+        """Serial number, with the model at [9:17] as real ones."""
+        return f"000000P00{self.model}{self.device_id:015d}"[:32]
+
+    def discovery_response(self) -> bytes:
+        """Response to a discovery broadcast."""
+        if self.protocol == ProtocolVersion.V1:
+            return (
+                f'<?xml version="1.0" encoding="UTF-8"?><root><body>'
+                f'<device port="{self.port}" apc_sn="{self.sn}" '
+                f'apc_type="{int(self.device_type)}"><name/></device>'
+                f"</body></root>"
+            ).encode()
+        ssid = f"midea_{self.device_type:02x}_{self.device_id % 0x10000:04x}".encode()
+        reply = (
+            bytes(4)
+            + self.port.to_bytes(4, "little")
+            + self.sn.encode()
+            + bytes([len(ssid)])
+            + ssid
+        )
+        packet = bytes(PacketBuilder(self.device_id, reply).finalize())
+        if self.protocol == ProtocolVersion.V2:
+            return packet
+        return (
+            V3_HEADER
+            + (len(packet) + 8).to_bytes(2, "big")
+            + b"\x20\x00\x00\x00"
+            + packet
+            + bytes(SIGN_LENGTH)
+        )
+
+    def device_info_response(self) -> bytes:
+        """Response of a V1 appliance to a device info request."""
+        dev_id = self.device_id.to_bytes(6, "little").hex()
+        xml = (
+            f'<?xml version="1.0" encoding="UTF-8"?><root>'
+            f'<smartDevice devId="{dev_id}"><name/></smartDevice></root>'
+        ).encode()
+        return bytes(DEVICE_INFO_HEADER_LENGTH) + xml + bytes(SIGN_LENGTH)
+
+    def reply(self, request: bytes) -> bytearray | None:
+        """Response frame to a request frame, None to stay silent."""
+        message_type = request[9]
+        body: bytes | None
+        if message_type == MessageType.query_appliance:
+            body = APPLIANCE_BODY
+        else:
+            request_body = request[10:-1]
+            if request_body and request_body[0] in self.unanswered:
+                return None
+            body = self.responses.get(request_body[0]) if request_body else None
+            if body is None:
+                body = response_body(self.device_type, request_body)
+        return response_frame(
+            self.device_type,
+            self.message_protocol_version,
+            message_type,
+            body,
+        )
+
+
+class ApplianceProtocol(asyncio.Protocol):
+    """Connection to a virtual appliance, V2 (5A5A) or V3 (8370)."""
+
+    def __init__(self, appliance: VirtualAppliance) -> None:
+        """Initialize appliance protocol."""
+        self._appliance = appliance
+        self._security = LocalSecurity()
+        self._buffer = ReceiveBuffer()
+        self._transport: asyncio.Transport | None = None
+        self._authenticated = appliance.protocol != ProtocolVersion.V3
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        """Handle a new connection."""
+        self._transport = cast("asyncio.Transport", transport)
+        self._appliance.protocols.add(self)
+
+    def connection_lost(self, exc: Exception | None) -> None:  # noqa: ARG002
+        """Handle a closed connection."""
+        self._transport = None
+        self._appliance.protocols.discard(self)
+
+    def close(self) -> None:
+        """Close the connection."""
+        if self._transport is not None:
+            self._transport.close()
+
+    def data_received(self, data: bytes) -> None:
+        """Handle data received from the client."""
+        self._buffer.append(data)
+        try:
+            if self._appliance.protocol == ProtocolVersion.V3:
+                self._receive_8370()
+            elif self._appliance.protocol == ProtocolVersion.V1:
+                self._receive_device_info()
+            else:
+                self._receive_packets()
+        except (MideaLocalError, ValueError):
+            _LOGGER.debug(
+                "[%s] Invalid data, closing: %s",
+                self._appliance.device_id,
+                self._buffer.hex(),
+            )
+            self.close()
+
+    def _receive_8370(self) -> None:
+        while True:
+            with self._buffer.view() as view:
+                size = self._security.frame_size_8370(view)
+                if not size:
+                    return
+                msgtype = view[5] & 0xF
+                if msgtype != MSGTYPE_HANDSHAKE_REQUEST and not self._authenticated:
+                    raise MessageWrongFormat("request before the handshake")
+                packet = self._security.decode_8370_frame(view[:size])
+            self._buffer.consume(size)
+            if msgtype == MSGTYPE_HANDSHAKE_REQUEST:
+                self._handshake(packet)
+            else:
+                self._handle_packet(packet)
+
+    def _receive_packets(self) -> None:
+        while len(self._buffer) >= HEADER_LENGTH:
+            with self._buffer.view() as view:
+                if view[:2] != V2_HEADER:
+                    raise MessageWrongFormat("not a 5A5A message")
+                size = view[4] | view[5] << 8
+                if size < HEADER_LENGTH + SIGN_LENGTH:
+                    raise MessageWrongFormat("invalid 5A5A length")
+                if len(view) < size:
+                    return
+                packet = bytes(view[:size])
+            self._buffer.consume(size)
+            self._handle_packet(packet)
+
+    def _receive_device_info(self) -> None:
+        """Answer the device info requests of a V1 appliance."""
+        with self._buffer.view() as view:
+            if len(view) < HEADER_LENGTH:
+                return
+            if view[:2] != V2_HEADER or view[2:4] != V1_DEVICE_INFO:
+                raise MessageWrongFormat("not a device info request")
+        self._buffer.consume(len(self._buffer))
+        self._write(self._appliance.device_info_response())
+
+    def _handshake(self, token: bytes) -> None:
+        """Answer the V3 handshake and derive the session key."""
+        appliance = self._appliance
+        if token != appliance.token:
+            _LOGGER.debug("[%s] Invalid token", appliance.device_id)
+            self.close()
+            return
+        plain = os.urandom(32)
+        payload = (
+            self._security.aes_cbc_encrypt(plain, appliance.key)
+            + sha256(plain).digest()
+        )
+        self._security.tcp_key(payload, appliance.key)
+        self._write(self._security.encode_8370(payload, MSGTYPE_HANDSHAKE_RESPONSE))
+        self._authenticated = True
+        appliance.authentications += 1
+
+    def _handle_packet(self, packet: bytes) -> None:
+        appliance = self._appliance
+        if packet[2:4] == V2_HEARTBEAT:
+            appliance.heartbeats += 1
+            reply = PacketBuilder(appliance.device_id, b"\x00").finalize(
+                msg_type=0,
+            )
+        elif packet[2:4] == V2_COMMAND:
+            appliance.requests += 1
+            request = self._security.aes_decrypt(packet[HEADER_LENGTH:-SIGN_LENGTH])
+            frame = appliance.reply(bytes(request))
+            if frame is None:
+                return
+            reply = PacketBuilder(appliance.device_id, bytes(frame)).finalize()
+        else:
+            return
+        if appliance.protocol == ProtocolVersion.V3:
+            reply = bytearray(
+                self._security.encode_8370(bytes(reply), MSGTYPE_ENCRYPTED_RESPONSE),
+            )
+        if appliance.latency > 0:
+            asyncio.get_running_loop().call_later(
+                appliance.latency,
+                self._write,
+                bytes(reply),
+            )
+        else:
+            self._write(bytes(reply))
+
+    def _write(self, data: bytes) -> None:
+        if self._transport is not None:
+            self._transport.write(data)
+
+
+class DiscoveryProtocol(asyncio.DatagramProtocol):
+    """Answer discovery broadcasts for all the appliances of a simulator."""
+
+    def __init__(self, appliances: Callable[[], Iterable[VirtualAppliance]]) -> None:
+        """Initialize discovery protocol."""
+        self._appliances = appliances
+        self._transport: asyncio.DatagramTransport | None = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        """Handle the opened socket."""
+        self._transport = cast("asyncio.DatagramTransport", transport)
+
+    def datagram_received(self, data: bytes, addr: tuple[str | Any, int]) -> None:
+        """Answer a discovery broadcast."""
+        if self._transport is None or data[:2] != V2_HEADER:
+            return
+        for appliance in self._appliances():
+            self._transport.sendto(appliance.discovery_response(), addr)
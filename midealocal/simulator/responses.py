@@ -0,0 +1,50 @@
+"""Midea local simulator canned responses."""
+
+from midealocal.const import DeviceType
+from midealocal.message import ListTypes, MessageQuestCustom, MessageType
+
+# zero filled bytes after the body type of responses without a canned body
+DEFAULT_BODY_LENGTH = 64
+
+# appliance query response: device protocol version in the header, zero body
+APPLIANCE_BODY = bytes([ListTypes.X00]) + bytes(19)
+
+# device type -> query body type -> response body, body type included
+RESPONSES: dict[DeviceType, dict[int, bytes]] = {
+    DeviceType.AC: {
+        # power on, cool, 24 C, auto fan, indoor 25 C, outdoor 30 C
+        ListTypes.X41: bytes.fromhex(
+            "c0 01 48 66 00 00 00 00 00 00 00 64 6e 00 00 00 00 00 00 00 00 00 00",
+        ),
+    },
+    DeviceType.A1: {
+        # power on, auto mode, low fan, 50 % target, 55 % and 24 C current
+        ListTypes.X41: bytes.fromhex(
+            "c8 01 03 28 00 00 00 32 00 00 00 00 00 00 00 00 37 62 00 00 00 00",
+        ),
+    },
+}
+
+
+def response_body(device_type: int, request_body: bytes) -> bytes:
+    """Canned body answering a request body, or its body type zero filled."""
+    body_type = request_body[0] if request_body else ListTypes.X00
+    canned = RESPONSES.get(DeviceType(device_type), {})
+    if body_type in canned:
+        return canned[body_type]
+    return bytes([body_type]) + bytes(DEFAULT_BODY_LENGTH)
+
+
+def response_frame(
+    device_type: int,
+    protocol_version: int,
+    message_type: int,
+    body: bytes,
+) -> bytearray:
+    """Serialize a response frame."""
+    return MessageQuestCustom(
+        DeviceType(device_type),
+        protocol_version,
+        MessageType(message_type),
+        bytearray(body),
+    ).serialize()
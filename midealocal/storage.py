@@ -0,0 +1,136 @@
+"""Midea local files."""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any
+
+from Crypto.Cipher import AES
+from Crypto.Random import get_random_bytes
+
+SECRET_LENGTH = 32
+SECRET_SUFFIX = ".secret"  # noqa: S105
+
+
+def write_text_atomic(path: Path, text: str) -> None:
+    """Write text to a file, replacing it at once.
+
+    The text is written to a temporary file of the same directory first,
+    readers never see a partial file. Raises OSError.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        Path(tmp).replace(path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def write_json_atomic(path: Path, data: Any) -> None:  # noqa: ANN401
+    """Write JSON data to a file, replacing it at once. Raises OSError."""
+    write_text_atomic(path, json.dumps(data))
+
+
+def load_secret(path: Path, length: int = SECRET_LENGTH) -> bytes:
+    """Read a secret file, created with random bytes only readable by its owner.
+
+    Raises OSError, or ValueError when the secret has another length.
+    """
+    try:
+        secret = path.read_bytes()
+    except FileNotFoundError:
+        secret = get_random_bytes(length)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(secret)
+    if len(secret) != length:
+        raise ValueError(f"secret must be {length} bytes")
+    return secret
+
+
+def write_json_encrypted(path: Path, data: Any, secret: bytes, version: int) -> None:  # noqa: ANN401
+    """Write JSON data encrypted with AES-GCM, replacing the file at once.
+
+    Raises OSError.
+    """
+    cipher = AES.new(secret, AES.MODE_GCM)
+    encrypted, tag = cipher.encrypt_and_digest(json.dumps(data).encode("utf-8"))
+    write_json_atomic(
+        path,
+        {
+            "version": version,
+            "nonce": cipher.nonce.hex(),
+            "data": encrypted.hex(),
+            "tag": tag.hex(),
+        },
+    )
+
+
+def read_json_encrypted(path: Path, secret: bytes, version: int) -> Any:  # noqa: ANN401
+    """Read JSON data written by ``write_json_encrypted``.
+
+    Raises OSError, or ValueError when the file is invalid, of another
+    version or encrypted with another secret.
+    """
+    with path.open(encoding="utf-8") as f:
+        data = json.load(f)
+    file_version = data.get("version") if isinstance(data, dict) else None
+    if file_version != version:
+        raise ValueError(f"unsupported version {file_version}")
+    try:
+        cipher = AES.new(secret, AES.MODE_GCM, nonce=bytes.fromhex(data["nonce"]))
+        plain = cipher.decrypt_and_verify(
+            bytes.fromhex(data["data"]),
+            bytes.fromhex(data["tag"]),
+        )
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"invalid encrypted file: {e}") from e
+    return json.loads(plain)
+
+
+class EncryptedJsonFile:
+    """JSON file encrypted with AES-GCM, by a secret kept next to it.
+
+    Without a ``secret``, a random one is kept in the file of the same name
+    with ``SECRET_SUFFIX``, only readable by its owner, so a copy of the
+    file alone does not leak its content. That secret file is created on
+    the first write.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        version: int,
+        secret: bytes | None = None,
+    ) -> None:
+        """Initialize encrypted JSON file."""
+        self.path = path
+        self.secret_path = path.with_name(path.name + SECRET_SUFFIX)
+        self._version = version
+        self._secret = secret
+
+    def _load_secret(self) -> bytes:
+        if self._secret is None:
+            self._secret = load_secret(self.secret_path)
+        if len(self._secret) != SECRET_LENGTH:
+            raise ValueError(f"secret must be {SECRET_LENGTH} bytes")
+        return self._secret
+
+    def read(self) -> Any:  # noqa: ANN401
+        """Read the data of the file.
+
+        Raises FileNotFoundError without file, other OSError, or ValueError
+        as ``read_json_encrypted``.
+        """
+        if not self.path.exists():
+            raise FileNotFoundError(self.path)
+        return read_json_encrypted(self.path, self._load_secret(), self._version)
+
+    def write(self, data: Any) -> None:  # noqa: ANN401
+        """Write data to the file. Raises OSError or ValueError."""
+        write_json_encrypted(self.path, data, self._load_secret(), self._version)
@@ -0,0 +1,286 @@
+"""Midea Local asyncio device test."""
+
+import asyncio
+import tempfile
+import time
+from hashlib import sha256
+from pathlib import Path
+from typing import Any
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from midealocal.async_device import AsyncMideaDevice
+from midealocal.capabilities import DEFAULT_TTL, CapabilityCache
+from midealocal.cloud import DEFAULT_KEYS
+from midealocal.const import DeviceType, ProtocolVersion
+from midealocal.device import MideaDevice, NoSupportedProtocol
+from midealocal.message import ListTypes, MessageQuestCustom, MessageType
+from midealocal.packet_builder import PacketBuilder
+from midealocal.security import (
+    MSGTYPE_ENCRYPTED_RESPONSE,
+    MSGTYPE_HANDSHAKE_RESPONSE,
+    LocalSecurity,
+)
+from midealocal.simulator import Simulator, VirtualAppliance
+
+from .device_test import _simulated_ac
+
+APPLIANCE_RESPONSE = bytearray(
+    [0xAA, 0x1E, 0xAC, 0x00, 0x00, 0x00, 0x00, 0x00, 0x03, 0xA0] + [0x00] * 19 + [0x00],
+)
+STATUS_RESPONSE = bytearray(
+    [
+        0xAA,
+        0x0E,
+        0xAC,
+        0x00,
+        0x00,
+        0x00,
+        0x00,
+        0x00,
+        0x03,
+        0x03,
+        0xC0,
+        0x01,
+        0x00,
+        0x00,
+    ],
+)
+
+
+class _TestDevice(MideaDevice):
+    """Minimal device answering to a single query."""
+
+    def build_query(self) -> list:
+        return [
+            MessageQuestCustom(
+                self.device_type,
+                self._message_protocol_version,
+                MessageType.query,
+                bytearray([ListTypes.X41]),
+            ),
+        ]
+
+    def process_message(self, msg: bytes) -> dict[str, Any]:
+        self._attributes["power"] = bool(msg[11])
+        return {"power": self._attributes["power"]}
+
+
+class _FakeAppliance(asyncio.Protocol):
+    """Fake appliance answering the V2 and V3 protocol."""
+
+    def __init__(self, key: bytes) -> None:
+        self._key = key
+        self._security = LocalSecurity()
+        self._transport: asyncio.Transport | None = None
+        self.authenticated = False
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        assert isinstance(transport, asyncio.Transport)
+        self._transport = transport
+
+    def _reply(self, packet: bytes) -> None:
+        assert self._transport is not None
+        if self.authenticated:
+            packet = self._security.encode_8370(packet, MSGTYPE_ENCRYPTED_RESPONSE)
+        self._transport.write(packet)
+
+    def data_received(self, data: bytes) -> None:
+        if data[:2] == b"\x83\x70" and not self.authenticated:
+            plain = bytes(range(32))
+            payload = (
+                self._security.aes_cbc_encrypt(plain, self._key)
+                + sha256(plain).digest()
+            )
+            self._security.tcp_key(payload, self._key)
+            handshake = self._security.encode_8370(payload, MSGTYPE_HANDSHAKE_RESPONSE)
+            assert self._transport is not None
+            self._transport.write(handshake)
+            self.authenticated = True
+            return
+        if self.authenticated:
+            packets, _ = self._security.decode_8370(data)
+            data = packets[0]
+        if data[2:4] != b"\x01\x11":
+            return  # heartbeat
+        command = self._security.aes_decrypt(data[40:-16])
+        response = (
+            APPLIANCE_RESPONSE
+            if command[9] == MessageType.query_appliance
+            else STATUS_RESPONSE
+        )
+        self._reply(PacketBuilder(1, response).finalize())
+
+
+class AsyncMideaDeviceTest(IsolatedAsyncioTestCase):
+    """Asyncio device test case."""
+
+    async def _serve(self, protocol: ProtocolVersion) -> AsyncMideaDevice:
+        key = bytes.fromhex(DEFAULT_KEYS[99]["key"])
+        server = await asyncio.get_running_loop().create_server(
+            lambda: _FakeAppliance(key),
+            "127.0.0.1",
+            0,
+        )
+        self.addAsyncCleanup(server.wait_closed)
+        self.addCleanup(server.close)
+        port = server.sockets[0].getsockname()[1]
+        device = _TestDevice(
+            name="Test Device",
+            device_id=1,
+            device_type=DeviceType.AC,
+            ip_address="127.0.0.1",
+            port=port,
+            token=DEFAULT_KEYS[99]["token"],
+            key=DEFAULT_KEYS[99]["key"],
+            device_protocol=protocol,
+            model="test_model",
+            subtype=1,
+            attributes={"power": False},
+        )
+        return AsyncMideaDevice(device)
+
+    async def test_connect_v2(self) -> None:
+        """Test connect and refresh over a V2 transport."""
+        async_device = await self._serve(ProtocolVersion.V2)
+        update = MagicMock()
+        async_device.register_update(update)
+        assert await async_device.connect(check_protocol=True) is True
+        assert async_device.available is True
+        assert async_device.device._message_protocol_version == 3
+        assert async_device.device.attributes["power"] is True
+        update.assert_any_call({"power": True})
+        await async_device.close()
+        assert async_device.device._socket is None
+
+    async def test_connect_v3(self) -> None:
+        """Test connect, authenticate and refresh over a V3 transport."""
+        async_device = await self._serve(ProtocolVersion.V3)
+        assert await async_device.connect(check_protocol=True) is True
+        assert async_device.device.attributes["power"] is True
+        await async_device.close()
+
+    async def test_connect_capability_cache(self) -> None:
+        """Test the protocol check results are cached and reused."""
+        async_device = await self._serve(ProtocolVersion.V2)
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        cache = CapabilityCache(Path(directory) / "capabilities.json")
+        async_device.device.set_capability_cache(cache)
+        assert await async_device.connect(check_protocol=True) is True
+        assert cache.get(1, "test_model", 1, ProtocolVersion.V2) is not None
+        await async_device.close()
+        async_device.device._attributes["power"] = False
+        with patch.object(async_device, "refresh_status") as refresh_status:
+            assert await async_device.connect(check_protocol=True) is True
+            for _ in range(50):
+                if async_device.device.attributes["power"]:
+                    break
+                await asyncio.sleep(0.02)
+        refresh_status.assert_not_called()
+        assert async_device.device.attributes["power"] is True
+        await async_device.close()
+
+        # an entry expired while the device was running is probed again
+        with (
+            patch(
+                "midealocal.capabilities.time.time",
+                return_value=time.time() + DEFAULT_TTL,
+            ),
+            patch.object(async_device, "refresh_status") as refresh_status,
+        ):
+            assert await async_device.connect(check_protocol=True) is True
+        refresh_status.assert_awaited_once_with(check_protocol=True)
+        await async_device.close()
+
+    async def test_connect_metrics(self) -> None:
+        """Test connects record the connect and authentication metrics."""
+        async_device = await self._serve(ProtocolVersion.V3)
+        metrics = async_device.device.enable_metrics()
+        for _ in range(2):
+            assert await async_device.connect(check_protocol=True) is True
+            await async_device.close()
+        async_device.device._port = 1
+        assert await async_device.connect(check_protocol=True) is False
+        snapshot = metrics.snapshot()
+        assert snapshot["connects"] == 2
+        assert snapshot["connect_errors"] == 1
+        assert snapshot["reconnects"] == 2
+        assert snapshot["connect"]["count"] == 2
+        assert snapshot["auth"]["count"] == 2
+
+    async def test_connect_refused(self) -> None:
+        """Test connect to a closed port."""
+        async_device = await self._serve(ProtocolVersion.V2)
+        async_device.device._port = 1
+        assert await async_device.connect(check_protocol=True) is False
+        assert async_device.available is False
+
+    async def test_unsupported_query(self) -> None:
+        """Test unanswered queries are marked as unsupported."""
+        async_device = await self._serve(ProtocolVersion.V2)
+        async_device.device._appliance_query = False
+        assert await async_device.connect() is True
+        with (
+            patch.object(async_device.device, "build_send"),
+            patch("midealocal.async_device.QUERY_TIMEOUT", 0.05),
+            pytest.raises(NoSupportedProtocol),
+        ):
+            await async_device.refresh_status(check_protocol=True)
+        assert async_device.device._unsupported_protocol == ["MessageQuestCustom"]
+        await async_device.close()
+
+    async def test_connect_pipelined(self) -> None:
+        """Test the pipelined protocol check over a transport."""
+        simulator = Simulator()
+        self.addCleanup(simulator.close)
+        appliance = simulator.add_appliance(VirtualAppliance(1))
+        async_device = AsyncMideaDevice(_simulated_ac(appliance))
+        assert await async_device.connect(check_protocol=True) is True
+        assert async_device.device._unsupported_protocol == []
+        assert async_device.device._inflight is None
+        assert async_device.device.attributes["target_temperature"] == 24.0
+        await async_device.close()
+
+        appliance.unanswered = frozenset([ListTypes.X41])
+        with patch("midealocal.async_device.QUERY_TIMEOUT", 0.2):
+            assert await async_device.connect(check_protocol=True) is True
+        assert async_device.device._unsupported_protocol == [
+            "MessageQuery",
+            "MessagePowerQuery",
+        ]
+        await async_device.close()
+
+    async def test_unsupported_query_pipelined(self) -> None:
+        """Test unanswered pipelined queries are marked as unsupported."""
+        async_device = await self._serve(ProtocolVersion.V2)
+        async_device.device._appliance_query = False
+        async_device.device.set_pipelined_refresh()
+        assert await async_device.connect() is True
+        with (
+            patch.object(async_device.device, "build_send") as build_send,
+            patch("midealocal.async_device.QUERY_TIMEOUT", 0.05),
+            pytest.raises(NoSupportedProtocol),
+        ):
+            await async_device.refresh_status(check_protocol=True)
+        build_send.assert_called_once()
+        assert async_device.device._unsupported_protocol == ["MessageQuestCustom"]
+        await async_device.close()
+
+    async def test_open_and_close(self) -> None:
+        """Test the background task connects and sends queries."""
+        async_device = await self._serve(ProtocolVersion.V2)
+        update = MagicMock()
+        async_device.register_update(update)
+        await async_device.open()
+        for _ in range(50):
+            if async_device.available:
+                break
+            await asyncio.sleep(0.02)
+        assert async_device.available is True
+        assert async_device.connected is True
+        async_device.device.send_heartbeat()
+        update.assert_any_call({"available": True})
+        await async_device.close()
+        assert async_device.connected is False
@@ -0,0 +1,99 @@
+"""Midea Local receive buffer test."""
+
+import socket
+from hashlib import sha256
+
+from midealocal.buffer import ReceiveBuffer
+from midealocal.cloud import DEFAULT_KEYS
+from midealocal.device import MideaDevice
+from midealocal.security import MSGTYPE_ENCRYPTED_RESPONSE, LocalSecurity
+
+
+def test_append_and_consume() -> None:
+    """Test data is appended and consumed without resizing."""
+    buffer = ReceiveBuffer(8)
+    buffer.append(b"")
+    assert len(buffer) == 0
+    buffer.append(b"\x01\x02\x03\x04\x05")
+    with buffer.view() as view:
+        assert bytes(view) == b"\x01\x02\x03\x04\x05"
+    buffer.consume(3)
+    assert len(buffer) == 2
+    assert buffer.hex() == "0405"
+    # compacts the unread tail instead of growing
+    buffer.append(b"\x06\x07\x08\x09\x0a")
+    with buffer.view() as view:
+        assert bytes(view) == b"\x04\x05\x06\x07\x08\x09\x0a"
+    buffer.consume(100)
+    assert len(buffer) == 0
+
+
+def test_grow() -> None:
+    """Test the buffer grows for data larger than its size."""
+    buffer = ReceiveBuffer(4)
+    buffer.append(b"\x00" * 3)
+    buffer.append(b"\x01" * 10)
+    assert len(buffer) == 13
+    with buffer.view() as view:
+        assert bytes(view) == b"\x00" * 3 + b"\x01" * 10
+    buffer.clear()
+    assert len(buffer) == 0
+
+
+def test_recv_into() -> None:
+    """Test data is received from the socket into the buffer."""
+    reader, writer = socket.socketpair()
+    with reader, writer:
+        buffer = ReceiveBuffer(4)
+        buffer.append(b"\xff")
+        writer.sendall(b"\x01\x02\x03\x04\x05\x06")
+        received = 0
+        while received < 6:
+            received += buffer.recv_into(reader, 16)
+        with buffer.view() as view:
+            assert bytes(view) == b"\xff\x01\x02\x03\x04\x05\x06"
+        writer.close()
+        assert buffer.recv_into(reader, 16) == 0
+
+
+def test_fetch_v2_message_view() -> None:
+    """Test V2 messages are copied out of a view and the leftover is a view."""
+    frame = bytes([0x5A, 0x5A, 0x01, 0x11, 0x08, 0x00, 0x01, 0x02])
+    buffer = ReceiveBuffer()
+    buffer.append(frame * 3 + frame[:5])
+    with buffer.view() as view:
+        messages, leftover = MideaDevice.fetch_v2_message(view)
+        assert messages == [frame] * 3
+        assert all(isinstance(message, bytes) for message in messages)
+        assert isinstance(leftover, memoryview)
+        assert leftover == frame[:5]
+        buffer.consume(len(view) - len(leftover))
+    del leftover
+    buffer.append(frame[5:])
+    with buffer.view() as view:
+        messages, _ = MideaDevice.fetch_v2_message(view)
+    assert messages == [frame]
+
+
+def test_decode_8370_view() -> None:
+    """Test 8370 frames are decoded from a view of the buffer."""
+    key = bytes.fromhex(DEFAULT_KEYS[99]["key"])
+    security = LocalSecurity()
+    plain = bytes(range(32))
+    security.tcp_key(
+        security.aes_cbc_encrypt(plain, key) + sha256(plain).digest(),
+        key,
+    )
+    frame = security.encode_8370(b"\x5a\x5a\x01\x11", MSGTYPE_ENCRYPTED_RESPONSE)
+    buffer = ReceiveBuffer()
+    buffer.append(frame * 2 + frame[:10])
+    with buffer.view() as view:
+        messages, leftover = security.decode_8370(view)
+        assert messages == [b"\x5a\x5a\x01\x11"] * 2
+        assert leftover == frame[:10]
+        buffer.consume(len(view) - len(leftover))
+    del leftover
+    buffer.append(frame[10:])
+    with buffer.view() as view:
+        messages, _ = security.decode_8370(view)
+    assert messages == [b"\x5a\x5a\x01\x11"]
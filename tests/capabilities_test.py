@@ -0,0 +1,124 @@
+"""Midea local capability cache test."""
+
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from midealocal.capabilities import CapabilityCache, DeviceCapabilities
+from midealocal.cloud import DEFAULT_KEYS
+from midealocal.device import MideaDevice
+from midealocal.devices.ac import MideaACDevice
+from midealocal.message import ListTypes
+from midealocal.simulator import Simulator, VirtualAppliance
+
+
+def test_cache_file(tmp_path: Path) -> None:
+    """Test capabilities are persisted and invalid files ignored."""
+    path = tmp_path / "cache" / "capabilities.json"
+    cache = CapabilityCache(path)
+    assert cache.get(1, "model", 0, 3) is None
+    cache.set(1, "model", 0, 3, DeviceCapabilities(3, ["MessageQuery"], [b"\xaa\xb5"]))
+    cache.set(2, "model", 0, 3, DeviceCapabilities(2))
+    cache.remove(2, "model", 0, 3)
+
+    entry = CapabilityCache(path).get(1, "model", 0, 3)
+    assert entry is not None
+    assert entry.protocol_version == 3
+    assert entry.unsupported == ["MessageQuery"]
+    assert entry.capabilities == [b"\xaa\xb5"]
+    assert CapabilityCache(path).get(2, "model", 0, 3) is None
+    assert CapabilityCache(path).get(1, "model", 1, 3) is None
+    assert CapabilityCache(path).get(1, "model", 0, 2) is None
+    assert list(path.parent.iterdir()) == [path]
+
+    path.write_text("{", encoding="utf-8")
+    assert CapabilityCache(path).get(1, "model", 0, 3) is None
+    path.write_text('{"version": 0, "devices": {}}', encoding="utf-8")
+    assert CapabilityCache(path).get(1, "model", 0, 3) is None
+
+
+def test_cache_save_and_ttl(tmp_path: Path) -> None:
+    """Test deferred saves and expired entries."""
+    path = tmp_path / "capabilities.json"
+    cache = CapabilityCache(path, ttl=60)
+    cache.set(1, "model", 0, 3, DeviceCapabilities(3), save=False)
+    assert not path.exists()
+    assert cache.get(1, "model", 0, 3) is not None
+    cache.save()
+    assert CapabilityCache(path).get(1, "model", 0, 3) is not None
+
+    with patch("midealocal.capabilities.time.time", return_value=time.time() + 60):
+        assert cache.get(1, "model", 0, 3) is None
+        assert CapabilityCache(path, ttl=120).get(1, "model", 0, 3) is not None
+
+
+def _device(appliance: VirtualAppliance) -> MideaACDevice:
+    return MideaACDevice(
+        name="Simulated AC",
+        device_id=appliance.device_id,
+        ip_address=appliance.host,
+        port=appliance.port,
+        token=DEFAULT_KEYS[99]["token"],
+        key=DEFAULT_KEYS[99]["key"],
+        device_protocol=appliance.protocol,
+        model="test_model",
+        subtype=0,
+        customize="",
+    )
+
+
+def _receive_capabilities(device: MideaACDevice) -> None:
+    assert device._socket is not None
+    device._socket.settimeout(2)
+    while device._capability_queries:
+        device.parse_message(device._socket.recv(512))
+
+
+def test_device_cache(tmp_path: Path) -> None:
+    """Test a cached device skips the protocol check."""
+    path = tmp_path / "capabilities.json"
+    simulator = Simulator()
+    appliance = simulator.add_appliance(
+        VirtualAppliance(1, unanswered=[ListTypes.B1]),
+    )
+    with patch("midealocal.device.QUERY_TIMEOUT", 0.2):
+        device = _device(appliance)
+        device.set_capability_cache(CapabilityCache(path))
+        assert device.connect(check_protocol=True) is True
+        assert not path.exists()
+        _receive_capabilities(device)
+        assert path.exists()
+        device.close_socket()
+    assert device._unsupported_protocol == ["MessageNewProtocolQuery"]
+
+    # a restart, the devices load the cache when created
+    with patch.object(MideaDevice, "default_capability_cache", CapabilityCache(path)):
+        device = _device(appliance)
+    assert device._unsupported_protocol == ["MessageNewProtocolQuery"]
+    assert device._message_protocol_version == appliance.message_protocol_version
+    with (
+        patch.object(device, "_check_response") as check_response,
+        patch.object(device, "get_capabilities") as get_capabilities,
+        patch.object(device, "process_message", return_value={}) as process_message,
+    ):
+        assert device.connect(check_protocol=True) is True
+    check_response.assert_not_called()
+    get_capabilities.assert_not_called()
+    assert [call.args[0][10] for call in process_message.call_args_list] == [
+        ListTypes.B5,
+        ListTypes.B5,
+    ]
+    device.close_socket()
+    assert device._unsupported_protocol == ["MessageNewProtocolQuery"]
+
+    # an appliance with another protocol version invalidates the cache
+    appliance.message_protocol_version = 2
+    assert device.connect(check_protocol=True) is True
+    assert device._socket is not None
+    device._socket.settimeout(2)
+    while device._appliance_query:
+        device.parse_message(device._socket.recv(512))
+    simulator.close()
+    assert device._capabilities is None
+    assert device._unsupported_protocol == []
+    assert CapabilityCache(path).get(1, "test_model", 0, 3) is None
@@ -4,7 +4,10 @@ import json
 import logging
 import subprocess
 import sys
+import tempfile
+import time
 from argparse import Namespace
+from collections.abc import AsyncIterator
 from pathlib import Path
 from unittest import IsolatedAsyncioTestCase
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -13,10 +16,12 @@ from midealocal.cli import (
     MideaCLI,
     get_config_file_path,
 )
-from midealocal.cloud import SmartHomeCloud
-from midealocal.const import ProtocolVersion
-from midealocal.device import AuthException, NoSupportedProtocol
+from midealocal.cloud import DEFAULT_KEYS, SmartHomeCloud
+from midealocal.const import DeviceType, ProtocolVersion
+from midealocal.device import NoSupportedProtocol
 from midealocal.exceptions import SocketException
+from midealocal.keystore import KeyStore
+from midealocal.simulator import Simulator, VirtualAppliance
 
 
 class TestMideaCLI(IsolatedAsyncioTestCase):
@@ -55,14 +60,27 @@ class TestMideaCLI(IsolatedAsyncioTestCase):
         assert cloud._password == self.namespace.password
         assert cloud._session == mock_session_instance
 
+        assert cloud._session_store is None
+        assert cloud._lua_cache is None
+
         self.namespace.cloud_name = None
-        cloud = await self.cli._get_cloud()
+        with tempfile.TemporaryDirectory() as tmp:
+            self.namespace.cloud_session = Path(tmp) / "cloud_session.json"
+            self.namespace.lua_cache = Path(tmp) / "lua"
+            cloud = await self.cli._get_cloud()
         assert isinstance(cloud, SmartHomeCloud)
         assert cloud._session == mock_session_instance
+        assert cloud._session_store is not None
+        assert cloud._session_store.path == self.namespace.cloud_session
+        assert cloud._lua_cache is not None
+        assert cloud._lua_cache.path == self.namespace.lua_cache
 
     async def test_get_keys(self) -> None:
         """Test get keys."""
-        mock_cloud = AsyncMock()
+        mock_cloud = AsyncMock(
+            set_session_store=MagicMock(),
+            set_lua_cache=MagicMock(),
+        )
         with (
             patch("midealocal.cli.get_midea_cloud", return_value=mock_cloud),
             patch.object(
@@ -100,6 +118,29 @@ class TestMideaCLI(IsolatedAsyncioTestCase):
             mock_default_keys.assert_called_once()
             mock_cloud_keys.assert_not_called()
 
+    async def test_get_keys_many(self) -> None:
+        """Test get keys of many devices with a single login."""
+        mock_cloud = AsyncMock(
+            set_session_store=MagicMock(),
+            set_lua_cache=MagicMock(),
+        )
+        default_keys = {99: {"key": "key99", "token": "token99"}}
+        mock_cloud.get_default_keys.return_value = default_keys
+        mock_cloud.get_cloud_keys_many.return_value = {
+            1: {1: {"key": "key1", "token": "token1"}},
+        }
+        mock_cloud.login.side_effect = [True, False]
+        with patch("midealocal.cli.get_midea_cloud", return_value=mock_cloud):
+            assert await self.cli._get_keys_many([]) == {}
+            keys = await self.cli._get_keys_many([1, 2])
+            assert keys == {
+                1: {1: {"key": "key1", "token": "token1"}, **default_keys},
+                2: default_keys,
+            }
+            mock_cloud.get_cloud_keys_many.assert_called_once_with([1, 2])
+            assert await self.cli._get_keys_many([1]) == {1: default_keys}
+        assert mock_cloud.login.call_count == 2
+
     async def test_discover(self) -> None:
         """Test discover."""
         mock_device = {
@@ -113,7 +154,6 @@ class TestMideaCLI(IsolatedAsyncioTestCase):
         }
         mock_cloud_instance = AsyncMock()
         mock_device_instance = MagicMock()
-        mock_device_instance.connect.return_value = True
         with (
             patch(
                 "midealocal.cli.discover",
@@ -129,46 +169,172 @@ class TestMideaCLI(IsolatedAsyncioTestCase):
             ),
             patch.object(
                 mock_device_instance,
-                "authenticate",
-                side_effect=[None, None, AuthException, SocketException],
-            ) as authenticate_mock,
+                "connect",
+                side_effect=[True, False, False, True, True, False],
+            ) as connect_mock,
             patch.object(
                 mock_device_instance,
                 "refresh_status",
-                side_effect=[None, None, NoSupportedProtocol, None],
+                side_effect=[None, SocketException, NoSupportedProtocol],
             ) as refresh_status_mock,
         ):
             mock_discover.return_value = {1: mock_device}
-            mock_cloud_instance.get_cloud_keys.return_value = {
-                0: {"token": "token", "key": "key"},
+            mock_cloud_instance.get_cloud_keys_many.return_value = {
+                1: {0: {"token": "token", "key": "key"}},
             }
             mock_cloud_instance.get_default_keys.return_value = {
                 99: {"token": "token", "key": "key"},
             }
 
-            await self.cli.discover()  # V3 device
-            authenticate_mock.assert_called()
-            refresh_status_mock.assert_called_with(True)
-            authenticate_mock.reset_mock()
+            # V3 device, connected with the first key
+            assert await self.cli.discover() == [mock_device_instance]
+            refresh_status_mock.assert_called_once_with(True)
+            mock_device_instance.authenticate.assert_not_called()
             refresh_status_mock.reset_mock()
 
-            await self.cli.discover()  # V3 device AuthException
+            # V3 device rejecting both keys
+            assert await self.cli.discover() == []
+            assert connect_mock.call_count == 3
             refresh_status_mock.assert_not_called()
-            authenticate_mock.assert_called()
-            authenticate_mock.reset_mock()
 
             mock_device["protocol"] = ProtocolVersion.V2
-            await self.cli.discover()  # V2 device NoSupportedProtocol
-            authenticate_mock.assert_not_called()
-            refresh_status_mock.assert_called_once()
+            # V2 device socket closed, then NoSupportedProtocol
+            assert await self.cli.discover() == []
+            assert await self.cli.discover() == []
+            assert refresh_status_mock.call_count == 2
 
-            mock_device_instance.connect.return_value = False
-            await self.cli.discover()  # connect failed
+            # connect failed
+            assert await self.cli.discover() == []
+            assert connect_mock.call_count == 6
 
             mock_discover.return_value = {}
 
             await self.cli.discover()  # No devices
 
+    async def test_discover_network(self) -> None:
+        """Test discover sweeping CIDR ranges."""
+
+        async def sweep(_networks: list[str]) -> AsyncIterator[dict]:
+            devices: tuple[dict, ...] = ()
+            for device in devices:
+                yield device
+
+        self.namespace.network = ["192.168.1.0/24"]
+        with (
+            patch("midealocal.cli.discover") as mock_discover,
+            patch(
+                "midealocal.cli.async_discover_sweep",
+                side_effect=sweep,
+            ) as mock_sweep,
+        ):
+            assert await self.cli.discover() == []
+        mock_sweep.assert_called_once_with(["192.168.1.0/24"])
+        mock_discover.assert_not_called()
+
+    async def test_discover_cache(self) -> None:
+        """Test devices looked up by host are reused from the cache."""
+        device = {
+            "device_id": 1,
+            "protocol": ProtocolVersion.V2,
+            "type": 0xAC,
+            "ip_address": self.namespace.host,
+            "port": 6444,
+            "model": "AC123",
+            "sn": "AC123",
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            self.namespace.discovery_cache = Path(tmp) / "discovery.json"
+            with patch("midealocal.cli.discover", return_value={1: device}) as mock:
+                assert await self.cli._discover(self.namespace.host) == {1: device}
+                mock.assert_called_once_with(ip_address=self.namespace.host)
+                mock.reset_mock()
+
+                devices = await self.cli._discover(self.namespace.host)
+                assert devices[1]["port"] == device["port"]
+                mock.assert_not_called()
+
+                with patch(
+                    "midealocal.discovery_cache.time.time",
+                    return_value=time.time() + 86400,
+                ):
+                    with patch(
+                        "midealocal.discovery_cache.async_discover_iter",
+                        side_effect=self._no_devices,
+                    ) as mock_probe:
+                        await self.cli._discover(self.namespace.host)
+                    mock_probe.assert_called_once()
+                mock.assert_called_once_with(ip_address=self.namespace.host)
+
+    async def test_discover_key_store(self) -> None:
+        """Test stored keys are used before the cloud and renewed once rejected."""
+        simulator = Simulator()
+        appliance = simulator.add_appliance(VirtualAppliance(1))
+        device = {
+            "device_id": 1,
+            "protocol": ProtocolVersion.V3,
+            "type": DeviceType.AC,
+            "ip_address": "127.0.0.1",
+            "port": appliance.port,
+            "model": "00000Q11",
+            "sn": "000000P0000000Q1",
+        }
+        bad_key = {"token": DEFAULT_KEYS[99]["token"], "key": "00" * 32}
+        bad_token = {"token": "00" * 64, "key": DEFAULT_KEYS[99]["key"]}
+        cloud_keys = {1: {0: bad_key, 1: dict(DEFAULT_KEYS[99])}}
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            patch("midealocal.cli.discover", return_value={1: device}),
+            patch.object(
+                self.cli,
+                "_get_keys_many",
+                AsyncMock(return_value=cloud_keys),
+            ) as mock_keys,
+        ):
+            self.namespace.key_store = Path(tmp) / "keys.json"
+            try:
+                devices = await self.cli.discover()
+                assert [dev.device_id for dev in devices] == [1]
+                devices[0].close_socket()
+                mock_keys.assert_awaited_once_with([1])
+                store = KeyStore(self.namespace.key_store)
+                assert store.working(1) == 1
+
+                # the working key is tried first, without the cloud
+                mock_keys.reset_mock()
+                authentications = appliance.authentications
+                devices = await self.cli.discover()
+                assert [dev.device_id for dev in devices] == [1]
+                devices[0].close_socket()
+                mock_keys.assert_not_awaited()
+                assert appliance.authentications == authentications + 1
+
+                # the appliance was reset, the stored keys are fetched again
+                appliance.token = bytes.fromhex(bad_token["token"])
+                cloud_keys[1] = {0: bad_token}
+                devices = await self.cli.discover()
+                assert [dev.device_id for dev in devices] == [1]
+                devices[0].close_socket()
+                mock_keys.assert_awaited_once_with([1])
+                store = KeyStore(self.namespace.key_store)
+                assert store.get(1) == {0: bad_token}
+                assert store.working(1) == 0
+
+                # an unreachable appliance keeps its stored keys
+                simulator.close()
+                mock_keys.reset_mock()
+                assert await self.cli.discover() == []
+                mock_keys.assert_not_awaited()
+                store = KeyStore(self.namespace.key_store)
+                assert store.get(1) == {0: bad_token}
+            finally:
+                simulator.close()
+
+    @staticmethod
+    async def _no_devices(**_kwargs: object) -> AsyncIterator[dict]:
+        devices: tuple[dict, ...] = ()
+        for device in devices:
+            yield device
+
     def test_message(self) -> None:
         """Test message."""
         mock_device_instance = MagicMock()
@@ -1,25 +1,35 @@
 """Test cloud."""
 
+import asyncio
+import json
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
 from pathlib import Path
 from tempfile import TemporaryDirectory
 from typing import ClassVar
 from unittest import IsolatedAsyncioTestCase
-from unittest.mock import AsyncMock, Mock
+from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
-from aiohttp import ClientConnectionError
+from aiohttp import ClientConnectionError, ClientSession, test_utils, web
 
 from midealocal.cloud import (
+    API_BACKOFF,
+    API_BACKOFF_MAX,
     DEFAULT_KEYS,
     MeijuCloud,
     MideaAirCloud,
     MideaCloud,
     SmartHomeCloud,
+    _backoff_delay,
+    get_cloud_connector,
     get_default_cloud,
     get_midea_cloud,
     get_preset_account_cloud,
 )
+from midealocal.cloud_session import CloudSessionStore
 from midealocal.exceptions import ElementMissing
+from midealocal.lua_cache import LuaCache
 
 
 class CloudTest(IsolatedAsyncioTestCase):
@@ -129,6 +139,62 @@ class CloudTest(IsolatedAsyncioTestCase):
         assert cloud is not None
         assert not await cloud.login()
 
+    async def test_get_cloud_keys_many(self) -> None:
+        """Test keys of many appliances are requested concurrently, once each."""
+        in_flight = 0
+        max_in_flight = 0
+        udp_ids: list[str] = []
+
+        async def request(*_args: object, data: str, **_kwargs: object) -> Mock:
+            nonlocal in_flight, max_in_flight
+            udp_id = json.loads(data)["udpid"]
+            udp_ids.append(udp_id)
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            tokens = [{"udpId": udp_id, "token": f"T{udp_id}", "key": f"K{udp_id}"}]
+            if udp_id.startswith("0"):
+                tokens = []
+            response = Mock()
+            response.read = AsyncMock(
+                return_value=json.dumps(
+                    {"code": 0, "data": {"tokenlist": tokens}},
+                ).encode(),
+            )
+            return response
+
+        session = Mock()
+        session.request = AsyncMock(side_effect=request)
+        cloud = get_midea_cloud(
+            "美的美居",
+            session=session,
+            account="account",
+            password="password",
+        )
+        assert cloud is not None
+        # the same udp id for both methods
+        palindrome = 0x010203030201
+        appliance_ids = [*range(1, 21), palindrome, 5]
+        keys = await cloud.get_cloud_keys_many(appliance_ids, concurrency=4)
+
+        assert max_in_flight == 4
+        assert len(udp_ids) == len(set(udp_ids)) == 41
+        assert set(keys) == {*range(1, 21), palindrome}
+        security = cloud._security
+        for appliance_id in (5, palindrome):
+            for method in (1, 2):
+                udp_id = security.get_udp_id(appliance_id, method)
+                assert udp_id is not None
+                if udp_id.startswith("0"):
+                    assert method not in keys[appliance_id]
+                else:
+                    assert keys[appliance_id][method] == {
+                        "token": f"t{udp_id}",
+                        "key": f"k{udp_id}",
+                    }
+        assert keys[palindrome][1] == keys[palindrome][2]
+
     async def test_meijucloud_get_keys(self) -> None:
         """Test MeijuCloud get_cloud_keys."""
         session = Mock()
@@ -700,3 +766,273 @@ class CloudTest(IsolatedAsyncioTestCase):
         assert cloud is not None
         with pytest.raises(NotImplementedError), TemporaryDirectory() as tmpdir:
             await cloud.download_lua(tmpdir, 10, "00000000", "0xAC", "0010")
+
+    async def test_session_store(self) -> None:
+        """Test a login is reused by another cloud client of the account."""
+        session = Mock()
+        response = Mock()
+        response.read = AsyncMock(
+            side_effect=[
+                self.responses["msmartcloud_reroute.json"],
+                self.responses["cloud_login_id.json"],
+                self.responses["msmartcloud_login.json"],
+                self.responses["cloud_invalid_response.json"],
+                self.responses["cloud_invalid_response.json"],
+            ],
+        )
+        session.request = AsyncMock(return_value=response)
+        with TemporaryDirectory() as tmpdir:
+            store = CloudSessionStore(Path(tmpdir, "session.json"))
+            cloud = get_midea_cloud(
+                "SmartHome",
+                session=session,
+                account="account",
+                password="password",
+            )
+            cloud.set_session_store(store)
+            assert await cloud.login()
+            assert session.request.call_count == 3
+
+            MideaCloud.default_session_store = CloudSessionStore(
+                Path(tmpdir, "session.json"),
+            )
+            try:
+                restored = get_midea_cloud(
+                    "SmartHome",
+                    session=session,
+                    account="account",
+                    password="password",
+                )
+            finally:
+                MideaCloud.default_session_store = None
+            assert await restored.login()
+            assert session.request.call_count == 3
+            assert restored._session_state() == cloud._session_state()
+
+            other = get_midea_cloud(
+                "SmartHome",
+                session=session,
+                account="other",
+                password="password",
+            )
+            other.set_session_store(store)
+            assert not await other.login()
+            assert store.get(other._session_name) is None
+
+    async def test_relogin(self) -> None:
+        """Test a rejected access token is renewed once, then the request sent."""
+        session = Mock()
+        response = Mock()
+        response.read = AsyncMock(
+            side_effect=[
+                self.responses["cloud_login_id.json"],
+                self.responses["meijucloud_login.json"],
+                b'{"code": 40002, "msg": "token expired"}',
+                self.responses["cloud_login_id.json"],
+                self.responses["meijucloud_login.json"],
+                self.responses["meijucloud_get_keys1.json"],
+                b'{"code": 40002, "msg": "token expired"}',
+                self.responses["cloud_invalid_response.json"],
+            ],
+        )
+        session.request = AsyncMock(return_value=response)
+        cloud = get_midea_cloud(
+            "美的美居",
+            session=session,
+            account="account",
+            password="password",
+        )
+        with TemporaryDirectory() as tmpdir:
+            store = CloudSessionStore(Path(tmpdir, "session.json"))
+            cloud.set_session_store(store)
+            assert await cloud.login()
+            token = await cloud._get_token("dec4da86e0aeefadde14a4e553680b9b")
+            assert token == {
+                "token": "method1_return_token1",
+                "key": "method1_return_key1",
+            }
+            assert session.request.call_count == 6
+            assert store.get(cloud._session_name) is not None
+
+            # the new login fails, the request is not sent again
+            assert await cloud._get_token("dec4da86e0aeefadde14a4e553680b9b") is None
+            assert session.request.call_count == 8
+            assert store.get(cloud._session_name) is None
+
+    async def _serve(
+        self,
+        handler: Callable[[web.Request], Awaitable[web.StreamResponse]],
+    ) -> AsyncIterator[MideaCloud]:
+        """Yield a Meiju cloud client of a local stand-in server."""
+        app = web.Application()
+        app.router.add_post("/proxy", handler)
+        async with (
+            test_utils.TestServer(app) as server,
+            ClientSession(connector=get_cloud_connector()) as session,
+        ):
+            cloud = get_midea_cloud(
+                "美的美居",
+                session=session,
+                account="account",
+                password="password",
+            )
+            cloud._api_url = f"http://{server.host}:{server.port}/proxy?alias="
+            yield cloud
+
+    async def test_api_retry(self) -> None:
+        """Test failed requests are retried after a backoff, within a timeout."""
+        attempts: list[str] = []
+
+        async def handler(request: web.Request) -> web.Response:
+            attempts.append(request.query["alias"])
+            if len(attempts) == 1:
+                return web.Response(status=502, text="Bad Gateway")
+            if len(attempts) == 2:
+                await asyncio.sleep(1)
+            return web.Response(body=self.responses["meijucloud_list_home.json"])
+
+        with (
+            patch("midealocal.cloud.API_BACKOFF", 0.01),
+            patch.dict(
+                "midealocal.cloud.ENDPOINT_TIMEOUTS",
+                {"/v1/homegroup/list/get": 0.2},
+            ),
+        ):
+            async for cloud in self._serve(handler):
+                assert await cloud.list_home() == {1: "Home 1", 2: "Home 2"}
+                assert attempts == ["/v1/homegroup/list/get"] * 3
+
+                attempts.clear()
+                with patch("midealocal.cloud.API_ATTEMPTS", 2):
+                    assert await cloud.list_home() is None
+                assert len(attempts) == 2
+
+    async def test_api_in_flight(self) -> None:
+        """Test identical requests in flight share a single response."""
+        requests = 0
+
+        async def handler(_request: web.Request) -> web.Response:
+            nonlocal requests
+            requests += 1
+            await asyncio.sleep(0.1)
+            return web.Response(body=self.responses["meijucloud_list_home.json"])
+
+        async for cloud in self._serve(handler):
+            homes = await asyncio.gather(*(cloud.list_home() for _ in range(5)))
+            assert requests == 1
+            assert all(home == {1: "Home 1", 2: "Home 2"} for home in homes)
+            assert cloud._in_flight == {}
+
+            await cloud.list_home()
+            assert requests == 2
+
+    async def test_download_lua_cache(self) -> None:
+        """Test a script is downloaded again only once the cloud changes it."""
+        lua_get = {"url": "returnedURL", "fileName": "T_0000_AC.lua", "md5": "abcd"}
+        session = Mock()
+        response = Mock()
+        response.read = AsyncMock(
+            side_effect=lambda: json.dumps({"code": 0, "data": lua_get}).encode(),
+        )
+        session.request = AsyncMock(return_value=response)
+        res = Mock()
+        res.status = 200
+        res.text = AsyncMock(return_value="9d52c159dcdd32bac5109cf54080fca7")
+        session.get = AsyncMock(return_value=res)
+        cloud = get_midea_cloud(
+            "美的美居",
+            session=session,
+            account="account",
+            password="password",
+        )
+        sn = "000000P0000000Q1ABCDEF12345678"
+        with TemporaryDirectory() as tmpdir:
+            cloud.set_lua_cache(LuaCache(Path(tmpdir, "cache")))
+            file = await cloud.download_lua(tmpdir, 0xAC, sn)
+            assert file == f"{tmpdir}/T_0000_AC.lua"
+            content = await asyncio.to_thread(Path(file).read_bytes)
+            assert await cloud.download_lua(tmpdir, 0xAC, sn) == file
+            assert session.get.call_count == 1
+
+            await asyncio.to_thread(Path(file).unlink)
+            assert await cloud.download_lua(tmpdir, 0xAC, sn) == file
+            assert await asyncio.to_thread(Path(file).read_bytes) == content
+            assert session.get.call_count == 1
+
+            lua_get["md5"] = "ef01"
+            assert await cloud.download_lua(tmpdir, 0xAC, sn) == file
+            assert session.get.call_count == 2
+
+    async def test_download_lua_many(self) -> None:
+        """Test scripts of many appliances are downloaded once per model."""
+        requested: list[str] = []
+
+        async def request(*_args: object, data: str, **_kwargs: object) -> Mock:
+            sn = json.loads(data)["applianceSn"]
+            requested.append(sn)
+            await asyncio.sleep(0.01)
+            response = Mock()
+            response.read = AsyncMock(
+                return_value=json.dumps(
+                    {
+                        "code": 0,
+                        "data": {"url": sn, "fileName": f"{sn[9:17]}.lua"},
+                    },
+                ).encode(),
+            )
+            return response
+
+        session = Mock()
+        session.request = AsyncMock(side_effect=request)
+        res = Mock()
+        res.status = 200
+        res.text = AsyncMock(return_value="9d52c159dcdd32bac5109cf54080fca7")
+        session.get = AsyncMock(return_value=res)
+        cloud = get_midea_cloud(
+            "美的美居",
+            session=session,
+            account="account",
+            password="password",
+        )
+        appliances = {
+            1: {"type": 0xAC, "sn": "000000P0000000Q1AAAAAAAA0001"},
+            2: {"type": 0xAC, "sn": "000000P0000000Q1AAAAAAAA0002"},
+            3: {"type": 0xAC, "sn": "000000P0000001Q1AAAAAAAA0003"},
+            4: {"type": 0xCC, "sn": "000000P0000000Q1AAAAAAAA0004"},
+        }
+        with TemporaryDirectory() as tmpdir:
+            files = await cloud.download_lua_many(tmpdir, appliances)
+        assert len(requested) == 3
+        assert files[1] == files[2] == f"{tmpdir}/00000Q1A.lua"
+        assert files[3] == f"{tmpdir}/00001Q1A.lua"
+        assert files[4] == f"{tmpdir}/00000Q1A.lua"
+
+
+def test_session_store_expiry(tmp_path: Path) -> None:
+    """Test sessions expire after the TTL and invalid stores are ignored."""
+    path = tmp_path / "session.json"
+    store = CloudSessionStore(path, ttl=60)
+    assert not path.with_name("session.json.secret").exists()
+    store.set("1010:account", {"access_token": "secret-token"})
+    store.set("1010:other", {"access_token": "secret-token"})
+    store.remove("1010:other")
+    assert "secret-token" not in path.read_text(encoding="utf-8")
+    assert CloudSessionStore(path).get("1010:account") == {
+        "access_token": "secret-token",
+    }
+    assert store.get("1010:other") is None
+    with patch("midealocal.cloud_session.time.time", return_value=time.time() + 61):
+        assert store.get("1010:account") is None
+        assert CloudSessionStore(path).get("1010:account") is None
+
+    path.write_text("{", encoding="utf-8")
+    assert CloudSessionStore(path).get("1010:account") is None
+
+
+def test_backoff_delay() -> None:
+    """Test retry delays are random, doubled on each retry up to a maximum."""
+    delays = [_backoff_delay(1) for _ in range(100)]
+    assert all(0 <= delay <= API_BACKOFF for delay in delays)
+    assert len(set(delays)) > 1
+    assert all(0 <= _backoff_delay(2) <= 2 * API_BACKOFF for _ in range(100))
+    assert all(0 <= _backoff_delay(30) <= API_BACKOFF_MAX for _ in range(100))
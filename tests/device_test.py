@@ -11,10 +11,18 @@ from midealocal.device import (
     MessageResult,
     MideaDevice,
     NoSupportedProtocol,
+    _InflightQueries,
+)
+from midealocal.devices.ac import MideaACDevice
+from midealocal.devices.ac.message import (
+    MessageCapabilitiesQuery,
+    MessageNewProtocolQuery,
+    MessagePowerQuery,
+    MessageQuery,
 )
-from midealocal.devices.ac.message import MessageCapabilitiesQuery
 from midealocal.exceptions import SocketException
-from midealocal.message import MessageType
+from midealocal.message import ListTypes, MessageType
+from midealocal.simulator import Simulator, VirtualAppliance
 
 
 def test_fetch_v2_message() -> None:
@@ -27,6 +35,153 @@ def test_fetch_v2_message() -> None:
     )
 
 
+def test_update_all_delta() -> None:
+    """Test updates only receive changed attributes."""
+    device = MideaDevice(
+        name="Test Device",
+        device_id=1,
+        device_type=DeviceType.AC,
+        ip_address="192.168.1.100",
+        port=6444,
+        token=DEFAULT_KEYS[99]["token"],
+        key=DEFAULT_KEYS[99]["key"],
+        device_protocol=ProtocolVersion.V3,
+        model="test_model",
+        subtype=1,
+        attributes={},
+    )
+    upd = MagicMock()
+    snapshot = MagicMock()
+    device.register_update(upd)
+    device.register_update(snapshot, full_snapshot=True)
+    device.update_all({"power": True, "mode": 1})
+    upd.assert_called_once_with({"power": True, "mode": 1})
+    device.update_all({"power": True, "mode": 2})
+    upd.assert_called_with({"mode": 2})
+    upd.reset_mock()
+    device.update_all({"power": True, "mode": 2})
+    upd.assert_not_called()
+    # same value of another type is a change
+    device.update_all({"mode": 2.0})
+    upd.assert_called_once_with({"mode": 2.0})
+    assert snapshot.call_count == 4
+    snapshot.assert_called_with({"mode": 2.0})
+    # a list changed in place is a change
+    zones = [25, 25]
+    device.update_all({"zones": zones})
+    zones[1] = 30
+    upd.reset_mock()
+    device.update_all({"zones": zones})
+    upd.assert_called_once_with({"zones": [25, 30]})
+    # full status after the device was unavailable
+    device.set_available(False)
+    upd.reset_mock()
+    device.update_all({"power": True, "mode": 2.0})
+    upd.assert_called_once_with({"power": True, "mode": 2.0})
+
+
+def test_inflight_queries() -> None:
+    """Test responses are matched by body type, then by message type."""
+    query = MessageQuery(ProtocolVersion.V3)
+    new_protocol = MessageNewProtocolQuery(ProtocolVersion.V3)
+    power = MessagePowerQuery(ProtocolVersion.V3)
+    inflight = _InflightQueries()
+    for cmd in (query, new_protocol, power):
+        inflight.add(cmd, 10.0)
+    inflight.response(MessageType.query, ListTypes.B1)
+    assert [cmd for cmd, _ in inflight.pending] == [query, power]
+    ambiguous = [inflight.ambiguous]
+    inflight.response(MessageType.notify1, 0xA1)
+    inflight.response(MessageType.query, 0xC0)
+    assert [cmd for cmd, _ in inflight.pending] == [power]
+    ambiguous.append(inflight.ambiguous)
+    assert ambiguous == [False, True]
+    assert inflight.expire(9.5) == 0.5
+    assert inflight.expire(10.0) is None
+    assert inflight.expired == [power]
+
+
+def _simulated_ac(appliance: VirtualAppliance) -> MideaACDevice:
+    device = MideaACDevice(
+        name="Simulated AC",
+        device_id=appliance.device_id,
+        ip_address=appliance.host,
+        port=appliance.port,
+        token=DEFAULT_KEYS[99]["token"],
+        key=DEFAULT_KEYS[99]["key"],
+        device_protocol=appliance.protocol,
+        model="test_model",
+        subtype=0,
+        customize="",
+    )
+    device.set_pipelined_refresh()
+    return device
+
+
+def test_pipelined_refresh() -> None:
+    """Test a pipelined refresh checks every query in one round trip."""
+    simulator = Simulator()
+    appliance = simulator.add_appliance(VirtualAppliance(1, latency=0.1))
+    device = _simulated_ac(appliance)
+    with patch.object(device, "_check_response") as check_response:
+        assert device.connect(check_protocol=True) is True
+    simulator.close()
+    check_response.assert_not_called()
+    assert device._unsupported_protocol == []
+    assert device.attributes["target_temperature"] == 24.0
+
+
+def test_pipelined_refresh_unanswered() -> None:
+    """Test unanswered queries are set unsupported past their deadline."""
+    simulator = Simulator()
+    appliance = simulator.add_appliance(
+        VirtualAppliance(1, unanswered=[ListTypes.X41]),
+    )
+    device = _simulated_ac(appliance)
+    with (
+        patch("midealocal.device.QUERY_TIMEOUT", 0.2),
+        patch.object(device, "_check_response") as check_response,
+    ):
+        assert device.connect(check_protocol=True) is True
+    check_response.assert_not_called()
+    assert device._unsupported_protocol == ["MessageQuery", "MessagePowerQuery"]
+    device.close_socket()
+
+    # a response matching several queries, the unanswered ones are checked
+    # again one by one
+    appliance.unanswered = frozenset([ListTypes.B1])
+    with patch("midealocal.device.QUERY_TIMEOUT", 0.2):
+        assert device.connect(check_protocol=True) is True
+        assert "MessagePowerQuery" not in device._unsupported_protocol
+        device.close_socket()
+        appliance.unanswered = frozenset(range(256))
+        assert device.connect() is True
+        with pytest.raises(NoSupportedProtocol):
+            device.refresh_status(check_protocol=True)
+    simulator.close()
+
+
+def test_illegal_message_logged(caplog: pytest.LogCaptureFixture) -> None:
+    """Test the frame received with recv_into is logged when illegal."""
+    device = MideaDevice(
+        name="Test Device",
+        device_id=1,
+        device_type=DeviceType.AC,
+        ip_address="192.168.1.100",
+        port=6444,
+        token=DEFAULT_KEYS[99]["token"],
+        key=DEFAULT_KEYS[99]["key"],
+        device_protocol=ProtocolVersion.V2,
+        model="test_model",
+        subtype=1,
+        attributes={},
+    )
+    frame = bytes([0x5A, 0x5A, 0x11, 0x10, 60, 0x0]) + bytes(range(54))
+    device._buffer.append(frame)
+    assert device.parse_message() == MessageResult.SUCCESS
+    assert f"message = {frame.hex()}," in caplog.text
+
+
 class MideaDeviceTest:
     """Midea device test case."""
 
@@ -136,6 +136,49 @@ class TestMideaACDevice:
         assert isinstance(queries[1], MessageNewProtocolQuery)
         assert isinstance(queries[2], MessagePowerQuery)
 
+    def test_refresh_queries(self) -> None:
+        """Test refresh queries are cached until the protocol changes."""
+        self.device._appliance_query = False
+        with patch.object(
+            self.device,
+            "build_query",
+            wraps=self.device.build_query,
+        ) as build_query:
+            queries = self.device.refresh_queries()
+            assert self.device.refresh_queries() is queries
+            build_query.assert_called_once()
+            # message id in the serialization, not cached
+            assert self.device._query_cache[queries[0]] is None
+            # no message id, cached encrypted
+            assert self.device._query_cache[queries[2]] == (
+                self.device._security.aes_encrypt(queries[2].serialize())
+            )
+
+            self.device._used_subprotocol = True
+            queries = self.device.refresh_queries()
+            assert isinstance(queries[0], MessageSubProtocolQuery)
+            self.device._message_protocol_version = 3
+            assert self.device.refresh_queries() is not queries
+            assert build_query.call_count == 3
+
+    def test_build_send_cached(self) -> None:
+        """Test cached queries are sent without serializing again."""
+        self.device._appliance_query = False
+        queries = self.device.refresh_queries()
+        message_id = queries[0]._message_id
+        with (
+            patch("midealocal.device.PacketBuilder") as packet_builder,
+            patch.object(self.device, "send_message"),
+            patch.object(queries[2], "serialize") as serialize,
+        ):
+            self.device.build_send(queries[0], query=True)
+            assert queries[0]._message_id != message_id
+            self.device.build_send(queries[2], query=True)
+            serialize.assert_not_called()
+            assert (
+                packet_builder.call_args.args[2] == self.device._query_cache[queries[2]]
+            )
+
     def test_process_message(self) -> None:
         """Test process message."""
         with patch("midealocal.devices.ac.MessageACResponse") as mock_message_response:
@@ -0,0 +1,125 @@
+"""Midea local discover test."""
+
+import asyncio
+import time
+from collections.abc import Iterator
+from contextlib import aclosing
+from itertools import islice
+
+import pytest
+
+from midealocal.const import DeviceType, ProtocolVersion
+from midealocal.discover import (
+    async_discover,
+    async_discover_iter,
+    async_discover_sweep,
+    network_hosts,
+)
+from midealocal.simulator import Simulator, VirtualAppliance
+
+
+@pytest.fixture(name="simulator")
+def simulator_fixture() -> Iterator[Simulator]:
+    """Serve one appliance of each protocol."""
+    simulator = Simulator()
+    simulator.add_appliances(
+        [
+            VirtualAppliance(1, DeviceType.AC, ProtocolVersion.V1),
+            VirtualAppliance(2, DeviceType.AC, ProtocolVersion.V2),
+            VirtualAppliance(3, DeviceType.A1, ProtocolVersion.V3, model="00000Q12"),
+        ],
+    )
+    yield simulator
+    simulator.close()
+
+
+def test_async_discover(simulator: Simulator) -> None:
+    """Test devices of all protocols are discovered."""
+    port = simulator.open_discovery()
+    devices = asyncio.run(
+        async_discover(ip_address="127.0.0.1", duration=0.5, ports=[port]),
+    )
+    assert sorted(devices) == [1, 2, 3]
+    appliance = {item.device_id: item for item in simulator.appliances}[3]
+    assert devices[3] == {
+        "device_id": 3,
+        "type": DeviceType.A1,
+        "ip_address": "127.0.0.1",
+        "port": appliance.port,
+        "model": "00000Q12",
+        "sn": appliance.sn,
+        "protocol": ProtocolVersion.V3,
+    }
+    assert devices[1]["protocol"] == ProtocolVersion.V1
+    assert devices[1]["model"] == "00000Q11"
+    assert devices[2]["protocol"] == ProtocolVersion.V2
+
+    devices = asyncio.run(
+        async_discover(
+            discover_type=[DeviceType.A1],
+            ip_address="127.0.0.1",
+            duration=0.5,
+            ports=[port],
+        ),
+    )
+    assert list(devices) == [3]
+
+
+def test_async_discover_expected(simulator: Simulator) -> None:
+    """Test the scan stops once the expected devices are found."""
+    port = simulator.open_discovery()
+
+    async def discover() -> list[int]:
+        async with aclosing(
+            async_discover_iter(
+                ip_address="127.0.0.1",
+                duration=10,
+                expected_ids=[2, 3],
+                ports=[port, port],
+            ),
+        ) as devices:
+            return [device["device_id"] async for device in devices]
+
+    start = time.monotonic()
+    found = asyncio.run(discover())
+    assert time.monotonic() - start < 5
+    assert sorted(found) == [2, 3] or sorted(found) == [1, 2, 3]
+    assert len(set(found)) == len(found)
+
+
+def test_network_hosts() -> None:
+    """Test CIDR ranges are enumerated lazily."""
+    assert list(network_hosts(["192.168.1.4/30", "10.0.0.1/32"])) == [
+        "192.168.1.5",
+        "192.168.1.6",
+        "10.0.0.1",
+    ]
+    hosts = network_hosts(["10.0.0.0/8"])
+    assert list(islice(hosts, 2)) == ["10.0.0.1", "10.0.0.2"]
+
+
+def test_async_discover_sweep(simulator: Simulator) -> None:
+    """Test a sweep probes each host and dedupes devices."""
+    port = simulator.open_discovery()
+
+    async def sweep() -> list[dict]:
+        return [
+            device
+            async for device in async_discover_sweep(
+                ["127.0.0.0/29", "127.0.0.1/32"],
+                discover_type=[DeviceType.AC],
+                duration=0.5,
+                ports=[port],
+                concurrency=2,
+                interval=0,
+            )
+        ]
+
+    devices = asyncio.run(sweep())
+    assert sorted(device["device_id"] for device in devices) == [1, 2]
+    assert {device["ip_address"] for device in devices} == {"127.0.0.1"}
+
+    with pytest.raises(ValueError, match="concurrency"):
+        asyncio.run(
+            anext(async_discover_sweep(["127.0.0.1/32"], concurrency=0)),
+        )
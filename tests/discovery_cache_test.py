@@ -0,0 +1,139 @@
+"""Midea local discovery cache test."""
+
+import asyncio
+import threading
+import time
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from midealocal.const import DeviceType, ProtocolVersion
+from midealocal.discovery_cache import DiscoveryCache
+from midealocal.simulator import Simulator, VirtualAppliance
+
+
+def _device(device_id: int, ip_address: str) -> dict:
+    return {
+        "device_id": device_id,
+        "type": DeviceType.AC,
+        "ip_address": ip_address,
+        "port": 6444,
+        "model": "00000Q11",
+        "sn": "000000P0000000Q1",
+        "protocol": ProtocolVersion.V3,
+    }
+
+
+def test_cache_file(tmp_path: Path) -> None:
+    """Test devices are persisted and expire after the TTL."""
+    path = tmp_path / "discovery.json"
+    cache = DiscoveryCache(path, ttl=60)
+    assert cache.get(1) is None
+    cache.update([_device(1, "192.168.1.2"), _device(2, "192.168.1.3")])
+    cache.remove(2)
+
+    cache = DiscoveryCache(path, ttl=60)
+    entry = cache.get(1)
+    assert entry is not None
+    assert entry["ip_address"] == "192.168.1.2"
+    assert entry["protocol"] is ProtocolVersion.V3
+    assert cache.get(2) is None
+    assert cache.find("192.168.1.2") == entry
+    assert cache.find("192.168.1.3") is None
+    assert list(cache.devices()) == [1]
+
+    with patch("midealocal.discovery_cache.time.time", return_value=time.time() + 61):
+        assert cache.get(1) is None
+        assert cache.get(1, include_stale=True) == entry
+        assert cache.devices() == {}
+        assert cache.find("192.168.1.2") == entry
+
+    path.write_text("{", encoding="utf-8")
+    assert DiscoveryCache(path).devices(include_stale=True) == {}
+    path.write_text('{"version": 1, "devices": [{"protocol": 9}]}', encoding="utf-8")
+    assert DiscoveryCache(path).devices(include_stale=True) == {}
+
+
+def test_ip_change(tmp_path: Path) -> None:
+    """Test a device seen at another address is moved."""
+    cache = DiscoveryCache(tmp_path / "discovery.json")
+    running = MagicMock(device_id=1)
+    cache.register_device(running)
+    cache.update([_device(1, "192.168.1.2")])
+    running.set_ip_address.assert_not_called()
+
+    assert cache.update([_device(1, "192.168.1.9"), _device(2, "192.168.1.3")]) == [1]
+    running.set_ip_address.assert_called_once_with("192.168.1.9")
+
+    cache.unregister_device(running)
+    cache.update([_device(1, "192.168.1.2")])
+    running.set_ip_address.assert_called_once()
+
+
+def test_validate(tmp_path: Path) -> None:
+    """Test a stale device is validated with a single probe."""
+    simulator = Simulator()
+    appliance = simulator.add_appliance(VirtualAppliance(1))
+    port = simulator.open_discovery()
+    cache = DiscoveryCache(tmp_path / "discovery.json", ttl=0)
+    cache.update([_device(1, "127.0.0.1"), _device(2, "127.0.0.1")])
+
+    with patch("midealocal.discovery_cache.PROBE_DURATION", 0.2):
+        device = asyncio.run(cache.async_validate(1, ports=[port]))
+        assert device is not None
+        assert device["port"] == appliance.port
+        entry = cache.get(1, include_stale=True)
+        assert entry is not None
+        assert entry["port"] == appliance.port
+        assert asyncio.run(cache.async_validate(2, ports=[port])) is None
+        assert asyncio.run(cache.async_validate(3, ports=[port])) is None
+    simulator.close()
+
+
+def test_lookup(tmp_path: Path) -> None:
+    """Test a lookup uses fresh entries before probing or discovering."""
+    cache = DiscoveryCache(tmp_path / "discovery.json")
+    cache.update([_device(1, "192.168.1.2")])
+    with (
+        patch.object(cache, "async_validate", AsyncMock(return_value=None)),
+        patch.object(cache, "async_refresh", AsyncMock()) as refresh,
+    ):
+        assert asyncio.run(cache.async_lookup(1)) == cache.get(1)
+        refresh.assert_not_called()
+        assert asyncio.run(cache.async_lookup(2)) is None
+        refresh.assert_called_once()
+
+
+def test_background_refresh(tmp_path: Path) -> None:
+    """Test the cache is refreshed until stopped."""
+    cache = DiscoveryCache(tmp_path / "discovery.json")
+
+    async def run() -> None:
+        cache.start_refresh(interval=0.01)
+        await asyncio.sleep(0.1)
+        await cache.stop_refresh()
+
+    with patch.object(cache, "async_refresh", AsyncMock()) as refresh:
+        asyncio.run(run())
+    assert refresh.call_count > 1
+
+
+def test_refresh_saves_in_executor(tmp_path: Path) -> None:
+    """Test the async paths write the cache file outside the event loop."""
+    cache = DiscoveryCache(tmp_path / "discovery.json")
+    threads: list[threading.Thread] = []
+
+    def save(*_args: object) -> None:
+        threads.append(threading.current_thread())
+
+    with (
+        patch(
+            "midealocal.discovery_cache.async_discover",
+            AsyncMock(return_value={1: _device(1, "192.168.1.2")}),
+        ),
+        patch("midealocal.discovery_cache.write_json_atomic", side_effect=save),
+    ):
+        devices = asyncio.run(cache.async_refresh())
+    assert list(devices) == [1]
+    assert cache.get(1) is not None
+    assert len(threads) == 1
+    assert threads[0] is not threading.current_thread()
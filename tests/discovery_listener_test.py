@@ -0,0 +1,133 @@
+"""Midea local discovery listener test."""
+
+import queue
+import time
+from pathlib import Path
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+from midealocal.const import ProtocolVersion
+from midealocal.discover import get_device_info
+from midealocal.discovery_cache import DiscoveryCache
+from midealocal.discovery_listener import DiscoveryEvent, DiscoveryListener
+from midealocal.simulator import Simulator, VirtualAppliance
+
+EVENT_TIMEOUT = 5
+
+
+def _next_event(events: queue.Queue) -> tuple[DiscoveryEvent, dict[str, Any]]:
+    event: tuple[DiscoveryEvent, dict[str, Any]] = events.get(timeout=EVENT_TIMEOUT)
+    return event
+
+
+def test_listener(tmp_path: Path) -> None:
+    """Test devices are added, moved and removed as they answer probes."""
+    first = Simulator("127.0.0.1")
+    second = Simulator("127.0.0.2")
+    port = first.open_discovery()
+    second.open_discovery(port)
+    first.add_appliance(VirtualAppliance(1))
+
+    cache = DiscoveryCache(tmp_path / "discovery.json")
+    running = MagicMock(device_id=1)
+    cache.register_device(running)
+    events: queue.Queue = queue.Queue()
+    listener = DiscoveryListener(
+        ["127.0.0.1", "127.0.0.2"],
+        probe_interval=0.2,
+        ports=[port],
+        cache=cache,
+    )
+    listener.register_callback(lambda event, device: events.put((event, device)))
+    listener.open()
+    try:
+        event, device = _next_event(events)
+        assert event == DiscoveryEvent.ADDED
+        assert device["device_id"] == 1
+        assert device["ip_address"] == "127.0.0.1"
+        assert list(listener.devices) == [1]
+
+        # the appliance gets another address
+        first.close()
+        second.add_appliance(VirtualAppliance(1))
+        event, device = _next_event(events)
+        assert event == DiscoveryEvent.IP_CHANGED
+        assert device["ip_address"] == "127.0.0.2"
+        assert device["previous_ip_address"] == "127.0.0.1"
+        running.set_ip_address.assert_called_once_with("127.0.0.2")
+        entry = cache.get(1)
+        assert entry is not None
+        assert entry["ip_address"] == "127.0.0.2"
+        assert "previous_ip_address" not in entry
+
+        second.close()
+        event, device = _next_event(events)
+        assert event == DiscoveryEvent.REMOVED
+        assert device["device_id"] == 1
+        assert listener.devices == {}
+    finally:
+        listener.close()
+        first.close()
+        second.close()
+    assert listener.probes > 1
+
+
+def test_probe_schedule() -> None:
+    """Test probes are spread around the interval and can be forced."""
+    listener = DiscoveryListener(["127.0.0.1"], probe_interval=100, jitter=0.2)
+    delays = [listener._probe_delay() for _ in range(100)]
+    assert all(80 <= delay <= 120 for delay in delays)
+    assert len(set(delays)) > 1
+
+    with patch("midealocal.discovery_listener.enum_all_broadcast", return_value=[]):
+        listener = DiscoveryListener(probe_interval=100)
+        listener.open()
+        deadline = time.monotonic() + EVENT_TIMEOUT
+        while listener.probes < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        listener.probe()
+        while listener.probes < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        listener.close()
+    assert listener.probes == 2
+
+
+def test_listener_v1() -> None:
+    """Test a tracked V1 device is not asked its device id again."""
+    simulator = Simulator()
+    port = simulator.open_discovery()
+    simulator.add_appliance(VirtualAppliance(1, protocol=ProtocolVersion.V1))
+    events: queue.Queue = queue.Queue()
+    listener = DiscoveryListener(["127.0.0.1"], probe_interval=0.05, ports=[port])
+    listener.register_callback(lambda event, device: events.put((event, device)))
+    with patch(
+        "midealocal.discovery_listener.get_device_info",
+        wraps=get_device_info,
+    ) as device_info:
+        listener.open()
+        try:
+            event, device = _next_event(events)
+            assert event == DiscoveryEvent.ADDED
+            assert device["device_id"] == 1
+            assert device["protocol"] == ProtocolVersion.V1
+            probes = listener.probes
+            deadline = time.monotonic() + EVENT_TIMEOUT
+            while listener.probes < probes + 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            listener.close()
+            simulator.close()
+    assert listener.probes >= probes + 3
+    assert events.empty()
+    device_info.assert_called_once()
+
+
+def test_close() -> None:
+    """Test close releases the selector and the wakeup sockets."""
+    with patch("midealocal.discovery_listener.enum_all_broadcast", return_value=[]):
+        listener = DiscoveryListener(probe_interval=100)
+        listener.open()
+        listener.close()
+    assert listener._wakeup_reader.fileno() == -1
+    assert listener._wakeup_writer.fileno() == -1
+    assert listener._selector.get_map() is None
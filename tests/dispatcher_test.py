@@ -0,0 +1,129 @@
+"""Midea local update dispatcher test."""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import MagicMock
+
+from midealocal.cloud import DEFAULT_KEYS
+from midealocal.const import DeviceType, ProtocolVersion
+from midealocal.device import MideaDevice
+from midealocal.dispatcher import UpdateDispatcher
+
+
+def _wait_for(condition: threading.Event) -> None:
+    assert condition.wait(2)
+
+
+def test_coalesce() -> None:
+    """Test status submitted in a burst are merged and delivered once."""
+    dispatcher = UpdateDispatcher(window=0.2)
+    received: list[dict[str, Any]] = []
+    delivered = threading.Event()
+
+    def update(status: dict[str, Any]) -> None:
+        received.append(status)
+        delivered.set()
+
+    dispatcher.open()
+    dispatcher.submit(1, [update], {"power": True})
+    _wait_for(delivered)
+    delivered.clear()
+    # within the window of the first delivery, merged
+    for mode in range(5):
+        dispatcher.submit(1, [update], {"mode": mode})
+    dispatcher.submit(1, [update], {"power": False})
+    assert dispatcher.queue_depth == 1
+    _wait_for(delivered)
+    dispatcher.close()
+    assert received == [{"power": True}, {"mode": 4, "power": False}]
+    metrics = dispatcher.metrics
+    assert metrics["submitted"] == 7
+    assert metrics["coalesced"] == 5
+    assert metrics["delivered"] == 2
+    assert metrics["queue_depth"] == 0
+    assert metrics["max_queue_depth"] == 1
+    assert 0.1 < metrics["latency_max"] < 1
+    assert metrics["latency_avg"] <= metrics["latency_max"]
+
+
+def test_close_flushes_and_errors() -> None:
+    """Test waiting updates are delivered on close and errors are counted."""
+    dispatcher = UpdateDispatcher(window=60)
+    update = MagicMock(side_effect=[None, ValueError, None])
+    dispatcher.open()
+    dispatcher.submit(1, [update], {"power": True})
+    for _ in range(100):
+        if update.call_count:
+            break
+        time.sleep(0.01)
+    dispatcher.submit(1, [update], {"power": False})
+    dispatcher.submit(2, [update], {"power": True})
+    dispatcher.close()
+    assert update.call_count == 3
+    assert dispatcher.metrics["errors"] == 1
+
+
+def test_executor() -> None:
+    """Test updates are called on the executor."""
+    threads = []
+    delivered = threading.Event()
+
+    def update(_: dict[str, Any]) -> None:
+        threads.append(threading.current_thread().name)
+        delivered.set()
+
+    with ThreadPoolExecutor(thread_name_prefix="consumer") as executor:
+        dispatcher = UpdateDispatcher(window=0, executor=executor)
+        dispatcher.open()
+        dispatcher.submit(1, [update], {"power": True})
+        _wait_for(delivered)
+        dispatcher.close()
+    assert threads[0].startswith("consumer")
+
+
+def test_device_dispatcher() -> None:
+    """Test device updates go through the dispatcher."""
+    device = MideaDevice(
+        name="Test Device",
+        device_id=1,
+        device_type=DeviceType.AC,
+        ip_address="192.168.1.100",
+        port=6444,
+        token=DEFAULT_KEYS[99]["token"],
+        key=DEFAULT_KEYS[99]["key"],
+        device_protocol=ProtocolVersion.V3,
+        model="test_model",
+        subtype=1,
+        attributes={},
+    )
+    dispatcher = UpdateDispatcher(window=60)
+    update = MagicMock()
+    snapshot = MagicMock()
+    device.register_update(update)
+    device.register_update(snapshot, full_snapshot=True)
+    device.set_dispatcher(dispatcher)
+    device.update_all({"power": True})
+    device.update_all({"power": True, "mode": 1})
+    update.assert_not_called()
+    dispatcher.open()
+    dispatcher.close()
+    update.assert_called_once_with({"power": True, "mode": 1})
+    snapshot.assert_called_once_with({"power": True, "mode": 1})
+
+
+class UpdateDispatcherLoopTest(IsolatedAsyncioTestCase):
+    """Update dispatcher event loop test case."""
+
+    async def test_loop(self) -> None:
+        """Test updates are called on the event loop."""
+        loop = asyncio.get_running_loop()
+        received: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+        dispatcher = UpdateDispatcher(window=0, loop=loop)
+        dispatcher.open()
+        dispatcher.submit(1, [received.put_nowait], {"power": True})
+        assert await asyncio.wait_for(received.get(), 2) == {"power": True}
+        dispatcher.close()
@@ -0,0 +1,297 @@
+"""Midea Local device hub test."""
+
+import asyncio
+import tempfile
+from pathlib import Path
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import MagicMock, patch
+
+from midealocal.capabilities import CapabilityCache, DeviceCapabilities
+from midealocal.cloud import DEFAULT_KEYS
+from midealocal.const import DeviceType, ProtocolVersion
+from midealocal.device import MessageResult
+from midealocal.hub import DeviceHub, HubState, _HubSocket
+from midealocal.message import ListTypes
+from midealocal.simulator import Simulator, VirtualAppliance
+
+from .async_device_test import _FakeAppliance, _TestDevice
+from .device_test import _simulated_ac
+
+
+class DeviceHubTest(IsolatedAsyncioTestCase):
+    """Device hub test case."""
+
+    async def asyncSetUp(self) -> None:
+        """Start a fake appliance server and the hub."""
+        key = bytes.fromhex(DEFAULT_KEYS[99]["key"])
+        self.server = await asyncio.get_running_loop().create_server(
+            lambda: _FakeAppliance(key),
+            "127.0.0.1",
+            0,
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.hub = DeviceHub()
+        self.hub.open()
+
+    async def asyncTearDown(self) -> None:
+        """Stop the hub and the server."""
+        self.hub.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    def _device(self, device_id: int, protocol: ProtocolVersion) -> _TestDevice:
+        return _TestDevice(
+            name="Test Device",
+            device_id=device_id,
+            device_type=DeviceType.AC,
+            ip_address="127.0.0.1",
+            port=self.port,
+            token=DEFAULT_KEYS[99]["token"],
+            key=DEFAULT_KEYS[99]["key"],
+            device_protocol=protocol,
+            model="test_model",
+            subtype=1,
+            attributes={"power": False},
+        )
+
+    async def _wait_for(self, device_id: int, state: HubState) -> None:
+        for _ in range(100):
+            entry = self.hub._devices.get(device_id)
+            if entry is not None and entry.state == state:
+                return
+            await asyncio.sleep(0.02)
+        raise AssertionError(f"device {device_id} did not reach {state!r}")
+
+    async def test_many_devices(self) -> None:
+        """Test V2 and V3 devices are driven by a single thread."""
+        devices = [
+            self._device(i, ProtocolVersion.V2 if i % 2 else ProtocolVersion.V3)
+            for i in range(1, 11)
+        ]
+        update = MagicMock()
+        for device in devices:
+            device.register_update(update)
+            self.hub.add_device(device)
+        for device in devices:
+            await self._wait_for(device.device_id, HubState.RUNNING)
+            assert device.available is True
+            assert device.attributes["power"] is True
+        assert len(self.hub.devices) == len(devices)
+        update.assert_any_call({"available": True})
+
+        self.hub.remove_device(devices[0])
+        for _ in range(100):
+            if devices[0].device_id not in self.hub._devices:
+                break
+            await asyncio.sleep(0.02)
+        assert devices[0]._socket is None
+        assert len(self.hub.devices) == len(devices) - 1
+
+    async def test_close(self) -> None:
+        """Test close disconnects the devices and releases the selector."""
+        device = self._device(1, ProtocolVersion.V2)
+        self.hub.add_device(device)
+        await self._wait_for(1, HubState.RUNNING)
+        self.hub.close()
+        assert device._socket is None
+        assert self.hub._wakeup_reader.fileno() == -1
+        assert self.hub._wakeup_writer.fileno() == -1
+        assert self.hub._selector.get_map() is None
+
+    async def test_connect_refused(self) -> None:
+        """Test an unreachable device is retried with backoff."""
+        device = self._device(1, ProtocolVersion.V2)
+        device._port = 1
+        self.hub.add_device(device)
+        for _ in range(100):
+            entry = self.hub._devices.get(1)
+            if entry is not None and entry.connection_retries > 0:
+                break
+            await asyncio.sleep(0.02)
+        entry = self.hub._devices[1]
+        assert entry.state == HubState.IDLE
+        assert device.available is False
+
+    async def test_metrics(self) -> None:
+        """Test the hub records the connect and authentication metrics."""
+        device = self._device(1, ProtocolVersion.V3)
+        metrics = device.enable_metrics()
+        unreachable = self._device(2, ProtocolVersion.V2)
+        unreachable._port = 1
+        unreachable_metrics = unreachable.enable_metrics()
+        self.hub.add_device(device)
+        self.hub.add_device(unreachable)
+        await self._wait_for(1, HubState.RUNNING)
+        snapshot = metrics.snapshot()
+        assert snapshot["connects"] == 1
+        assert snapshot["connect_errors"] == 0
+        assert snapshot["connect"]["count"] == 1
+        assert snapshot["auth"]["count"] == 1
+        for _ in range(100):
+            if unreachable_metrics.connect_errors:
+                break
+            await asyncio.sleep(0.02)
+        assert unreachable_metrics.snapshot()["connects"] == 0
+        assert unreachable_metrics.connect_errors == 1
+
+    async def test_unsupported_query(self) -> None:
+        """Test a device without any supported query is retried."""
+        device = self._device(1, ProtocolVersion.V2)
+        device._appliance_query = False
+        with (
+            patch("midealocal.hub.QUERY_TIMEOUT", 0.05),
+            patch.object(device, "build_packet", return_value=b"") as build_packet,
+        ):
+            self.hub.add_device(device)
+            for _ in range(100):
+                entry = self.hub._devices.get(1)
+                if entry is not None and entry.connection_retries > 0:
+                    break
+                await asyncio.sleep(0.02)
+        build_packet.assert_called_once()
+        assert self.hub._devices[1].state == HubState.IDLE
+        assert device.available is False
+
+    async def test_error_response_while_probing(self) -> None:
+        """Test an error response fails the query, not the connection."""
+        device = self._device(1, ProtocolVersion.V2)
+        parse_message = device.parse_message
+        results = [MessageResult.ERROR]
+
+        def parse_error_first() -> MessageResult:
+            return results.pop() if results else parse_message()
+
+        with patch.object(device, "parse_message", side_effect=parse_error_first):
+            self.hub.add_device(device)
+            await self._wait_for(1, HubState.RUNNING)
+        entry = self.hub._devices[1]
+        assert entry.error_count == 1
+        assert entry.connection_retries == 0
+        assert device._unsupported_protocol == []
+
+    async def test_reconnect_after_close(self) -> None:
+        """Test a socket closed outside the hub is reconnected."""
+        device = self._device(1, ProtocolVersion.V2)
+        device._heartbeat_interval = 0
+        self.hub.add_device(device)
+        await self._wait_for(1, HubState.RUNNING)
+        first_socket = device._socket
+        device.set_ip_address("127.0.0.2")
+        device.set_ip_address("127.0.0.1")
+        for _ in range(100):
+            if device._socket is not None and device._socket is not first_socket:
+                break
+            await asyncio.sleep(0.02)
+        await self._wait_for(1, HubState.RUNNING)
+        assert device._socket is not first_socket
+
+    async def test_refresh_keeps_socket_non_blocking(self) -> None:
+        """Test refresh queries keep the socket non-blocking."""
+        device = self._device(1, ProtocolVersion.V3)
+        device.set_refresh_interval(1)
+        self.hub.add_device(device)
+        await self._wait_for(1, HubState.RUNNING)
+        entry = self.hub._devices[1]
+        sock = entry.sock
+        assert sock is not None
+        assert sock.gettimeout() == 0.0
+        previous_refresh = device._previous_refresh
+        for _ in range(100):
+            if device._previous_refresh != previous_refresh:
+                break
+            await asyncio.sleep(0.02)
+        assert device._previous_refresh != previous_refresh
+        assert sock.gettimeout() == 0.0
+        assert entry.state == HubState.RUNNING
+
+    async def test_refresh_without_supported_query(self) -> None:
+        """Test a refresh without supported query keeps the connection."""
+        device = self._device(1, ProtocolVersion.V2)
+        device.set_refresh_interval(1)
+        self.hub.add_device(device)
+        await self._wait_for(1, HubState.RUNNING)
+        first_socket = device._socket
+        device._unsupported_protocol = [
+            cmd.__class__.__name__ for cmd in device.refresh_queries()
+        ]
+        previous_refresh = device._previous_refresh
+        for _ in range(100):
+            if device._previous_refresh != previous_refresh:
+                break
+            await asyncio.sleep(0.02)
+        assert device._previous_refresh != previous_refresh
+        assert device._socket is first_socket
+        assert self.hub._devices[1].state == HubState.RUNNING
+
+    async def test_capability_cache(self) -> None:
+        """Test the probe results are cached and cached devices skip the probe."""
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        cache = CapabilityCache(Path(directory) / "capabilities.json")
+        probed = self._device(1, ProtocolVersion.V2)
+        probed.set_capability_cache(cache)
+        self.hub.add_device(probed)
+        await self._wait_for(1, HubState.RUNNING)
+        assert cache.get(1, "test_model", 1, ProtocolVersion.V2) is not None
+
+        cache.set(2, "test_model", 1, ProtocolVersion.V3, DeviceCapabilities(3))
+        cached = self._device(2, ProtocolVersion.V3)
+        cached.set_capability_cache(cache)
+        with patch.object(self.hub, "_next_probe") as next_probe:
+            self.hub.add_device(cached)
+            await self._wait_for(2, HubState.RUNNING)
+        next_probe.assert_not_called()
+        assert cached.available is True
+
+    async def test_pipelined_probe(self) -> None:
+        """Test the pipelined probe of V2 and V3 devices."""
+        simulator = Simulator()
+        self.addCleanup(simulator.close)
+        appliances = [
+            VirtualAppliance(1, protocol=ProtocolVersion.V2),
+            VirtualAppliance(2, unanswered=[ListTypes.X41]),
+            VirtualAppliance(3, unanswered=[ListTypes.B1]),
+        ]
+        simulator.add_appliances(appliances)
+        devices = [_simulated_ac(appliance) for appliance in appliances]
+        with patch("midealocal.hub.QUERY_TIMEOUT", 0.2):
+            for device in devices:
+                self.hub.add_device(device)
+            for device in devices:
+                await self._wait_for(device.device_id, HubState.RUNNING)
+                assert self.hub._devices[device.device_id].inflight is None
+        assert devices[0]._unsupported_protocol == []
+        assert devices[0].attributes["target_temperature"] == 24.0
+        assert devices[1]._unsupported_protocol == [
+            "MessageQuery",
+            "MessagePowerQuery",
+        ]
+        # a response matching several queries, the others are checked again
+        assert "MessagePowerQuery" not in devices[2]._unsupported_protocol
+
+
+def test_hub_socket_buffers_unsent_data() -> None:
+    """Test the data the socket does not take is sent once writable."""
+    sock = MagicMock()
+    sent: list[bytes] = []
+
+    def send(data: bytes) -> int:
+        if not sock.writable:
+            raise BlockingIOError
+        sent.append(bytes(data[:2]))
+        return len(sent[-1])
+
+    sock.writable = True
+    sock.send.side_effect = send
+    want_write = MagicMock()
+    writer = _HubSocket(sock, want_write)
+    assert writer.send(b"abcd") == 4
+    want_write.assert_called_once()
+    sock.writable = False
+    assert writer.send(b"ef") == 2
+    assert writer.flush() is False
+    sock.writable = True
+    assert writer.flush() is False
+    assert writer.flush() is True
+    assert b"".join(sent) == b"abcdef"
+    assert writer.send(b"gh") == 2
+    assert want_write.call_count == 2
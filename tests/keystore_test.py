@@ -0,0 +1,57 @@
+"""Midea local key store test."""
+
+import json
+import stat
+from pathlib import Path
+
+from midealocal.keystore import KeyStore
+
+KEYS = {
+    0: {"token": "a1b2c3", "key": "d4e5f6"},
+    1: {"token": "0a0b0c", "key": "0d0e0f"},
+}
+
+
+def test_store_file(tmp_path: Path) -> None:
+    """Test keys are persisted encrypted, the working one first."""
+    path = tmp_path / "keys.json"
+    store = KeyStore(path)
+    assert store.get(1) == {}
+    secret = path.with_name("keys.json.secret")
+    assert not secret.exists()
+    store.set_keys(1, KEYS)
+    store.set_keys(2, KEYS)
+    store.remove(2)
+    store.record_success(1, 1)
+
+    content = path.read_text(encoding="utf-8")
+    assert "a1b2c3" not in content
+    assert "d4e5f6" not in content
+    assert stat.S_IMODE(secret.stat().st_mode) == 0o600
+
+    store = KeyStore(path)
+    assert store.working(1) == 1
+    assert list(store.get(1).items()) == [(1, KEYS[1]), (0, KEYS[0])]
+    assert store.get(2) == {}
+    assert store.working(2) is None
+
+    mtime = path.stat().st_mtime_ns
+    store.record_success(1, 1)
+    store.record_success(3, 0)
+    assert path.stat().st_mtime_ns == mtime
+
+
+def test_invalid_store(tmp_path: Path) -> None:
+    """Test a store that can't be decrypted is ignored."""
+    path = tmp_path / "keys.json"
+    KeyStore(path, secret=bytes(32)).set_keys(1, KEYS)
+    assert KeyStore(path, secret=bytes(32)).get(1) == KEYS
+    assert KeyStore(path, secret=bytes([1]) * 32).get(1) == {}
+    assert KeyStore(path).get(1) == {}
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data["version"] = 0
+    path.write_text(json.dumps(data), encoding="utf-8")
+    assert KeyStore(path, secret=bytes(32)).get(1) == {}
+    path.write_text("{", encoding="utf-8")
+    assert KeyStore(path, secret=bytes(32)).get(1) == {}
@@ -0,0 +1,38 @@
+"""Midea local lua cache test."""
+
+from pathlib import Path
+
+from midealocal.lua_cache import INDEX_FILE, LuaCache
+
+SCRIPT = 'local bit = require "bit"\nreturn 1\n'
+
+
+def test_cache(tmp_path: Path) -> None:
+    """Test scripts are kept by key and stored once by content."""
+    cache = LuaCache(tmp_path)
+    first = LuaCache.key(0xAC, "0abcdef1", "T_0000_AC.lua", "ABCD")
+    second = LuaCache.key(0xAC, "0abcdef2", "T_0000_AC.lua", "abcd")
+    assert first == "ac/0abcdef1/T_0000_AC.lua/abcd"
+    assert cache.get(first) is None
+    cache.set(first, SCRIPT)
+    cache.set(second, SCRIPT)
+    assert len(list(tmp_path.glob("*.lua"))) == 1
+
+    cache = LuaCache(tmp_path)
+    assert cache.get(first) == SCRIPT
+    assert cache.get(second) == SCRIPT
+    assert cache.get(LuaCache.key(0xAC, "0abcdef1", "T_0000_AC.lua", "ef01")) is None
+
+    # an altered script is downloaded again
+    next(tmp_path.glob("*.lua")).write_text("return 2\n", encoding="utf-8")
+    assert cache.get(first) is None
+    assert LuaCache(tmp_path).get(second) is None
+
+
+def test_invalid_cache(tmp_path: Path) -> None:
+    """Test an invalid index is ignored."""
+    LuaCache(tmp_path).set("key", SCRIPT)
+    (tmp_path / INDEX_FILE).write_text("{", encoding="utf-8")
+    assert LuaCache(tmp_path).get("key") is None
+    (tmp_path / INDEX_FILE).write_text('{"version": 0}', encoding="utf-8")
+    assert LuaCache(tmp_path).get("key") is None
@@ -5,10 +5,13 @@ import pytest
 from midealocal.message import (
     BodyParser,
     BoolParser,
+    DurationParser,
     IntEnumParser,
     IntParser,
     ListTypes,
     MessageBody,
+    MessageSchema,
+    ParserPlan,
 )
 
 
@@ -192,3 +195,125 @@ class TestMessageBody:
         assert getattr(body, "feature_2", False) is True
         assert hasattr(body, "speed") is True
         assert getattr(body, "speed", 0) == 3
+
+
+class _SumParser(BodyParser[int]):
+    """Parser with its own raw value extraction."""
+
+    def _get_raw_value(self, body: bytearray) -> int:
+        return sum(body[self._byte :])
+
+    def _parse(self, raw_value: int) -> int:
+        return raw_value
+
+
+class TestParserPlan:
+    """Test compiled parser plan."""
+
+    parsers: tuple[BodyParser, ...] = (
+        IntEnumParser("bt", 0, ListTypes, default_value=ListTypes.X01),
+        BoolParser("power", 1),
+        BoolParser("feature_1", 2, 0),
+        BoolParser("feature_2", 2, 7, default_value=False),
+        IntParser("speed", 3, max_value=100, min_value=10),
+        IntParser("wide", 4, max_value=0xFFFFFF, length_in_bytes=2),
+        IntParser("upper", 4, max_value=0xFFFF, length_in_bytes=2, first_upper=True),
+        IntParser("odd", 5, max_value=0xFFFFFF, length_in_bytes=3),
+        BoolParser("wide_bit", 6, 3),
+        IntParser("masked", 6, mask=0x3C),
+        IntParser("wide_masked", 5, max_value=0xFFFF, length_in_bytes=2, mask=0x0FF0),
+        DurationParser("duration", 5, units=(3600, 60, 1), invalid_value=0xFF),
+        _SumParser("sum", 7),
+    )
+
+    def test_parse_matches_parsers(self) -> None:
+        """Test the plan gives the values of the parsers for any body."""
+        plan = ParserPlan(self.parsers)
+        for size in range(10):
+            for seed in range(0, 256, 5):
+                body = bytearray((seed + index * 37) & 0xFF for index in range(size))
+                assert plan.parse(body) == {
+                    parser.name: parser.get_value(body) for parser in self.parsers
+                }
+
+    def test_repeated_name(self) -> None:
+        """Test the last parser of a repeated name wins."""
+        plan = ParserPlan([IntParser("speed", 0), IntParser("speed", 1)])
+        assert plan.parse(bytearray([0x01, 0x02])) == {"speed": 2}
+
+    def test_parse_all(self) -> None:
+        """Test parse all uses the plan."""
+        body = MessageBody(bytearray([0xA1, 0x00, 0x03, 0x05]))
+        body.parser_list.extend(self.parsers)
+        body.parser_plan = ParserPlan(self.parsers)
+        body.parse_all()
+        assert getattr(body, "bt", None) == ListTypes.A1
+        assert getattr(body, "power", True) is False
+        assert getattr(body, "feature_1", False) is True
+        assert getattr(body, "speed", 0) == 10
+        assert getattr(body, "wide", None) == 0
+
+
+class _SchemaBody(MessageBody):
+    """Message body with a schema."""
+
+    schema = MessageSchema(
+        BoolParser("power", 0, bit=7),
+        IntParser("mode", 0, mask=0x70),
+        IntParser("level", 0, mask=0x0F),
+        IntEnumParser("bt", 1, ListTypes),
+        DurationParser("time_remaining", 2, units=(3600, 60, 1), invalid_value=0xFF),
+        DurationParser("delay", 5, units=(1, 60)),
+        IntParser("target", 7, max_value=0xFFFF, length_in_bytes=2),
+        BoolParser("child_lock", 9, true_value=0x7F),
+        size=11,
+        constants={10: 0x01},
+    )
+
+    def __init__(self, body: bytearray) -> None:
+        """Initialize message body with a schema."""
+        super().__init__(body)
+        self.parse_all()
+
+
+class TestMessageSchema:
+    """Test message schema."""
+
+    body = bytearray.fromhex("b5a1 011e05 1e02 3412 7f 01")
+
+    def test_decode(self) -> None:
+        """Test the schema fields are decoded into the body."""
+        body = _SchemaBody(self.body)
+        assert getattr(body, "power", False) is True
+        assert getattr(body, "mode", 0) == 0x03
+        assert getattr(body, "level", 0) == 0x05
+        assert getattr(body, "bt", None) == ListTypes.A1
+        assert getattr(body, "time_remaining", 0) == 3600 + 30 * 60 + 5
+        assert getattr(body, "delay", 0) == 30 + 2 * 60
+        assert getattr(body, "target", 0) == 0x1234
+        assert getattr(body, "child_lock", False) is True
+        assert _SchemaBody.schema.decode_many([self.body, bytearray(2)]) == [
+            _SchemaBody.schema.decode(self.body),
+            _SchemaBody.schema.decode(bytearray(2)),
+        ]
+
+    def test_duration_invalid_value(self) -> None:
+        """Test invalid duration parts count as zero."""
+        values = _SchemaBody.schema.decode(bytearray.fromhex("0000 ff1eff"))
+        assert values["time_remaining"] == 30 * 60
+
+    def test_encode(self) -> None:
+        """Test attributes are encoded back into the body."""
+        body = _SchemaBody(self.body)
+        assert _SchemaBody.schema.encode(body) == self.body
+        body.target = None  # type: ignore[attr-defined]
+        encoded = _SchemaBody.schema.encode(body)
+        assert encoded[7:9] == b"\x00\x00"
+        assert encoded[10] == 0x01
+
+    def test_mask_validation(self) -> None:
+        """Test masks must fit the field length."""
+        with pytest.raises(ValueError, match="Mask"):
+            IntParser("name", 0, mask=0x100)
+        with pytest.raises(ValueError, match="Mask"):
+            IntParser("name", 0, mask=0)
@@ -0,0 +1,119 @@
+"""Midea local metrics test."""
+
+import math
+from unittest.mock import patch
+
+from midealocal.cloud import DEFAULT_KEYS
+from midealocal.const import ProtocolVersion
+from midealocal.devices.ac import MideaACDevice
+from midealocal.message import ListTypes
+from midealocal.metrics import DeviceMetrics, Histogram, prometheus_text
+from midealocal.simulator import Simulator, VirtualAppliance
+
+from .device_test import _simulated_ac
+
+
+def test_histogram() -> None:
+    """Test observations are counted in cumulative buckets."""
+    histogram = Histogram((0.01, 0.1, 1.0))
+    for value in (0.005, 0.05, 0.05, 0.5, 5.0):
+        histogram.observe(value)
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 5
+    assert math.isclose(snapshot["sum"], 5.605)
+    assert snapshot["max"] == 5.0
+    assert snapshot["buckets"] == {0.01: 1, 0.1: 3, 1.0: 4, math.inf: 5}
+    assert snapshot["p50"] == 0.1
+    assert snapshot["p99"] == 5.0
+    assert Histogram().snapshot()["p50"] == 0.0
+
+
+def test_query_round_trip() -> None:
+    """Test responses end the query of their body or message type."""
+    metrics = DeviceMetrics()
+    metrics.query_sent(0x03, 0x41, "MessageQuery")
+    metrics.query_sent(0x03, 0xB1, "MessageNewProtocolQuery")
+    metrics.query_sent(0x03, 0xB5, "MessageQueryAppliance")
+    metrics.response_received(0x03, 0xB1)
+    metrics.response_received(0x03, None)
+    metrics.response_received(0x02, 0x41)
+    assert list(metrics.query) == ["MessageNewProtocolQuery", "MessageQuery"]
+    metrics.connection_closed()
+    assert metrics.query_timeouts == 1
+
+    # an abandoned query is not matched nor counted as timed out
+    metrics.query_sent(0x03, 0x41, "MessageQuery")
+    metrics.query_abandoned(0x03, "MessageQuery")
+    metrics.query_sent(0x03, 0xB1, "MessageNewProtocolQuery")
+    metrics.response_received(0x03, 0xC0)
+    assert metrics.query["MessageQuery"].count == 1
+    assert metrics.query["MessageNewProtocolQuery"].count == 2
+    metrics.connection_closed()
+    assert metrics.query_timeouts == 1
+
+
+def test_unsupported_query_metrics() -> None:
+    """Test an unsupported query leaves no round trip to the next response."""
+    simulator = Simulator()
+    appliance = simulator.add_appliance(
+        VirtualAppliance(1, unanswered=[ListTypes.X41]),
+    )
+    for pipelined in (False, True):
+        device = _simulated_ac(appliance)
+        device.set_pipelined_refresh(pipelined)
+        metrics = device.enable_metrics()
+        with patch("midealocal.device.QUERY_TIMEOUT", 0.2):
+            assert device.connect(check_protocol=True) is True
+        assert device._unsupported_protocol == ["MessageQuery", "MessagePowerQuery"]
+        device.close_socket()
+        assert "MessageQuery" not in metrics.query
+        assert metrics.query["MessageNewProtocolQuery"].count == 1
+        assert metrics.query["MessageNewProtocolQuery"].max < 0.2
+        assert metrics.query_timeouts == 0
+    simulator.close()
+
+
+def test_device_metrics() -> None:
+    """Test a device records metrics while talking to an appliance."""
+    simulator = Simulator()
+    appliance = simulator.add_appliance(VirtualAppliance(1))
+    device = MideaACDevice(
+        name="Simulated AC",
+        device_id=appliance.device_id,
+        ip_address=appliance.host,
+        port=appliance.port,
+        token=DEFAULT_KEYS[99]["token"],
+        key=DEFAULT_KEYS[99]["key"],
+        device_protocol=ProtocolVersion.V3,
+        model="test_model",
+        subtype=0,
+        customize="",
+    )
+    assert device.metrics is None
+    metrics = device.enable_metrics()
+    assert device.connect(check_protocol=True) is True
+    device.close_socket()
+    assert device.connect(check_protocol=True) is True
+    device.close_socket()
+    simulator.close()
+
+    snapshot = metrics.snapshot()
+    assert snapshot["connects"] == 2
+    assert snapshot["reconnects"] == 1
+    assert snapshot["connect"]["count"] == 2
+    assert snapshot["auth"]["count"] == 2
+    assert snapshot["frames_received"] > 0
+    assert snapshot["bytes_in"] > 0
+    assert snapshot["bytes_out"] > 0
+    assert snapshot["decode_errors"] == 0
+    assert snapshot["query"]["MessageQueryAppliance"]["count"] == 1
+    assert snapshot["query"]["MessageQuery"]["count"] == 2
+
+    text = prometheus_text({device.device_id: metrics})
+    assert "# TYPE midea_connects_total counter" in text
+    assert 'midea_connects_total{device_id="1"} 2' in text
+    assert 'midea_auth_seconds_bucket{device_id="1",le="+Inf"} 2' in text
+    assert 'midea_query_seconds_count{device_id="1",message="MessageQuery"} 2' in text
+
+    device.disable_metrics()
+    assert device.metrics is None
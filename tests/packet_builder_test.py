@@ -0,0 +1,54 @@
+"""Midea Local packet builder test."""
+
+from datetime import UTC, datetime
+from unittest.mock import patch
+
+from midealocal.packet_builder import PacketBuilder
+from midealocal.security import LocalSecurity
+
+COMMAND = bytearray([0xAA, 0x0B, 0xAC] + [0x00] * 8)
+
+
+def test_packet_time() -> None:
+    """Test packet time encoding."""
+    with patch("midealocal.packet_builder.datetime") as mock_datetime:
+        mock_datetime.now.return_value = datetime(
+            2024,
+            5,
+            6,
+            7,
+            8,
+            9,
+            123456,
+            tzinfo=UTC,
+        )
+        assert PacketBuilder.packet_time() == bytearray(
+            [12, 9, 8, 7, 6, 5, 24, 20],
+        )
+
+
+def test_finalize() -> None:
+    """Test command packet."""
+    security = LocalSecurity()
+    packet = PacketBuilder(0x1234567890, COMMAND).finalize()
+    assert len(packet) == 72
+    assert packet[:4] == b"\x5a\x5a\x01\x11"
+    assert packet[4:6] == (72).to_bytes(2, "little")
+    assert packet[6:8] == b"\x20\x00"
+    assert packet[20:28] == (0x1234567890).to_bytes(8, "little")
+    assert security.aes_decrypt(bytes(packet[40:-16])) == COMMAND
+    assert packet[-16:] == security.encode32_data(bytes(packet[:-16]))
+    # the device header template is not modified by a packet
+    assert PacketBuilder(0x1234567890, COMMAND).finalize()[:4] == b"\x5a\x5a\x01\x11"
+
+
+def test_finalize_heartbeat() -> None:
+    """Test heartbeat packet."""
+    security = LocalSecurity()
+    packet = PacketBuilder(1, bytearray([0x00])).finalize(msg_type=0)
+    assert len(packet) == 56
+    assert packet[:8] == b"\x5a\x5a\x01\x10\x38\x00\x7b\x00"
+    assert packet[-16:] == security.encode32_data(bytes(packet[:-16]))
+    assert (
+        PacketBuilder(1, COMMAND).finalize()[:8] == b"\x5a\x5a\x01\x11\x48\x00\x20\x00"
+    )
@@ -0,0 +1,111 @@
+"""Midea Local security test."""
+
+import sys
+from hashlib import sha256
+
+import pytest
+from Crypto.Cipher import AES
+
+from midealocal.cloud import DEFAULT_KEYS
+from midealocal.exceptions import DataSignDoesntMatch, MessageWrongFormat
+from midealocal.security import (
+    MSGTYPE_ENCRYPTED_RESPONSE,
+    MSGTYPE_HANDSHAKE_RESPONSE,
+    Decoder8370,
+    LocalSecurity,
+)
+
+PACKET = bytes([0x5A, 0x5A, 0x01, 0x11, 0x01, 0x02, 0x03])
+
+
+def _security() -> LocalSecurity:
+    """Local security with an established V3 session."""
+    key = bytes.fromhex(DEFAULT_KEYS[99]["key"])
+    security = LocalSecurity()
+    plain = bytes(range(32))
+    security.tcp_key(
+        security.aes_cbc_encrypt(plain, key) + sha256(plain).digest(),
+        key,
+    )
+    return security
+
+
+def test_decode_8370_burst() -> None:
+    """Test a burst longer than the recursion limit is decoded."""
+    security = _security()
+    count = sys.getrecursionlimit() + 10
+    frame = security.encode_8370(PACKET, MSGTYPE_ENCRYPTED_RESPONSE)
+    packets, leftover = security.decode_8370(frame * count + frame[:7])
+    assert packets == [PACKET] * count
+    assert leftover == frame[:7]
+    assert security.decode_8370(b"\x83\x70") == ([], b"\x83\x70")
+    with pytest.raises(MessageWrongFormat):
+        security.decode_8370(b"\x5a\x5a\x01\x11\x00\x00")
+
+
+def test_aes_cbc() -> None:
+    """Test CBC decryption with the cached key schedule matches AES CBC."""
+    security = _security()
+    key = bytes(range(16, 48))
+    for size in (0, 16, 64, 512):
+        raw = (bytes(range(256)) * 2)[:size]
+        for cipher_key in (key, security._tcp_key):
+            encrypted = AES.new(cipher_key, AES.MODE_CBC, iv=bytes(16)).encrypt(raw)
+            assert security.aes_cbc_encrypt(raw, cipher_key) == encrypted
+            assert security.aes_cbc_decrypt(encrypted, cipher_key) == raw
+            assert security.aes_cbc_decrypt(memoryview(encrypted), cipher_key) == raw
+    with pytest.raises(ValueError, match="aligned"):
+        security.aes_cbc_decrypt(b"\x00" * 15, key)
+
+
+def test_aes_ecb() -> None:
+    """Test the static key round trip."""
+    security = LocalSecurity()
+    assert security.aes_decrypt(security.aes_encrypt(PACKET)) == PACKET
+    assert security.aes_decrypt(b"\x00" * 16) == bytearray(0)
+
+
+class TestDecoder8370:
+    """Streaming 8370 decoder test case."""
+
+    def test_feed_fragments(self) -> None:
+        """Test frames fed byte by byte are decoded once complete."""
+        security = _security()
+        decoder = Decoder8370(security)
+        stream = security.encode_8370(
+            PACKET,
+            MSGTYPE_ENCRYPTED_RESPONSE,
+        ) + security.encode_8370(PACKET, MSGTYPE_HANDSHAKE_RESPONSE)
+        packets: list[bytes] = []
+        for index in range(len(stream)):
+            packets.extend(decoder.feed(stream[index : index + 1]))
+        assert packets == [PACKET, PACKET]
+        assert len(decoder.buffer) == 0
+
+    def test_feed_burst(self) -> None:
+        """Test a burst of frames is decoded iteratively."""
+        security = _security()
+        decoder = Decoder8370(security)
+        count = sys.getrecursionlimit() + 10
+        frame = security.encode_8370(PACKET, MSGTYPE_ENCRYPTED_RESPONSE)
+        frames = decoder.feed(frame * count + frame[:10])
+        assert next(frames) == PACKET
+        assert sum(1 for _ in frames) == count - 1
+        assert len(decoder.buffer) == 10
+        assert list(decoder.feed(frame[10:])) == [PACKET]
+
+    def test_feed_invalid(self) -> None:
+        """Test invalid frames raise and are dropped."""
+        security = _security()
+        decoder = Decoder8370(security)
+        frame = bytearray(security.encode_8370(PACKET, MSGTYPE_ENCRYPTED_RESPONSE))
+        frame[-1] ^= 0xFF
+        with pytest.raises(DataSignDoesntMatch):
+            list(decoder.feed(frame))
+        assert len(decoder.buffer) == 0
+        frame = bytearray(security.encode_8370(PACKET, MSGTYPE_ENCRYPTED_RESPONSE))
+        frame[4] = 0x00
+        with pytest.raises(MessageWrongFormat):
+            list(decoder.feed(frame))
+        with pytest.raises(MessageWrongFormat):
+            list(decoder.feed(b"\x5a\x5a\x01\x11\x00\x00"))
@@ -0,0 +1,123 @@
+"""Midea local appliance simulator test."""
+
+import time
+from collections.abc import Iterator
+
+import pytest
+
+from midealocal.cloud import DEFAULT_KEYS
+from midealocal.const import DeviceType, ProtocolVersion
+from midealocal.devices.a1 import MideaA1Device
+from midealocal.devices.ac import MideaACDevice
+from midealocal.hub import DeviceHub, HubState
+from midealocal.simulator import Simulator, VirtualAppliance
+
+
+@pytest.fixture(name="simulator")
+def fixture_simulator() -> Iterator[Simulator]:
+    """Start a simulator on localhost."""
+    simulator = Simulator()
+    simulator.open()
+    yield simulator
+    simulator.close()
+
+
+def _ac(
+    appliance: VirtualAppliance,
+    token: str = DEFAULT_KEYS[99]["token"],
+) -> MideaACDevice:
+    return MideaACDevice(
+        name="Simulated AC",
+        device_id=appliance.device_id,
+        ip_address=appliance.host,
+        port=appliance.port,
+        token=token,
+        key=DEFAULT_KEYS[99]["key"],
+        device_protocol=appliance.protocol,
+        model="test_model",
+        subtype=0,
+        customize="",
+    )
+
+
+@pytest.mark.parametrize("protocol", [ProtocolVersion.V2, ProtocolVersion.V3])
+def test_connect(simulator: Simulator, protocol: ProtocolVersion) -> None:
+    """Test a device connects and reads the canned status."""
+    appliance = simulator.add_appliance(VirtualAppliance(1, protocol=protocol))
+    device = _ac(appliance)
+    assert device.connect(check_protocol=True) is True
+    assert device.available is True
+    assert device.attributes["power"] is True
+    assert device.attributes["target_temperature"] == 24.0
+    assert device.attributes["indoor_temperature"] == 25.0
+    assert device.attributes["outdoor_temperature"] == 30.0
+    assert appliance.requests > 0
+    assert appliance.authentications == (protocol == ProtocolVersion.V3)
+    device.close_socket()
+
+
+def test_device_type(simulator: Simulator) -> None:
+    """Test canned responses follow the device type."""
+    appliance = simulator.add_appliance(
+        VirtualAppliance(2, device_type=DeviceType.A1, protocol=ProtocolVersion.V2),
+    )
+    device = MideaA1Device(
+        name="Simulated A1",
+        device_id=appliance.device_id,
+        ip_address=appliance.host,
+        port=appliance.port,
+        token="",
+        key="",
+        device_protocol=appliance.protocol,
+        model="test_model",
+        subtype=0,
+        customize="",
+    )
+    assert device.connect(check_protocol=True) is True
+    assert device.attributes["target_humidity"] == 50
+    assert device.attributes["current_humidity"] == 55
+    device.close_socket()
+
+
+def test_wrong_token(simulator: Simulator) -> None:
+    """Test a V3 handshake with a wrong token is refused."""
+    appliance = simulator.add_appliance(VirtualAppliance(3))
+    device = _ac(appliance, token="00" * 64)
+    assert device.connect() is False
+    assert appliance.authentications == 0
+
+
+def test_remove_appliance(simulator: Simulator) -> None:
+    """Test a removed appliance refuses connections."""
+    appliance = simulator.add_appliance(VirtualAppliance(4))
+    device = _ac(appliance)
+    assert device.connect() is True
+    simulator.remove_appliance(appliance)
+    assert simulator.appliances == []
+    assert device.connect() is False
+
+
+def test_many_appliances(simulator: Simulator) -> None:
+    """Test a hub drives a thousand simulated appliances."""
+    appliances = simulator.add_appliances(
+        VirtualAppliance(
+            device_id,
+            protocol=ProtocolVersion.V2 if device_id % 2 else ProtocolVersion.V3,
+        )
+        for device_id in range(1000)
+    )
+    assert len(simulator.appliances) == len(appliances)
+    hub = DeviceHub()
+    hub.open()
+    devices = [_ac(appliance) for appliance in appliances]
+    for device in devices:
+        hub.add_device(device)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        states = [entry.state for entry in list(hub._devices.values())]
+        if len(states) == len(devices) and set(states) == {HubState.RUNNING}:
+            break
+        time.sleep(0.1)
+    hub.close()
+    assert all(device.available for device in devices)
+    assert all(device.attributes["power"] is True for device in devices)